@@ -0,0 +1,93 @@
+"""
+Process-wide registry of pooled boto3 clients.
+
+Creating a boto3 client re-resolves credentials, loads endpoint metadata and opens new TLS
+connections, which costs tens of milliseconds. The inventory and invoice storage backends
+therefore share one client per AWS service per process, created lazily with a tuned
+`botocore.config.Config` (connection pool size, retries, TCP keep-alive).
+
+boto3 clients are thread-safe once created, so the registry only locks around creation.
+Clients are discarded in forked children (e.g. gunicorn workers forked after the app was
+imported), because sockets from the parent's connection pool must not be shared.
+
+Usage:
+    from WebApp.aws_clients import get_client
+    s3_client = get_client('s3')
+
+Settings:
+    - AWS_MAX_POOL_CONNECTIONS: urllib3 connection pool size per client.
+    - AWS_MAX_ATTEMPTS: Total attempts per request, including retries.
+"""
+import os
+import logging
+import threading
+import boto3
+from botocore.config import Config
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+_clients = {}
+_clients_lock = threading.Lock()
+_clients_pid = os.getpid()
+
+
+def _client_config(service_name):
+    """Return the botocore Config used for clients of the given service."""
+    options = {
+        'max_pool_connections': settings.AWS_MAX_POOL_CONNECTIONS,
+        'retries': {'max_attempts': settings.AWS_MAX_ATTEMPTS, 'mode': 'standard'},
+        'tcp_keepalive': True,
+    }
+    if service_name == 's3':
+        options['signature_version'] = 's3v4'
+    return Config(**options)
+
+
+def get_client(service_name):
+    """
+    Return the shared boto3 client for an AWS service, creating it on first use.
+
+    Args:
+        service_name (str): The boto3 service name, e.g. 's3' or 'dynamodb'.
+
+    Returns:
+        botocore.client.BaseClient: A client that is safe to use from any thread.
+    """
+    global _clients_pid  # pylint: disable=global-statement
+    if _clients_pid == os.getpid():
+        client = _clients.get(service_name)
+        if client is not None:
+            return client
+
+    with _clients_lock:
+        if _clients_pid != os.getpid():
+            # Forked without the at-fork hook (e.g. os.fork on an old interpreter).
+            _clients.clear()
+            _clients_pid = os.getpid()
+        client = _clients.get(service_name)
+        if client is None:
+            client = boto3.client(
+                service_name,
+                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+                region_name=settings.AWS_REGION,
+                config=_client_config(service_name),
+            )
+            _clients[service_name] = client
+            logger.debug("Created shared %s client with region: %s", service_name, settings.AWS_REGION)
+        return client
+
+
+def reset_clients():
+    """Drop all cached clients so the next `get_client` call builds fresh ones."""
+    global _clients_lock, _clients_pid  # pylint: disable=global-statement
+    # A fresh lock, because a fork may have happened while another thread held the old one.
+    _clients_lock = threading.Lock()
+    _clients.clear()
+    _clients_pid = os.getpid()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reset_clients)
@@ -0,0 +1,38 @@
+"""
+Per-connection database tuning.
+
+SQLite's default rollback journal locks the whole file for every write, and readers wait on it
+too, so gunicorn workers sharing the local database serialize on the file lock. Each new SQLite
+connection is therefore switched to write-ahead logging: readers then see the last committed
+state without blocking the single writer. WAL is persistent in the database file, so this is
+a no-op after the first connection; `synchronous=NORMAL` is the recommended, still crash-safe,
+pairing for WAL. The busy timeout for concurrent writers is the 'timeout' option in
+`settings.DATABASES`.
+
+Postgres needs nothing here; its connection reuse is configured by CONN_MAX_AGE and
+CONN_HEALTH_CHECKS in settings.
+
+Connected from `InventoryConfig.ready()`.
+"""
+import logging
+from django.db.backends.signals import connection_created
+
+
+logger = logging.getLogger(__name__)
+
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+)
+
+
+def configure_sqlite(sender, connection, **kwargs):  # pylint: disable=unused-argument
+    """connection_created receiver: applies SQLITE_PRAGMAS to new SQLite connections."""
+    if connection.vendor != 'sqlite':
+        return
+    # On the raw connection, so the pragmas stay out of the query log and test query counts.
+    for pragma in SQLITE_PRAGMAS:
+        connection.connection.execute(pragma)
+
+
+connection_created.connect(configure_sqlite, dispatch_uid='configure_sqlite')
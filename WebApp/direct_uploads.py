@@ -0,0 +1,76 @@
+"""
+Browser-to-S3 ("direct") uploads shared by the inventory and invoice apps.
+
+Streaming a photo or PDF through Django ties up a worker for the whole transfer and spools the
+file to local disk first. Instead, the app hands the browser a presigned POST for one object key,
+the browser sends the file straight to S3, and a confirm request records the row once the object
+exists. The file itself never reaches the app servers.
+
+Flow:
+    1. POST <app>/.../presign/ {file_name, content_type, size}
+       -> {url, fields, key}; the browser POSTs `fields` plus the file to `url`.
+    2. POST <app>/.../confirm/ {key, ...}
+       -> the row is created after `uploaded_object` has seen the key in S3.
+
+The presigned policy pins the key and content type and caps the size, so a URL cannot be reused
+for other objects.
+
+Settings:
+    - DIRECT_UPLOAD_EXPIRES_IN: Seconds a presigned POST stays valid.
+"""
+import json
+import logging
+from botocore.exceptions import ClientError
+from django.conf import settings
+from WebApp.aws_clients import get_client
+
+
+logger = logging.getLogger(__name__)
+
+
+def presigned_post(bucket, key, content_type, max_bytes):
+    """
+    Return a presigned POST for uploading exactly one object.
+
+    Args:
+        bucket (str): Destination bucket.
+        key (str): Object key the upload is restricted to.
+        content_type (str): Content-Type the browser must send.
+        max_bytes (int): Largest accepted object size.
+
+    Returns:
+        dict: {'url', 'fields', 'key'}, ready to be returned as JSON.
+    """
+    post = get_client('s3').generate_presigned_post(
+        Bucket=bucket,
+        Key=key,
+        Fields={'Content-Type': content_type},
+        Conditions=[
+            {'Content-Type': content_type},
+            ['content-length-range', 1, max_bytes],
+        ],
+        ExpiresIn=settings.DIRECT_UPLOAD_EXPIRES_IN,
+    )
+    return {'url': post['url'], 'fields': post['fields'], 'key': key}
+
+
+def uploaded_object(bucket, key):
+    """Return (size in bytes, content type) of an uploaded object, or None if it does not exist."""
+    try:
+        head = get_client('s3').head_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+            return None
+        raise
+    return head['ContentLength'], head.get('ContentType')
+
+
+def request_data(request):
+    """Return the parameters of a presign/confirm request, sent either as JSON or as form data."""
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
+    return request.POST
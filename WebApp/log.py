@@ -0,0 +1,172 @@
+"""
+Structured, non-blocking logging for the web app, wired up by `settings.LOGGING`.
+
+- `JsonFormatter`: One JSON object per line, with the fields passed through `extra=` kept as
+  top-level keys, so log pipelines can filter on e.g. `item_id` without parsing messages.
+- `SampleFilter`: Passes only a fraction of DEBUG records. Per-upload and per-request debug
+  events stay available in production at a cost proportional to the sample rate.
+- `QueueStreamHandler`: A `QueueHandler` whose `QueueListener` thread formats the records and
+  writes them to the stream. Request threads only put the record on an unbounded queue, so a
+  slow or blocked stdout never adds to request time.
+
+Settings:
+    - LOG_LEVEL: Level of the app's own loggers (inventory, invoice, users, WebApp).
+    - LOG_LEVELS: Per-logger overrides, e.g. 'inventory.upload_queue=DEBUG,botocore=INFO'.
+    - LOG_DEBUG_SAMPLE_RATE: Fraction of DEBUG records kept (0 to 1).
+"""
+import os
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+import datetime
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+
+# Attributes every LogRecord has; anything else on a record came from `extra=`.
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+
+def parse_levels(value):
+    """Parses 'logger=LEVEL,other=LEVEL' into {'logger': 'LEVEL', ...}; blank entries are ignored."""
+    levels = {}
+    for entry in (value or '').split(','):
+        name, _, level = entry.partition('=')
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as a single-line JSON object."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(
+                timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for name, value in vars(record).items():
+            if name not in _RECORD_ATTRIBUTES and not name.startswith('_'):
+                entry[name] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc_info'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SampleFilter(logging.Filter):
+    """
+    Keeps a random `rate` fraction of the records at or below `level`; higher levels always pass.
+
+    Args:
+        rate (float): Fraction of sampled records kept, from 0 (none) to 1 (all).
+        level (str | int): Highest level that is sampled.
+    """
+    def __init__(self, rate=1.0, level='DEBUG'):
+        super().__init__()
+        self.rate = float(rate)
+        self.level = logging.getLevelName(level) if isinstance(level, str) else level
+
+    def filter(self, record):
+        if record.levelno > self.level or self.rate >= 1:
+            return True
+        return random.random() < self.rate
+
+
+class _FlushRequest:
+    """Queued after the records to flush; the listener sets `done` when it reaches it."""
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class _Listener(QueueListener):
+    """QueueListener that answers flush requests instead of handing them to the handlers."""
+    def handle(self, record):
+        if isinstance(record, _FlushRequest):
+            record.done.set()
+            return
+        super().handle(record)
+
+
+class QueueStreamHandler(QueueHandler):
+    """
+    Hands records to a background thread that formats and writes them to `stream`.
+
+    The formatter set on this handler (e.g. by dictConfig) is applied by the listener thread.
+    Filters run in the logging thread, before the record is queued. The listener is restarted
+    in forked children (e.g. gunicorn workers), whose copy of the parent's thread is gone.
+
+    Args:
+        stream: Destination stream (defaults to sys.stderr).
+        flush_timeout (float): Longest `flush` waits for the listener, in seconds.
+    """
+    def __init__(self, stream=None, flush_timeout=5.0):
+        super().__init__(queue.SimpleQueue())
+        self.target = logging.StreamHandler(stream or sys.stderr)
+        self.flush_timeout = flush_timeout
+        self._listener = None
+        self._listener_pid = None
+        self._listener_lock = threading.Lock()
+        self._start_listener()
+        atexit.register(self.close)
+
+    def setFormatter(self, fmt):
+        # Formatting is the listener's job; the request thread only enqueues.
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        """Makes the record safe to format later in another thread, without formatting it here."""
+        record = logging.makeLogRecord(vars(record))
+        # Interpolate now: the arguments may be mutated once the caller continues.
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # Tracebacks hold frames of the logging thread; keep their text only.
+            record.exc_text = (self.target.formatter or logging.Formatter()).formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def emit(self, record):
+        if self._listener_pid != os.getpid():
+            self._start_listener()
+        super().emit(record)
+
+    def flush(self):
+        """
+        Waits until every record queued before the call is written.
+
+        A marker is queued behind them and the listener signals when it gets there, so the
+        listener keeps running and records logged meanwhile by other threads are not affected.
+        Safe to call from several threads at once.
+        """
+        with self._listener_lock:
+            running = self._listener is not None and self._listener_pid == os.getpid()
+        if running:
+            request = _FlushRequest()
+            self.queue.put_nowait(request)
+            request.done.wait(self.flush_timeout)
+        self.target.flush()
+
+    def close(self):
+        with self._listener_lock:
+            if self._listener is not None and self._listener_pid == os.getpid():
+                self._listener.stop()
+            self._listener = None
+            self._listener_pid = os.getpid()  # closed: do not restart from emit
+        self.target.close()
+        super().close()
+
+    def _start_listener(self):
+        with self._listener_lock:
+            if self._listener_pid == os.getpid():
+                return
+            self._listener = _Listener(self.queue, self.target, respect_handler_level=True)
+            self._listener.start()
+            self._listener_pid = os.getpid()
@@ -15,6 +15,7 @@ import os
 import logging
 from dotenv import load_dotenv
 from django.core.management.utils import get_random_secret_key
+from WebApp.log import parse_levels
 
 # logger instance
 logger = logging.getLogger(__name__)
@@ -33,10 +34,34 @@ load_dotenv(dotenv_path=env_path)  # Load variables from .env file
 AWS_ACCESS_KEY_ID = os.environ.get('AWS_ACCESS_KEY_ID')
 AWS_SECRET_ACCESS_KEY = os.environ.get('AWS_SECRET_ACCESS_KEY')
 AWS_REGION = os.environ.get('AWS_REGION_NAME')
-print("AWS Region:", AWS_REGION)
+# Shared boto3 client tuning (see WebApp/aws_clients.py)
+AWS_MAX_POOL_CONNECTIONS = int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', '25'))
+AWS_MAX_ATTEMPTS = int(os.environ.get('AWS_MAX_ATTEMPTS', '5'))
 
 # settings.py
-logger.debug(f"AWS_REGION: {AWS_REGION}")
+logger.debug("AWS_REGION: %s", AWS_REGION)
+
+# Background upload worker threads per process (see inventory/upload_queue.py)
+INVENTORY_UPLOAD_WORKERS = int(os.environ.get('INVENTORY_UPLOAD_WORKERS', '4'))
+# Batched DynamoDB label writes from the upload worker (see inventory/metadata_writer.py)
+DYNAMODB_BATCH_FLUSH_SIZE = int(os.environ.get('DYNAMODB_BATCH_FLUSH_SIZE', '25'))
+DYNAMODB_BATCH_FLUSH_INTERVAL = float(os.environ.get('DYNAMODB_BATCH_FLUSH_INTERVAL', '2'))
+DYNAMODB_BATCH_MAX_ATTEMPTS = int(os.environ.get('DYNAMODB_BATCH_MAX_ATTEMPTS', '8'))
+# Most images accepted by one batch submission (see inventory/forms.py InventoryBatchFormSet)
+INVENTORY_BATCH_MAX_ITEMS = int(os.environ.get('INVENTORY_BATCH_MAX_ITEMS', '50'))
+# Rows per page in the inventory upload history
+INVENTORY_UPLOADS_PAGE_SIZE = int(os.environ.get('INVENTORY_UPLOADS_PAGE_SIZE', '25'))
+# Rows per page in the invoice list
+INVOICE_LIST_PAGE_SIZE = int(os.environ.get('INVOICE_LIST_PAGE_SIZE', '25'))
+
+# Browser-to-S3 uploads (see WebApp/direct_uploads.py)
+DIRECT_UPLOAD_EXPIRES_IN = int(os.environ.get('DIRECT_UPLOAD_EXPIRES_IN', '600'))
+INVENTORY_IMAGE_MAX_BYTES = int(os.environ.get('INVENTORY_IMAGE_MAX_BYTES', str(25 * 1024 * 1024)))
+INVENTORY_IMAGE_CONTENT_TYPES = ('image/jpeg', 'image/png', 'image/heic', 'image/webp')
+INVOICE_PDF_MAX_BYTES = int(os.environ.get('INVOICE_PDF_MAX_BYTES', str(50 * 1024 * 1024)))
+
+# Seconds before another process's catalog changes show up in the cached GL tree (inventory/gl_tree.py)
+GL_TREE_CACHE_TIMEOUT = int(os.environ.get('GL_TREE_CACHE_TIMEOUT', '300'))
 
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = os.environ.get('SECRET_KEY')
@@ -96,11 +121,40 @@ WSGI_APPLICATION = 'WebApp.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
+# DB_ENGINE=postgresql selects Postgres, configured from the same DB_* variables as the ELT Lambdas,
+# with persistent, health-checked connections. Otherwise SQLite, the local default; WebApp/db.py
+# switches it to WAL so readers do not block on the writer, and busy writers wait up to
+# SQLITE_BUSY_TIMEOUT seconds for the lock instead of failing with "database is locked".
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite3')
+
+
+def _database():
+    """The 'default' DATABASES entry for DB_ENGINE."""
+    if DB_ENGINE in ('postgresql', 'postgres'):
+        return {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ['DB_NAME'],
+            'USER': os.environ['DB_USER'],
+            'PASSWORD': os.environ['DB_PASSWORD'],
+            'HOST': os.environ['DB_HOST'],
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            # Seconds a connection is reused across requests; 0 closes it after every request.
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '60')),
+            # Reused connections are pinged before each request, so a restarted server is survived.
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', '5'))},
+        }
+    if DB_ENGINE != 'sqlite3':
+        raise ValueError(f"Unsupported DB_ENGINE {DB_ENGINE!r}; use 'postgresql' or 'sqlite3'.")
+    return {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+        'OPTIONS': {'timeout': float(os.environ.get('SQLITE_BUSY_TIMEOUT', '20'))},
     }
+
+
+DATABASES = {
+    'default': _database(),
 }
 
 
@@ -141,6 +195,25 @@ USE_TZ = True
 STATIC_URL = '/static/'
 
 MEDIA_URL = '/images/'
+MEDIA_ROOT = os.environ.get('MEDIA_ROOT', str(BASE_DIR / 'media'))
+
+
+def _upload_storage(bucket_env):
+    """S3 storage for an upload bucket (see WebApp/storage.py), or local media storage without one."""
+    if os.environ.get(bucket_env):
+        return {'BACKEND': 'WebApp.storage.S3Storage', 'OPTIONS': {'bucket_name': os.environ[bucket_env]}}
+    return {'BACKEND': 'django.core.files.storage.FileSystemStorage'}
+
+
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    # FileField storages for user uploads. Inventory photos are staged on local disk and put to
+    # S3 by the background upload worker (inventory/upload_queue.py), so the request never waits
+    # on S3; the worker removes the staged copy once it is uploaded.
+    'inventory_images': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'invoices': _upload_storage('S3_BUCKET_NAME_INVOICE'),
+}
 
 STATICFILES_DIR = [
     os.path.join(BASE_DIR, 'static')
@@ -165,20 +238,41 @@ EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD')
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+# JSON records written by a background thread (see WebApp/log.py). The app's loggers log at
+# LOG_LEVEL; everything else, including the AWS SDK's wire logging, at WARNING unless listed
+# in LOG_LEVELS.
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_DEBUG_SAMPLE_RATE = float(os.environ.get('LOG_DEBUG_SAMPLE_RATE', '0.01'))
+
+
+def _logger_levels():
+    """Levels per logger: app loggers, quieted third-party loggers, then the LOG_LEVELS overrides."""
+    levels = {name: LOG_LEVEL for name in ('WebApp', 'inventory', 'invoice', 'users')}
+    levels.update({name: 'WARNING' for name in ('botocore', 'boto3', 's3transfer', 'urllib3', 'PIL')})
+    levels.update({'django': 'INFO', 'django.db.backends': 'WARNING'})
+    levels.update(parse_levels(os.environ.get('LOG_LEVELS')))
+    return levels
+
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'formatters': {
+        'json': {'()': 'WebApp.log.JsonFormatter'},
+    },
+    'filters': {
+        'sample_debug': {'()': 'WebApp.log.SampleFilter', 'rate': LOG_DEBUG_SAMPLE_RATE},
+    },
     'handlers': {
         'console': {
-            'level': 'DEBUG',
-            'class': 'logging.StreamHandler',
+            'class': 'WebApp.log.QueueStreamHandler',
+            'formatter': 'json',
+            'filters': ['sample_debug'],
         },
     },
-    'loggers': {
-        '': {  # root logger
-            'handlers': ['console'],
-            'level': 'DEBUG',
-            'propagate': True,
-        },
+    'root': {
+        'handlers': ['console'],
+        'level': 'WARNING',
     },
-}
\ No newline at end of file
+    'loggers': {name: {'level': level} for name, level in _logger_levels().items()},
+}
@@ -0,0 +1,136 @@
+"""
+Django file storage for uploads, backed by S3 through the pooled client in `aws_clients`.
+
+`Invoice.pdf_file` used to save every upload to local media storage before the storage backend
+uploaded the same bytes to S3 again. With `S3Storage` the FileField writes once, straight to the
+upload bucket, and nothing accumulates on the app servers' disks.
+
+Each upload storage is a named entry in `settings.STORAGES`:
+    - 'invoices': S3_BUCKET_NAME_INVOICE (`invoices/user_{id}/...`, which triggers the Textract ELT).
+      When the bucket is not configured (local development, tests) the entry is a
+      FileSystemStorage under MEDIA_ROOT instead, so the model behaves the same without AWS.
+    - 'inventory_images': local FileSystemStorage. Photos are staged under their final
+      `images/user_{id}_...` key and put to S3_BUCKET_NAME by the background upload worker,
+      which keeps the S3 round trip off the request (inventory/upload_queue.py). Pointing this
+      entry at S3Storage also works: the worker then only writes the metadata.
+
+Models reference the entries through `inventory_image_storage` / `invoice_storage`, which return
+lazy proxies, so `override_settings(STORAGES=...)` is honored in tests.
+"""
+import logging
+from botocore.exceptions import ClientError
+from django.core.files.base import File
+from django.core.files.storage import Storage, storages
+from django.core.signals import setting_changed
+from django.utils.deconstruct import deconstructible
+from django.utils.functional import LazyObject, empty
+from WebApp.aws_clients import get_client
+
+
+logger = logging.getLogger(__name__)
+
+
+@deconstructible
+class S3Storage(Storage):
+    """
+    Stores files as objects in one S3 bucket, using the process-wide S3 client.
+
+    Args:
+        bucket_name (str): Destination bucket.
+        url_expires_in (int): Lifetime in seconds of the presigned GET URLs returned by `url`.
+    """
+    def __init__(self, bucket_name=None, url_expires_in=3600):
+        self.bucket_name = bucket_name
+        self.url_expires_in = url_expires_in
+
+    @property
+    def client(self):
+        return get_client('s3')
+
+    def _save(self, name, content):
+        content.seek(0)
+        extra_args = {}
+        content_type = getattr(content, 'content_type', None)
+        if content_type:
+            extra_args['ContentType'] = content_type
+        self.client.upload_fileobj(content, self.bucket_name, name, ExtraArgs=extra_args or None)
+        logger.info("Stored %s in s3://%s", name, self.bucket_name)
+        return name
+
+    def _open(self, name, mode='rb'):
+        if 'w' in mode or 'a' in mode:
+            raise ValueError("S3Storage files are read-only; save a new file instead.")
+        body = self.client.get_object(Bucket=self.bucket_name, Key=name)['Body']
+        return File(body, name=name)
+
+    def exists(self, name):
+        try:
+            self.client.head_object(Bucket=self.bucket_name, Key=name)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+        return True
+
+    def delete(self, name):
+        self.client.delete_object(Bucket=self.bucket_name, Key=name)
+
+    def size(self, name):
+        return self.client.head_object(Bucket=self.bucket_name, Key=name)['ContentLength']
+
+    def url(self, name):
+        """Returns a presigned GET URL; signing is local, so this costs no AWS round trip."""
+        return self.client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': self.bucket_name, 'Key': name},
+            ExpiresIn=self.url_expires_in,
+        )
+
+    def get_valid_name(self, name):
+        # Keys are generated by the models' upload_to functions; keep their '/' structure as is.
+        return name
+
+    def get_available_name(self, name, max_length=None):
+        # Both upload_to functions (image_key and invoice_s3_key) put a timestamp and uuid in the
+        # key, so skip the head_object round trip the default implementation makes to look for a
+        # collision.
+        return name
+
+
+class NamedStorage(LazyObject):
+    """Proxy to `storages[alias]`, resolved on first use and again after STORAGES changes."""
+    def __init__(self, alias):
+        super().__init__()
+        self.__dict__['alias'] = alias
+
+    def _setup(self):
+        self._wrapped = storages[self.__dict__['alias']]
+
+
+_inventory_images = NamedStorage('inventory_images')
+_invoices = NamedStorage('invoices')
+
+
+def inventory_image_storage():
+    """Storage for `InventoryItem.image` (callable, so migrations do not pin a backend)."""
+    return _inventory_images
+
+
+def invoice_storage():
+    """Storage for `Invoice.pdf_file` (callable, so migrations do not pin a backend)."""
+    return _invoices
+
+
+def is_s3(storage):
+    """True if files in `storage` are already in S3 (so they must not be uploaded again)."""
+    return isinstance(storage, S3Storage)
+
+
+def _reset_named_storages(*, setting, **kwargs):
+    # django.test.signals resets `storages` itself; the proxies must drop their cached backend too.
+    if setting == 'STORAGES':
+        _inventory_images._wrapped = empty
+        _invoices._wrapped = empty
+
+
+setting_changed.connect(_reset_named_storages)
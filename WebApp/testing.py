@@ -0,0 +1,60 @@
+"""
+Test helpers shared by the app test suites.
+
+`QueryBudgetMixin.assertQueryBudget` fails a test when a request to one of the hot endpoints runs
+more SQL queries than its budget in `QUERY_BUDGETS`. Unlike `assertNumQueries` it is an upper
+bound, so a view that gets cheaper still passes, while a new N+1 loop or a lost select_related
+fails with the offending queries listed.
+
+Usage:
+    class InventoryViewTest(QueryBudgetMixin, TestCase):
+        def test_upload_page(self):
+            with self.assertQueryBudget('inventory_app'):
+                self.client.get(reverse('inventory_app'))
+"""
+from contextlib import contextmanager
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+# Maximum queries per request, keyed by URL name (and method, for views that also handle POST).
+# Every budget includes the session and user lookups that login_required costs.
+QUERY_BUDGETS = {
+    # Session, user, upload history page (select_related) and GL Level 1 options.
+    ('GET', 'inventory_app'): 4,
+    # Session, user, insert, and two lookups per GL level and product: the form's choice fields,
+    # then ModelForm's model validation re-checking that each foreign key exists.
+    ('POST', 'inventory_app'): 11,
+    ('GET', 'upload_invoice'): 2,
+    # Session, user, insert, filename/s3_key update, and the savepoint (and its release) of the
+    # atomic block that rolls the row back if the upload fails.
+    ('POST', 'upload_invoice'): 6,
+    # AJAX dropdown endpoints: session, user, one filtered query.
+    ('GET', 'get_gl_level_2'): 3,
+    ('GET', 'get_gl_level_3'): 3,
+    ('GET', 'get_products'): 3,
+    # Cached tree: session and user only; a rebuild adds one query per hierarchy level.
+    ('GET', 'get_gl_tree'): 6,
+}
+
+
+class QueryBudgetMixin:
+    """TestCase mixin providing `assertQueryBudget`."""
+
+    @contextmanager
+    def assertQueryBudget(self, url_name, method='GET', budget=None, using=DEFAULT_DB_ALIAS):  # pylint: disable=invalid-name
+        """
+        Fails if the block runs more queries than the budget of `url_name`.
+
+        Args:
+            url_name (str): Key into QUERY_BUDGETS (with `method`).
+            method (str): HTTP method of the request made in the block.
+            budget (int | None): Overrides the QUERY_BUDGETS entry.
+        """
+        if budget is None:
+            budget = QUERY_BUDGETS[(method.upper(), url_name)]
+        with CaptureQueriesContext(connections[using]) as context:
+            yield context
+        if len(context) > budget:
+            queries = '\n'.join(f"{index}. {query['sql']}" for index, query in enumerate(context.captured_queries, 1))
+            self.fail(f"{method.upper()} {url_name} ran {len(context)} queries, over its budget of {budget}:\n{queries}")
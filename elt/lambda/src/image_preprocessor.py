@@ -2,12 +2,29 @@
 AWS Lambda function for image preprocessing.
 
 This module contains the lambda_handler function that is triggered by an S3 event.
-It processes the image uploaded to S3 by resizing it and then uploads the processed
-image back to a different S3 bucket. The function uses Boto3 for AWS interactions
-and Pillow for image processing.
+It processes the image uploaded to S3 by resizing it into several derivatives (a small
+thumbnail, a mid-size preview and a model-training size) and then uploads them to a
+different S3 bucket. The function uses Boto3 for AWS interactions and Pillow for image
+processing.
+
+Images are handled entirely in memory: the S3 body is read into a buffer and decoded once,
+JPEGs are downscaled while decoding (`Image.draft`), the aspect ratio is preserved
+(`thumbnail`), and each encoded derivative is streamed straight back to S3 under
+'<name>/<source key stem>.jpg'. Nothing is written to /tmp, so warm
+containers cannot fill it up, and the records of one event are processed concurrently by a
+bounded thread pool.
+
+Environment variables:
+- RESIZED_IMAGE_BUCKET: Destination bucket for the derivatives.
+- DERIVATIVES: Comma-separated 'name:WIDTHxHEIGHT' bounding boxes, e.g.
+  'train:1280x720,preview:640x640,thumb:160x160' (the default).
+- MAX_CONCURRENT_RECORDS: Upper bound on records processed in parallel.
 """
-import uuid
+import io
+import os
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote_plus
 import boto3
 from PIL import Image
 
@@ -16,53 +33,146 @@ from PIL import Image
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Created once per container and shared by the worker threads (clients are thread-safe).
 s3_client = boto3.client('s3')
 
-def resize_image(image_path, resized_path):
+DESTINATION_BUCKET = os.environ.get('RESIZED_IMAGE_BUCKET', 'your-resized-image-bucket')
+MAX_CONCURRENT_RECORDS = int(os.environ.get('MAX_CONCURRENT_RECORDS', '4'))
+JPEG_QUALITY = 85
+
+
+def parse_derivatives(spec):
     """
-    Resizes an image to a specified size.
+    Parses a derivative specification such as 'thumb:160x160,preview:640x640'.
 
     Args:
-    - image_path (str): The path to the source image.
-    - resized_path (str): The path to save the resized image.
+    - spec (str): Comma-separated 'name:WIDTHxHEIGHT' entries.
+
+    Returns:
+    - list: (name, (width, height)) tuples, largest bounding box first.
     """
+    derivatives = []
+    for entry in spec.split(','):
+        name, size = entry.strip().split(':')
+        width, height = size.lower().split('x')
+        derivatives.append((name.strip(), (int(width), int(height))))
+    return sorted(derivatives, key=lambda derivative: derivative[1][0] * derivative[1][1], reverse=True)
+
+
+# Every derivative is produced from a single decode of the source image.
+DERIVATIVES = parse_derivatives(os.environ.get('DERIVATIVES', 'train:1280x720,preview:640x640,thumb:160x160'))
+
+
+def derivative_key(key, name):
+    """
+    Returns the deterministic key of a derivative, e.g.
+    'images/user_1_20240101120000_<uuid>.jpeg' -> 'thumb/images/user_1_20240101120000_<uuid>.jpg'.
+
+    The web app builds thumbnail URLs with the same scheme
+    (inventory.storage_backends.derivative_key); keep the two in sync.
+    """
+    return f"{name}/{os.path.splitext(key)[0]}.jpg"
+
+
+def generate_derivatives(source, derivatives=None):
+    """
+    Decodes an image once and encodes every configured derivative size as JPEG.
+
+    Each derivative fits within its bounding box with the aspect ratio preserved. A derivative
+    is scaled down from the previous (next larger) one when its box fits inside the previous
+    box, which then has at least the resolution it needs; otherwise (boxes that are not nested,
+    e.g. 1024x1024 then 1600x300) it is scaled from the decoded source.
+
+    Args:
+    - source (file-like): Buffer holding the encoded source image.
+    - derivatives (list): (name, (width, height)) tuples, largest first. Defaults to DERIVATIVES.
+
+    Returns:
+    - dict: Derivative name -> io.BytesIO positioned at 0.
+    """
+    derivatives = derivatives or DERIVATIVES
+    outputs = {}
     try:
-        with Image.open(image_path) as image:
-            image = image.resize((1280, 720))  # Example resize; adjust as needed
-            image.save(resized_path)
-        logger.info(f"Image resized and saved to {resized_path}")
+        with Image.open(source) as image:
+            # For JPEGs, let the decoder scale by 1/2, 1/4 or 1/8 instead of decoding full size,
+            # keeping enough pixels for every box in both dimensions.
+            image.draft('RGB', (max(width for _, (width, _) in derivatives),
+                                max(height for _, (_, height) in derivatives)))
+            base = image.convert('RGB')
+        previous_box, previous = None, None
+        for name, max_size in derivatives:
+            nested = previous_box is not None and max_size[0] <= previous_box[0] and max_size[1] <= previous_box[1]
+            # `previous` is already encoded, so it can be shrunk in place; `base` is reused.
+            current = previous if nested else base.copy()
+            current.thumbnail(max_size)
+            output = io.BytesIO()
+            current.save(output, format='JPEG', quality=JPEG_QUALITY, optimize=True)
+            output.seek(0)
+            outputs[name] = output
+            logger.info(f"Derivative {name} resized to {current.size}")
+            previous_box, previous = max_size, current
+        return outputs
     except Exception as e:
         logger.error(f"Error in resizing image: {e}")
         raise
 
+
+def process_record(record):
+    """
+    Generates the derivatives of the image referenced by one S3 event record and uploads them.
+
+    Args:
+    - record (dict): A single entry of the S3 event's 'Records' list.
+
+    Returns:
+    - str: The processed object key.
+    """
+    bucket = record['s3']['bucket']['name']
+    # Keys in S3 event notifications are URL-encoded (spaces arrive as '+').
+    key = unquote_plus(record['s3']['object']['key'])
+
+    logger.info(f"Downloading image {key} from bucket {bucket}")
+    source = io.BytesIO(s3_client.get_object(Bucket=bucket, Key=key)['Body'].read())
+
+    logger.info("Generating derivatives")
+    for name, output in generate_derivatives(source).items():
+        target_key = derivative_key(key, name)
+        logger.info(f"Uploading {target_key} to bucket {DESTINATION_BUCKET}")
+        s3_client.upload_fileobj(output, DESTINATION_BUCKET, target_key, ExtraArgs={'ContentType': 'image/jpeg'})
+    logger.info(f"Processing complete for {key}")
+    return key
+
+
 def lambda_handler(event, context):
     """
     AWS Lambda function handler.
 
-    Processes each record in the S3 event. It resizes the image and uploads it
-    back to a specified S3 bucket.
+    Processes each record in the S3 event. It resizes the image into every configured
+    derivative and uploads them to a specified S3 bucket. Records are processed concurrently; every record
+    is attempted even if another one fails.
 
     Args:
     - event: AWS event containing the S3 object information.
     - context: AWS runtime information.
+
+    Raises:
+    - RuntimeError: If any record failed, after all records have been attempted, so the
+      invocation is reported as failed and retried by Lambda.
     """
-    for record in event['Records']:
-        bucket = record['s3']['bucket']['name']
-        key = record['s3']['object']['key']
-        download_path = f'/tmp/{uuid.uuid4()}{key}'
-        upload_path = f'/tmp/resized-{key}'
-
-        try:
-            logger.info(f"Downloading image {key} from bucket {bucket}")
-            s3_client.download_file(bucket, key, download_path)
-
-            logger.info("Resizing image")
-            resize_image(download_path, upload_path)
-
-            logger.info(f"Uploading resized image to bucket your-resized-image-bucket")
-            s3_client.upload_file(upload_path, 'your-resized-image-bucket', key)
-        except Exception as e:
-            logger.error(f"Error processing {key}: {e}")
-            raise
-
-        logger.info(f"Processing complete for {key}")
\ No newline at end of file
+    records = event.get('Records', [])
+    if not records:
+        return
+
+    failures = []
+    with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_RECORDS, len(records))) as executor:
+        futures = [(record, executor.submit(process_record, record)) for record in records]
+        for record, future in futures:
+            try:
+                future.result()
+            except Exception as e:  # pylint: disable=broad-except
+                key = record['s3']['object']['key']
+                logger.error(f"Error processing {key}: {e}")
+                failures.append(key)
+
+    if failures:
+        raise RuntimeError(f"Failed to process {len(failures)} image(s): {', '.join(failures)}")
@@ -0,0 +1,221 @@
+"""
+Maintenance for the monthly partitions of the `in_invoice_processing` staging table.
+
+Runs on a schedule (`lambda_handler`) or from a shell (`python partition_maintenance.py --help`):
+
+1. Creates the partitions for the coming months (`create_in_invoice_processing_partitions`), so
+   inserts never fall into the default partition.
+2. For every monthly partition older than the retention window whose rows are all processed, streams
+   the rows with COPY into a gzip-compressed CSV, writes it to S3 or a local directory, and only then
+   detaches and drops the partition.
+
+Derived tables (invoices, line items, summary fields) reference the unpartitioned
+`in_invoice_processing_key` registry, so they are unaffected, and the registry keeps the loader from
+re-staging archived objects.
+
+Environment variables:
+- DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT: PostgreSQL connection settings.
+- RETENTION_MONTHS: Months of staging data kept in the database (default 6).
+- PARTITIONS_AHEAD: Future monthly partitions to keep created (default 3).
+- ARCHIVE_BUCKET / ARCHIVE_PREFIX: S3 destination for archives (prefix default 'in_invoice_processing/').
+- ARCHIVE_DIR: Local destination, used when ARCHIVE_BUCKET is not set.
+"""
+import os
+import re
+import gzip
+import shutil
+import logging
+import argparse
+import tempfile
+from datetime import date
+import boto3
+import psycopg2
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+PARENT_TABLE = 'in_invoice_processing'
+# Only partitions created by create_in_invoice_processing_partitions are candidates; the name is
+# also what makes interpolating it into DDL safe.
+PARTITION_NAME = re.compile(r'^in_invoice_processing_p(\d{4})(\d{2})$')
+ARCHIVE_COLUMNS = 'id, s3_object_key, received_timestamp, processed, vendor_id, textract_json'
+
+
+class S3Sink:
+    """Writes archives to `s3://bucket/prefix<name>.csv.gz`."""
+
+    def __init__(self, bucket, prefix='in_invoice_processing/', client=None):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = client or boto3.client('s3')
+
+    def write(self, name, fileobj):
+        key = f'{self.prefix}{name}.csv.gz'
+        self.client.upload_fileobj(fileobj, self.bucket, key, ExtraArgs={'ContentType': 'application/gzip'})
+        return f's3://{self.bucket}/{key}'
+
+
+class LocalSink:
+    """Writes archives to `<directory>/<name>.csv.gz`, via a temporary name so partial files never appear."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def write(self, name, fileobj):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f'{name}.csv.gz')
+        with open(f'{path}.part', 'wb') as destination:
+            shutil.copyfileobj(fileobj, destination)
+        os.replace(f'{path}.part', path)
+        return path
+
+
+def connect():
+    """Opens a connection from the DB_* environment variables."""
+    return psycopg2.connect(
+        dbname=os.environ['DB_NAME'],
+        user=os.environ['DB_USER'],
+        password=os.environ['DB_PASSWORD'],
+        host=os.environ['DB_HOST'],
+        port=os.environ['DB_PORT'],
+    )
+
+
+def list_partitions(conn):
+    """Returns [(partition name, first day of its month)] for the monthly partitions, oldest first."""
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits i "
+            "JOIN pg_class child ON child.oid = i.inhrelid "
+            "JOIN pg_class parent ON parent.oid = i.inhparent "
+            "WHERE parent.relname = %s",
+            (PARENT_TABLE,))
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = []
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def retention_cutoff(today, retention_months):
+    """Returns the first day of the oldest month that is kept."""
+    months = today.year * 12 + today.month - 1 - retention_months
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def has_unprocessed_rows(conn, name):
+    """True if the partition still holds rows process_invoice_data has not handled."""
+    with conn.cursor() as cursor:
+        cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {name} WHERE processed IS NOT TRUE)")
+        return cursor.fetchone()[0]
+
+
+def archive_partition(conn, name, sink):
+    """
+    Streams the partition's rows into a gzip-compressed CSV (with header) and hands it to `sink`.
+
+    The archive is spooled through a temporary file, so memory use does not depend on partition size.
+    Returns the archive location.
+    """
+    with tempfile.TemporaryFile() as spool:
+        with gzip.GzipFile(fileobj=spool, mode='wb') as compressed, conn.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY (SELECT {ARCHIVE_COLUMNS} FROM {name} ORDER BY id) TO STDOUT WITH (FORMAT csv, HEADER)",
+                compressed)
+        spool.seek(0)
+        return sink.write(name, spool)
+
+
+def drop_partition(conn, name, drop=True):
+    """Detaches the partition from the staging table and, unless `drop` is False, drops it."""
+    with conn.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}")
+        if drop:
+            cursor.execute(f"DROP TABLE {name}")
+    conn.commit()
+
+
+def run(conn, sink, retention_months=6, months_ahead=3, today=None, drop=True):
+    """
+    Creates upcoming partitions, then archives and removes expired, fully processed ones.
+
+    Returns:
+    - dict: Partitions created, archived (name -> location) and skipped for unprocessed rows.
+    """
+    today = today or date.today()
+    summary = {'created': 0, 'archived': {}, 'skipped': []}
+
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT create_in_invoice_processing_partitions(%s)", (months_ahead,))
+        summary['created'] = cursor.fetchone()[0]
+    conn.commit()
+
+    cutoff = retention_cutoff(today, retention_months)
+    for name, month in list_partitions(conn):
+        if month >= cutoff:
+            break
+        if has_unprocessed_rows(conn, name):
+            logger.warning(f"Keeping {name}: it still has unprocessed rows")
+            summary['skipped'].append(name)
+            conn.rollback()
+            continue
+        location = archive_partition(conn, name, sink)
+        drop_partition(conn, name, drop=drop)
+        logger.info(f"Archived {name} to {location}")
+        summary['archived'][name] = location
+
+    return summary
+
+
+def sink_from_environment():
+    """Builds the sink from ARCHIVE_BUCKET/ARCHIVE_PREFIX, else ARCHIVE_DIR."""
+    if os.environ.get('ARCHIVE_BUCKET'):
+        return S3Sink(os.environ['ARCHIVE_BUCKET'], os.environ.get('ARCHIVE_PREFIX', 'in_invoice_processing/'))
+    if os.environ.get('ARCHIVE_DIR'):
+        return LocalSink(os.environ['ARCHIVE_DIR'])
+    raise ValueError("Set ARCHIVE_BUCKET or ARCHIVE_DIR")
+
+
+def lambda_handler(event, context):
+    """Scheduled entry point; settings come from the environment."""
+    conn = connect()
+    try:
+        return run(conn, sink_from_environment(),
+                   retention_months=int(os.environ.get('RETENTION_MONTHS', '6')),
+                   months_ahead=int(os.environ.get('PARTITIONS_AHEAD', '3')))
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n', 1)[0])
+    parser.add_argument('--retention-months', type=int, default=int(os.environ.get('RETENTION_MONTHS', '6')))
+    parser.add_argument('--months-ahead', type=int, default=int(os.environ.get('PARTITIONS_AHEAD', '3')))
+    destination = parser.add_mutually_exclusive_group()
+    destination.add_argument('--bucket', help='S3 bucket for archives')
+    destination.add_argument('--directory', help='Local directory for archives')
+    parser.add_argument('--prefix', default=os.environ.get('ARCHIVE_PREFIX', 'in_invoice_processing/'))
+    parser.add_argument('--keep-detached', action='store_true',
+                        help='Detach archived partitions but do not drop them')
+    args = parser.parse_args(argv)
+
+    if args.bucket:
+        sink = S3Sink(args.bucket, args.prefix)
+    elif args.directory:
+        sink = LocalSink(args.directory)
+    else:
+        sink = sink_from_environment()
+
+    conn = connect()
+    try:
+        summary = run(conn, sink, args.retention_months, args.months_ahead, drop=not args.keep_detached)
+    finally:
+        conn.close()
+    print(summary)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,37 @@
+"""
+Lambda function that loads Textract JSON responses from S3 into the PostgreSQL staging table.
+
+With an S3 event, only the objects named in the event records are loaded. Otherwise (e.g. on a
+schedule) loading is incremental: the bucket is listed with the S3 paginator (no 1000-key limit), keys
+already present in `in_invoice_processing` are skipped, new objects are fetched concurrently by
+a bounded thread pool, and rows are inserted in batches with `execute_values` inside a single
+transaction. Each insert first registers the key in `in_invoice_processing_key`, whose unique
+`s3_object_key` backs the `ON CONFLICT DO NOTHING` (the partitioned staging table cannot enforce it),
+so overlapping runs never duplicate rows.
+
+Environment variables:
+- S3_BUCKET_NAME_TEXTRACT_JSON_RESPONSE: Bucket holding the Textract JSON responses.
+- DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT: PostgreSQL connection settings.
+- MAX_FETCH_WORKERS: Upper bound on concurrent S3 GETs.
+- INSERT_BATCH_SIZE: Objects fetched and inserted per batch.
+- DB_CONNECT_TIMEOUT: Seconds to wait when (re)connecting.
+- VENDOR_MATCH_THRESHOLD: Minimum trigram similarity for matching an existing vendor.
+
+Each staged row carries a canonical `vendor_id` from `vendor_resolver`, so OCR variants of a vendor
+name do not create new vendors when process_invoice_data runs.
+
+The database connection is kept at module level and reused across warm invocations, with a
+liveness check before each use and a reconnect when it has gone away.
+"""
 import os
 import logging
-import json
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote_plus
 import boto3
 import psycopg2
+from psycopg2.extras import execute_values
+import textract_extract
+from vendor_resolver import VendorResolver, extract_vendor
 
 # Configure logging
 logging.basicConfig(level=logging.INFO,
@@ -10,92 +39,232 @@ logging.basicConfig(level=logging.INFO,
 # Initialize the S3 client outside of the handler for potential reuse
 s3_client = boto3.client('s3')
 
+MAX_FETCH_WORKERS = int(os.environ.get('MAX_FETCH_WORKERS', '8'))
+INSERT_BATCH_SIZE = int(os.environ.get('INSERT_BATCH_SIZE', '100'))
+
+# Module-level so its cache of resolved vendor names survives warm starts.
+vendor_resolver = VendorResolver(threshold=float(os.environ.get('VENDOR_MATCH_THRESHOLD', '0.6')))
+
+# Registers new keys (skipping ones already staged) and stages only those, with the registry's id
+# and timestamp so the row lands in the current month's partition.
+INSERT_QUERY = """
+    WITH incoming (s3_object_key, textract_json, vendor_id) AS (VALUES %s),
+    registered AS (
+        INSERT INTO public.in_invoice_processing_key (s3_object_key)
+        SELECT DISTINCT s3_object_key FROM incoming
+        ON CONFLICT (s3_object_key) DO NOTHING
+        RETURNING id, s3_object_key, received_timestamp
+    )
+    INSERT INTO public.in_invoice_processing (id, s3_object_key, textract_json, received_timestamp, vendor_id)
+    SELECT DISTINCT ON (r.id) r.id, r.s3_object_key, i.textract_json, r.received_timestamp, i.vendor_id
+    FROM registered r
+    JOIN incoming i USING (s3_object_key)
+"""
+
+
+# Reused across warm invocations; see get_connection().
+_conn = None
+
+
+def get_connection():
+    """
+    Returns the module-level PostgreSQL connection, reconnecting if it is closed or dead.
+
+    The connection survives warm starts, so most invocations skip the TCP/TLS/auth handshake and
+    only pay for a `SELECT 1` liveness check.
+    """
+    global _conn  # pylint: disable=global-statement
+    if _conn is not None and not _conn.closed:
+        try:
+            with _conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            _conn.rollback()  # End the implicit transaction opened by the check.
+            return _conn
+        except psycopg2.Error as e:
+            logging.warning(f"Database connection is no longer usable, reconnecting: {e}")
+            close_connection()
+
+    _conn = psycopg2.connect(
+        dbname=os.environ['DB_NAME'],
+        user=os.environ['DB_USER'],
+        password=os.environ['DB_PASSWORD'],
+        host=os.environ['DB_HOST'],
+        port=os.environ['DB_PORT'],
+        connect_timeout=int(os.environ.get('DB_CONNECT_TIMEOUT', '5')),
+        keepalives=1,
+    )
+    logging.info("Database connection established.")
+    return _conn
+
+
+def close_connection():
+    """Closes and forgets the module-level connection."""
+    global _conn  # pylint: disable=global-statement
+    if _conn is not None:
+        try:
+            _conn.close()
+        except psycopg2.Error:
+            pass
+    _conn = None
+
+
 def lambda_handler(event, context):
     """
-    Main handler for simply transferring JSON files from S3 to PostgreSQL.
+    Main handler for transferring JSON files from S3 to PostgreSQL.
+
+    - S3 event (has 'Records'): loads only the objects named in the event, so the cost per
+      invoice is constant regardless of bucket size.
+    - Any other event (e.g. a schedule): incrementally loads every object not yet staged.
     """
     logging.info("Starting Lambda handler")
-    conn = None  # Initialize connection outside of the try block
-
-    # Retrieve environment variables for S3 bucket name
-    bucket_name = os.environ['S3_BUCKET_NAME_TEXTRACT_JSON_RESPONSE']
 
-    # Establish a connection to the PostgreSQL RDS instance
     try:
-        conn = psycopg2.connect(
-            dbname=os.environ['DB_NAME'],
-            user=os.environ['DB_USER'],
-            password=os.environ['DB_PASSWORD'],
-            host=os.environ['DB_HOST'],
-            port=os.environ['DB_PORT']
-        )
-        logging.info("Database connection established.")
+        conn = get_connection()
     except psycopg2.Error as db_err:
         logging.error(f"Failed to connect to database: {db_err}")
         return  # Stop execution if database connection fails
 
     try:
-        # Simplified: Process and load all JSON files from S3 to PostgreSQL
-        simple_process_and_load(conn, bucket_name)
+        records = (event or {}).get('Records')
+        if records:
+            return load_event_objects(conn, records)
+        # Retrieve environment variables for S3 bucket name
+        bucket_name = os.environ['S3_BUCKET_NAME_TEXTRACT_JSON_RESPONSE']
+        return simple_process_and_load(conn, bucket_name)
+    except psycopg2.Error as db_err:
+        logging.error(f"Database error during processing: {db_err}")
+        if conn.closed:
+            close_connection()
+        raise
     except Exception as proc_err:
         logging.error(f"An error occurred during processing: {proc_err}")
-    finally:
-        if conn:
-            conn.close()
-            logging.info("Database connection closed.")
+        raise
 
-def simple_process_and_load(conn, bucket_name):
+
+def load_event_objects(conn, records):
+    """
+    Loads the objects referenced by S3 event records in one transaction.
+
+    Returns:
+    - dict: Counts of loaded and failed objects.
+    """
+    objects = [
+        (record['s3']['bucket']['name'], unquote_plus(record['s3']['object']['key']))
+        for record in records
+    ]
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_FETCH_WORKERS, len(objects)))) as executor:
+        rows = [row for row in executor.map(lambda obj: fetch_json(*obj), objects) if row]
+
+    counts = {'loaded': 0, 'failed': len(objects) - len(rows)}
+    try:
+        if rows:
+            counts['loaded'] = load_json_batch(conn, rows)
+        conn.commit()
+    except psycopg2.Error:
+        vendor_resolver.clear_cache()
+        if not conn.closed:
+            conn.rollback()
+        raise
+    logging.info(f"Loaded event objects: {counts}")
+    return counts
+
+
+def load_known_keys(conn):
     """
-     This function reads JSON data from files stored in an S3 bucket and writes (loads)
-    this data into a PostgreSQL database. It does not physically move the S3 files but processes their content. 
+    Returns the set of S3 object keys already staged, from the `in_invoice_processing_key` registry
+    (which also covers archived partitions).
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT s3_object_key FROM public.in_invoice_processing_key")
+        return {row[0] for row in cursor}
+
+
+def list_new_keys(bucket_name, known_keys):
+    """
+    Yields every key in the bucket that is not in `known_keys`, across all listing pages.
+    """
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket_name):
+        for item in page.get('Contents', []):
+            if item['Key'] not in known_keys:
+                yield item['Key']
+
+
+def fetch_json(bucket_name, key):
+    """
+    Fetches one object and returns (key, JSON text, vendor fields), or None if it cannot be read or parsed.
+
+    The response (plain or gzip-compressed) is stream-parsed into the compact form from
+    textract_extract, which drops Blocks and geometry; only that form is staged.
     """
-    # Logging the start of the S3 bucket listing process
-    logging.info("Listing objects in bucket: {}".format(bucket_name))
     try:
-        response = s3_client.list_objects_v2(Bucket=bucket_name)
-        logging.info("Objects listed in bucket: {}".format(bucket_name))
-
-        if 'Contents' in response:
-            for item in response['Contents']:
-                key = item['Key']
-                # Log the start of processing for each object
-                logging.info("Processing object: {}".format(key))
-
-                try:
-                    # Log the start of fetching the object from S3
-                    logging.info("Fetching object: {}".format(key))
-                    obj = s3_client.get_object(Bucket=bucket_name, Key=key)
-                    logging.info("Object fetched: {}".format(key))
-
-                    # Decode the JSON data from the object
-                    json_data = json.loads(obj['Body'].read())
-                    logging.info("JSON data processed for key: {}".format(key))
-                
-                    # Here, directly load each JSON file's content to PostgreSQL
-                    load_json_to_postgres(conn, key, json_data)
-                    logging.info("JSON data loaded to PostgreSQL for key: {}".format(key))
-                except Exception as e:
-                    logging.error(f"Error processing objects from bucket {bucket_name}: {e}")
-        else:
-            logging.info("No objects found in bucket: {}".format(bucket_name))
+        body = s3_client.get_object(Bucket=bucket_name, Key=key)['Body']
+        document = textract_extract.extract(textract_extract.open_json_stream(body))
+        return key, textract_extract.dumps(document), extract_vendor(document)
     except Exception as e:
-        logging.error(f"Error listing objects in bucket {bucket_name}: {e}")
+        logging.error(f"Error processing object {key} from bucket {bucket_name}: {e}")
+        return None
 
-def load_json_to_postgres(conn, key, json_data):
+
+def load_json_batch(conn, rows):
     """
-    Loads a single JSON object's content into the PostgreSQL table.
+    Resolves the vendor of each fetched row (see fetch_json), then inserts the batch with a single
+    multi-row INSERT.
+
+    The caller owns the transaction.
     """
+    values = []
+    for key, body, vendor in rows:
+        vendor = dict(vendor)
+        values.append((key, body, vendor_resolver.resolve(conn, vendor.pop('name', None), **vendor)))
+    with conn.cursor() as cursor:
+        execute_values(cursor, INSERT_QUERY, values,
+                       template="(%s, %s::jsonb, %s::integer)", page_size=len(values))
+        return cursor.rowcount
+
+
+def _batches(iterable, size):
+    """Yields lists of up to `size` items from `iterable`."""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def simple_process_and_load(conn, bucket_name):
+    """
+    This function reads JSON data from new files stored in an S3 bucket and writes (loads)
+    this data into a PostgreSQL database. It does not physically move the S3 files but processes their content.
+
+    All batches are committed together; any database error rolls the whole run back.
+
+    Returns:
+    - dict: Counts of listed-new, loaded and failed objects.
+    """
+    logging.info("Listing new objects in bucket: {}".format(bucket_name))
+    known_keys = load_known_keys(conn)
+    counts = {'new': 0, 'loaded': 0, 'failed': 0}
+
     try:
-        with conn.cursor() as cursor:
-            # Assume your table and columns are set up to take JSON data directly.
-            # This may need adjustment based on your actual database schema.
-            insert_query = """
-            INSERT INTO public.in_invoice_processing (s3_object_key, textract_json) VALUES (%s, %s::jsonb)
-            """
-            logging.info(f"Preparing to insert JSON from {key} into PostgreSQL.")
-
-            cursor.execute(insert_query, (key, json.dumps(json_data)))
-            conn.commit()
-            logging.info(f"Inserted JSON from {key} into PostgreSQL.")
+        with ThreadPoolExecutor(max_workers=MAX_FETCH_WORKERS) as executor:
+            for keys in _batches(list_new_keys(bucket_name, known_keys), INSERT_BATCH_SIZE):
+                counts['new'] += len(keys)
+                rows = [row for row in executor.map(lambda key: fetch_json(bucket_name, key), keys) if row]
+                counts['failed'] += len(keys) - len(rows)
+                if rows:
+                    counts['loaded'] += load_json_batch(conn, rows)
+                    logging.info(f"Inserted {len(rows)} JSON objects into PostgreSQL.")
+        conn.commit()
     except psycopg2.Error as e:
-        logging.error(f"Failed to insert JSON from {key}: {e}")
+        vendor_resolver.clear_cache()
+        if not conn.closed:
+            conn.rollback()
+        logging.error(f"Failed to load JSON objects from bucket {bucket_name}: {e}")
+        raise
+
+    logging.info(f"Load complete for bucket {bucket_name}: {counts}")
+    return counts
@@ -1,149 +1,180 @@
-"""  
-Lambda function handler for processing PDF invoices and receipts using Amazon Textract.
-
-This function is triggered by the upload of a PDF invoice or receipt to an S3 bucket. It initiates
-an asynchronous analysis of the document using Amazon Textract's Start Expense Analysis operation. Once the
-analysis is complete, the resulting JSON response is saved to another S3 bucket. 
-
-Phase 1 of Lambda Development
 """
+Lambda function handlers for processing PDF invoices and receipts using Amazon Textract.
+
+The work is split into two completion-driven handlers so no Lambda ever sleeps while Textract runs:
+
+1. `lambda_handler` is triggered by the upload of a PDF invoice or receipt to an S3 bucket. It starts
+   an asynchronous analysis of the document using Amazon Textract's Start Expense Analysis operation,
+   asking Textract to publish the job's completion to an SNS topic, and returns immediately.
+2. `completion_handler` is subscribed to that SNS topic. When a job completes it fetches every page
+   of the result (following `NextToken`), merges them, and saves the JSON response, gzip-compressed, to
+   another S3 bucket under '<source object key>.json'.
+
+Both handlers use the module-level `textract_client` and `s3_client`, so tests can swap in clients
+wrapped with `botocore.stub.Stubber`.
+
+Environment variables:
+- TEXTRACT_SNS_TOPIC_ARN: SNS topic Textract publishes job completion to.
+- TEXTRACT_SNS_ROLE_ARN: IAM role Textract assumes to publish to the topic.
+- TEXTRACT_JSON_BUCKET: Bucket receiving the JSON responses (default 'ccwebapp-textract-json').
+- STORE_RAW_JSON: 'true' (default) keeps the full response; 'false' saves only the compact form
+  from textract_extract (no Blocks or geometry), which is all the loader stages.
+"""
+import os
 import json
-import time
+import hashlib
 import logging
+from urllib.parse import unquote_plus
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError
+import textract_extract
 
 
 # Configure logging level
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger()
 
+# Created once per container; adaptive retries absorb Textract throttling on result pages.
+textract_client = boto3.client('textract', config=Config(retries={'max_attempts': 10, 'mode': 'adaptive'}))
+s3_client = boto3.client('s3')
+
+OUTPUT_BUCKET = os.environ.get('TEXTRACT_JSON_BUCKET', 'ccwebapp-textract-json')
+STORE_RAW_JSON = os.environ.get('STORE_RAW_JSON', 'true').lower() == 'true'
+
+
 def lambda_handler(event, context):
     """
-    Lambda function handler
+    Start handler: submits every uploaded document in the S3 event to Textract and returns.
+
     Parameters:
     - event (dict): A dictionary containing information about the event that triggered the function.
-                    In this case, it contains details about the uploaded file in the S3 bucket.
+                    In this case, it contains details about the uploaded file(s) in the S3 bucket.
     - context (LambdaContext): An object containing runtime information for the Lambda function.
 
     Returns:
-    - dict: A dictionary containing the HTTP status code and the JSON response generated by Textract.
+    - dict: A dictionary containing the HTTP status code and the started Textract job ids.
 
     Raises:
-    - Exception: If Textract processing fails or if the maximum wait time for processing is exceeded.
+    - ClientError: If Textract refuses to start a job, so the S3 event is retried.
 
     Note:
-    - The function uses the start_expense_analysis method to initiate the analysis asynchronously.
-    - It periodically checks the status of the analysis using the get_expense_analysis method.
-    - Once the analysis is successful, the JSON response is saved to the designated S3 bucket.
-    - A timeout mechanism is implemented to prevent waiting indefinitely for Textract processing. 
+    - A ClientRequestToken derived from the object's bucket, key and ETag makes Lambda retries of the
+      same upload return the already-running job instead of starting (and billing) a second one.
     """
+    notification_channel = {
+        'SNSTopicArn': os.environ['TEXTRACT_SNS_TOPIC_ARN'],
+        'RoleArn': os.environ['TEXTRACT_SNS_ROLE_ARN'],
+    }
+
+    jobs = []
+    for record in event['Records']:
+        bucket_name = record['s3']['bucket']['name'] #extracts the name of the S3 bucket from the event data.
+        object_key = unquote_plus(record['s3']['object']['key']) #extracts the key (i.e., the path) of the object (file) that triggered the event.
+        etag = record['s3']['object'].get('eTag', '')
+        request_token = hashlib.sha1(f'{bucket_name}/{object_key}/{etag}'.encode('utf-8')).hexdigest()
+
+        try:
+            # Invoke Textract's start_expense_analysis method on the uploaded PDF
+            response = textract_client.start_expense_analysis(
+                DocumentLocation={
+                    'S3Object': {
+                        'Bucket': bucket_name,
+                        'Name': object_key
+                    }
+                },
+                NotificationChannel=notification_channel,
+                ClientRequestToken=request_token,
+            )
+        except ClientError as e:
+            logger.error(f"ClientError in start_expense_analysis for {object_key}: {e.response['Error']['Message']}")
+            raise
+
+        logger.info(f"Started expense analysis job {response['JobId']} for {object_key}")
+        jobs.append({'JobId': response['JobId'], 'Key': object_key})
 
-    # Retrieve the S3 bucket name and object key from the event
-    bucket_name = event['Records'][0]['s3']['bucket']['name'] #extracts the name of the S3 bucket from the event data.
-    object_key = event['Records'][0]['s3']['object']['key'] #extracts the key (i.e., the path) of the object (file) that triggered the event.
-    
-    # Extract filename from the object key
-    filename = object_key.split('/')[-1] #[-1]: index is used to access the last element of the list returned by the split()
-
-    # Initialize the Textract client
-    textract_client = boto3.client('textract')
-    
-    try:
-        # Invoke Textract's start_expense_analysis method on the uploaded PDF
-        response = textract_client.start_expense_analysis(
-            DocumentLocation={
-                'S3Object': {
-                    'Bucket': bucket_name,
-                    'Name': object_key
-                }
-            }
-            #OutputConfig={'S3Bucket': 'ccwebapp-textract-json',},# parameter speciffies s3 bucket to store any output artifacts 
-        )
-        # Retrieve the job ID from the start response
-        job_id = response['JobId']
-    except ClientError as e:
-        logger.error(f"ClientError in start_expense_analysis for {object_key}: {e.response['Error']['Message']}")
-    except Exception as e:
-        logger.error(f"Failed to start expense analysis for {object_key} in {bucket_name}: {str(e)}")    
-
-    
-    try:
-        textract_result = get_expense_analysis_with_retry(textract_client, job_id)
-    except Exception as e:
-        raise Exception(f"Failed to get Textract results after retries: {str(e)}")
-    
-    # Extract the JSON response from the Textract Dictionary result
-    json_response = json.dumps(textract_result)
-    
-    s3_client = boto3.client('s3')
-    try:
-        s3_client.put_object(
-            Bucket='ccwebapp-textract-json',
-            Key=f'{filename}.json',
-            Body=json_response
-        )
-    except ClientError as e:
-        logger.error(f"ClientError in saving JSON to S3 for {filename}.json: {e.response['Error']['Message']}")
-        raise
-    except Exception as e:
-        logger.error(f"Unexpected error in saving JSON to S3 for {filename}.json: {str(e)}")
-        raise
-    
     return {
-        'statusCode': 200,
-        'body': json_response
+        'statusCode': 202,
+        'body': json.dumps({'jobs': jobs})
     }
 
 
+def completion_handler(event, context):
+    """
+    Completion handler: subscribed to the Textract SNS topic.
+
+    For every succeeded job in the notification, retrieves all result pages and saves the merged
+    JSON response to OUTPUT_BUCKET. Failed jobs are logged and skipped, since retrying the
+    notification cannot change their outcome.
+
+    Parameters:
+    - event (dict): SNS event whose messages are Textract job completion notifications.
+    - context (LambdaContext): An object containing runtime information for the Lambda function.
+
+    Returns:
+    - dict: A dictionary containing the HTTP status code and the saved/failed jobs.
+    """
+    saved, failed = [], []
+    for record in event['Records']:
+        message = json.loads(record['Sns']['Message'])
+        job_id = message['JobId']
+        object_key = message['DocumentLocation']['S3ObjectName']
+
+        if message['Status'] != 'SUCCEEDED':
+            logger.error(f"Textract processing {message['Status']} for JobId {job_id} ({object_key})")
+            failed.append(job_id)
+            continue
+
+        textract_result = get_expense_analysis(textract_client, job_id)
+        if not STORE_RAW_JSON:
+            textract_result = textract_extract.compact(textract_result)
+        output_key = f'{object_key}.json'
+        try:
+            s3_client.put_object(
+                Bucket=OUTPUT_BUCKET,
+                Key=output_key,
+                Body=textract_extract.dumps_gzip(textract_result),
+                ContentType='application/json',
+                ContentEncoding='gzip',
+            )
+        except ClientError as e:
+            logger.error(f"ClientError in saving JSON to S3 for {output_key}: {e.response['Error']['Message']}")
+            raise
+        logger.info(f"Saved Textract result for JobId {job_id} to {output_key}")
+        saved.append(output_key)
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps({'saved': saved, 'failed': failed})
+    }
+
 
-def get_expense_analysis_with_retry(textract_client, job_id, max_attempts=5):
+def get_expense_analysis(textract_client, job_id):
     """
-    Retrieves the Textract expense analysis result with retry logic.
+    Retrieves the complete result of a finished Textract expense analysis job.
 
-    Implements an exponential backoff strategy for retries to handle transient errors or rate limiting
-    by the Textract service. This function polls the Textract service for the completion of the expense
-    analysis job and returns the result once the job succeeds.
+    Textract returns large results in pages; this follows `NextToken` until the last page and
+    merges the `ExpenseDocuments` of every page into the first response.
 
     Parameters:
     - textract_client (boto3.client): A Boto3 Textract client.
     - job_id (str): The job identifier for the Textract expense analysis request.
-    - max_attempts (int): Maximum number of retry attempts. Default is 5.
 
     Returns:
-    - dict: The JSON response from Textract containing the analysis result once the job status is 'SUCCEEDED'.
+    - dict: The merged get_expense_analysis response, without a `NextToken`.
 
     Raises:
-    - Exception: If the job status is 'FAILED', if all retry attempts are exhausted without success,
-      or if an unexpected error occurs.
+    - Exception: If the job did not succeed.
     """
-
-    for attempt in range(max_attempts):
-        try:
-            # Wait before retrying using exponential backoff strategy
-            time.sleep(2 ** attempt)  # Exponential backoff
-            # Poll the Textract job status
-            response = textract_client.get_expense_analysis(JobId=job_id)
-            status = response['JobStatus']
-
-            if status == 'SUCCEEDED':
-                # Job succeeded, return the analysis result
-                return response
-            elif status == 'FAILED':
-                # Job failed, log and raise an exception
-                logger.error(f"Textract processing failed for JobId {job_id}")
-                raise Exception('Textract processing failed')
-        except ClientError as e:
-            # Handle client errors from the Textract service, such as rate limits or other service issues
-            logger.error(f"ClientError in get_expense_analysis for JobId {job_id}: {e.response['Error']['Message']}")
-            if attempt >= max_attempts - 1:
-                # Exhausted all attempts, re-raise the exception
-                raise
-        except Exception as e:
-            # Handle unexpected errors
-            logger.error(f"Unexpected error in get_expense_analysis for JobId {job_id}: {str(e)}")
-            if attempt >= max_attempts - 1:
-                # Exhausted all attempts, re-raise the exception
-                raise
-    # If the loop completes without returning or raising an exception for 'SUCCEEDED' status, raise a timeout exception
-    raise Exception('Timeout: Textract processing took too long or exceeded retry attempts')
+    response = textract_client.get_expense_analysis(JobId=job_id)
+    if response['JobStatus'] != 'SUCCEEDED':
+        raise Exception(f"Textract job {job_id} is {response['JobStatus']}")
+
+    next_token = response.pop('NextToken', None)
+    while next_token:
+        page = textract_client.get_expense_analysis(JobId=job_id, NextToken=next_token)
+        response['ExpenseDocuments'].extend(page.get('ExpenseDocuments', []))
+        next_token = page.get('NextToken')
+
+    response.pop('ResponseMetadata', None)
+    return response
@@ -0,0 +1,174 @@
+"""
+Extracts the parts of a Textract expense analysis response the pipeline uses.
+
+A `get_expense_analysis` response is dominated by `Blocks` (every word and line on the page) and by
+`Geometry` bounding boxes, neither of which the SQL layer reads. `extract` parses a response and keeps
+only what elt/sql uses:
+- the `SummaryFields` and `LineItemGroups` of each expense document;
+- for each field, the type, label and value text with their confidences, the group types, the
+  currency and the page number.
+The output keeps Textract's shape, so `textract_json->'ExpenseDocuments'` queries work unchanged
+on the compact document, which is typically a tenth of the size.
+
+When `ijson` is installed, the response is stream-parsed: Blocks and geometry are skipped as events
+and never materialized, so memory is bounded by the largest single field. Without it, the response
+is parsed with `json` and then pruned.
+"""
+import io
+import gzip
+import json
+
+try:
+    import ijson
+except ImportError:  # pragma: no cover - exercised where ijson is not installed
+    ijson = None
+
+DOCUMENT_PREFIX = 'ExpenseDocuments.item'
+SUMMARY_FIELD_PREFIX = 'ExpenseDocuments.item.SummaryFields.item'
+LINE_ITEM_GROUP_PREFIX = 'ExpenseDocuments.item.LineItemGroups.item'
+
+# Keys dropped wherever they appear inside a kept field.
+SKIPPED_KEYS = frozenset({'Geometry', 'Id'})
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+def compact_detection(detection):
+    """Returns {'Text', 'Confidence'} of a Type/LabelDetection/ValueDetection, or None."""
+    if not detection:
+        return None
+    compact = {'Text': detection.get('Text')}
+    if detection.get('Confidence') is not None:
+        compact['Confidence'] = round(float(detection['Confidence']), 2)
+    return compact
+
+
+def compact_field(field):
+    """Returns a summary or line-item expense field without geometry or ids."""
+    compact = {'Type': compact_detection(field.get('Type'))}
+    for key in ('LabelDetection', 'ValueDetection'):
+        detection = compact_detection(field.get(key))
+        if detection:
+            compact[key] = detection
+    if field.get('GroupProperties'):
+        compact['GroupProperties'] = [{'Types': group.get('Types', [])} for group in field['GroupProperties']]
+    if field.get('Currency'):
+        compact['Currency'] = {'Code': field['Currency'].get('Code')}
+    if field.get('PageNumber') is not None:
+        compact['PageNumber'] = field['PageNumber']
+    return compact
+
+
+def compact_line_item_group(group):
+    """Returns a LineItemGroup whose line items hold only compacted expense fields."""
+    return {
+        'LineItemGroupIndex': group.get('LineItemGroupIndex'),
+        'LineItems': [
+            {'LineItemExpenseFields': [compact_field(field) for field in line_item.get('LineItemExpenseFields', [])]}
+            for line_item in group.get('LineItems', [])
+        ],
+    }
+
+
+def compact(response):
+    """Returns the compact form of an already-parsed response (idempotent)."""
+    result = {
+        'ExpenseDocuments': [
+            {
+                'ExpenseIndex': document.get('ExpenseIndex'),
+                'SummaryFields': [compact_field(field) for field in document.get('SummaryFields', [])],
+                'LineItemGroups': [compact_line_item_group(group) for group in document.get('LineItemGroups', [])],
+            }
+            for document in response.get('ExpenseDocuments', [])
+        ],
+    }
+    if 'DocumentMetadata' in response:
+        result['DocumentMetadata'] = response['DocumentMetadata']
+    return result
+
+
+def extract(stream):
+    """
+    Parses a Textract expense response from a binary file-like object and returns its compact form.
+
+    Raises ValueError if the stream is not valid JSON, whichever parser is used.
+    """
+    if ijson is None:
+        return compact(json.load(stream))
+    try:
+        return _extract_streaming(stream)
+    except ijson.JSONError as e:
+        raise ValueError(f"Invalid Textract JSON: {e}") from e
+
+
+def _extract_streaming(stream):
+    """ijson implementation of `extract`: only summary fields and line-item groups are built."""
+    result = {'ExpenseDocuments': []}
+    document = None
+    builder = None
+    building = None
+    for prefix, event, value in ijson.parse(stream, use_float=True):
+        if builder is not None:
+            # Skip a dropped key and every event beneath it, so its value is never built.
+            if (event == 'map_key' and value in SKIPPED_KEYS) or not SKIPPED_KEYS.isdisjoint(prefix.split('.')):
+                continue
+            builder.event(event, value)
+            if prefix == building and event == 'end_map':
+                if building == SUMMARY_FIELD_PREFIX:
+                    document['SummaryFields'].append(compact_field(builder.value))
+                else:
+                    document['LineItemGroups'].append(compact_line_item_group(builder.value))
+                builder = None
+            continue
+
+        if event == 'start_map' and prefix == DOCUMENT_PREFIX:
+            document = {'ExpenseIndex': None, 'SummaryFields': [], 'LineItemGroups': []}
+            result['ExpenseDocuments'].append(document)
+        elif event == 'start_map' and prefix in (SUMMARY_FIELD_PREFIX, LINE_ITEM_GROUP_PREFIX):
+            building = prefix
+            builder = ijson.ObjectBuilder()
+            builder.event(event, value)
+        elif prefix == 'ExpenseDocuments.item.ExpenseIndex':
+            document['ExpenseIndex'] = value
+        elif prefix == 'DocumentMetadata.Pages':
+            result['DocumentMetadata'] = {'Pages': value}
+    return result
+
+
+class _Prefixed(io.RawIOBase):
+    """A readable stream that replays already-read bytes before the rest of `fileobj`."""
+
+    def __init__(self, head, fileobj):
+        super().__init__()
+        self._head = head
+        self._fileobj = fileobj
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._head:
+            size = min(len(buffer), len(self._head))
+            buffer[:size] = self._head[:size]
+            self._head = self._head[size:]
+            return size
+        chunk = self._fileobj.read(len(buffer))
+        buffer[:len(chunk)] = chunk
+        return len(chunk)
+
+
+def open_json_stream(fileobj):
+    """Wraps a binary stream (e.g. an S3 StreamingBody) for `extract`, transparently gunzipping it."""
+    head = fileobj.read(2)
+    stream = io.BufferedReader(_Prefixed(head, fileobj))
+    return gzip.GzipFile(fileobj=stream) if head == GZIP_MAGIC else stream
+
+
+def dumps(document):
+    """Serializes a compact document without whitespace."""
+    return json.dumps(document, separators=(',', ':'))
+
+
+def dumps_gzip(document):
+    """Serializes a document (raw or compact) as gzip-compressed JSON bytes."""
+    return gzip.compress(json.dumps(document, separators=(',', ':')).encode('utf-8'))
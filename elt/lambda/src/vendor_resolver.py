@@ -0,0 +1,187 @@
+"""
+Vendor resolution: maps the vendor name Textract read off an invoice to one canonical `Vendors` row.
+
+OCR produces many spellings of the same supplier ("KX Wholesale Seafood", "KX WHOLESALE SEAFOOD, INC.",
+"KX Wholsale Seafood"), and keying vendors on the raw text makes every variant a new vendor. Resolution
+runs cheapest-first:
+
+1. In-process cache of normalized name -> vendor id (survives warm Lambda starts).
+2. `vendor_alias` primary-key lookup, holding every spelling already resolved.
+3. Fuzzy candidates: with PostgreSQL, the pg_trgm `%` operator on the GIN-indexed `normalized_name`;
+   elsewhere (SQLite in tests), candidates sharing the blocking key are scored with a pure-Python port
+   of pg_trgm's similarity.
+4. Otherwise a new vendor is inserted.
+
+Matches are recorded in `vendor_alias`, so a spelling is only fuzzy-matched once.
+
+`normalize_vendor_name` must stay in sync with elt/sql/functions/normalize_vendor_name.sql, which
+process_invoice_data uses for rows the loader has not resolved.
+"""
+import re
+import logging
+import sqlite3
+from collections import OrderedDict
+
+# Legal-form tokens dropped from names, so "KX Seafood Inc." and "KX Seafood" normalize alike.
+LEGAL_SUFFIXES = frozenset({'INC', 'LLC', 'LTD', 'CO', 'CORP', 'CORPORATION', 'COMPANY', 'INCORPORATED'})
+
+DEFAULT_THRESHOLD = 0.6
+DEFAULT_CACHE_SIZE = 4096
+
+
+def normalize_vendor_name(name):
+    """
+    Returns the canonical comparison form of a vendor name: upper case, '&' spelled 'AND',
+    punctuation removed, whitespace collapsed and legal suffixes dropped. Empty input gives ''.
+    """
+    text = (name or '').upper().replace('&', ' AND ')
+    text = re.sub(r'[^A-Z0-9 ]+', ' ', text)
+    return ' '.join(token for token in text.split() if token not in LEGAL_SUFFIXES)
+
+
+def blocking_key(normalized_name):
+    """Returns the coarse key fuzzy candidates must share: the first token of the normalized name."""
+    return normalized_name.split(' ', 1)[0]
+
+
+def trigrams(text):
+    """Returns the pg_trgm trigram set of `text` (each word padded with two leading and one trailing space)."""
+    grams = set()
+    for word in re.findall(r'[a-z0-9]+', text.lower()):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(a, b):
+    """Pure-Python equivalent of pg_trgm's similarity(a, b)."""
+    grams_a, grams_b = trigrams(a), trigrams(b)
+    if not grams_a or not grams_b:
+        return 0.0
+    return len(grams_a & grams_b) / len(grams_a | grams_b)
+
+
+class VendorResolver:
+    """
+    Resolves vendor names to `Vendors.VendorID` over a DB-API connection (psycopg2 or sqlite3).
+
+    The connection is passed per call so a reconnect does not discard the cache. The caller owns the
+    transaction; call `clear_cache()` after a rollback, since cached ids may refer to rolled-back rows.
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, cache_size=DEFAULT_CACHE_SIZE):
+        self.threshold = threshold
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    def resolve(self, conn, name, **details):
+        """
+        Returns the vendor id for `name`, creating the vendor if nothing matches, or None for a blank name.
+
+        `details` may carry vendor_address, vendor_phone, vendor_url, street, city, state, country and
+        zip_code; they are only used when a new vendor is inserted.
+        """
+        normalized = normalize_vendor_name(name)
+        if not normalized:
+            return None
+
+        vendor_id = self._cache_get(normalized)
+        if vendor_id is not None:
+            return vendor_id
+
+        sqlite = isinstance(conn, sqlite3.Connection)
+        placeholder = '?' if sqlite else '%s'
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"SELECT vendor_id FROM vendor_alias WHERE alias_key = {placeholder}", (normalized,))
+            row = cursor.fetchone()
+            if row:
+                vendor_id = row[0]
+            else:
+                vendor_id = self._find_similar(cursor, normalized, sqlite)
+                if vendor_id is None:
+                    vendor_id = self._insert_vendor(cursor, name, normalized, details, sqlite)
+                    logging.info(f"Created vendor {vendor_id} for {normalized!r}")
+                cursor.execute(
+                    f"INSERT INTO vendor_alias (alias_key, vendor_id) VALUES ({placeholder}, {placeholder}) "
+                    "ON CONFLICT (alias_key) DO NOTHING",
+                    (normalized, vendor_id))
+        finally:
+            cursor.close()
+
+        self._cache_put(normalized, vendor_id)
+        return vendor_id
+
+    def clear_cache(self):
+        """Forgets every cached mapping."""
+        self._cache.clear()
+
+    def _find_similar(self, cursor, normalized, sqlite):
+        """Returns the id of the most similar existing vendor at or above the threshold, or None."""
+        if sqlite:
+            cursor.execute("SELECT VendorID, normalized_name FROM Vendors WHERE blocking_key = ?",
+                           (blocking_key(normalized),))
+            scored = [(similarity(normalized, candidate), vendor_id) for vendor_id, candidate in cursor.fetchall()]
+            best = max(scored, default=None)
+        else:
+            # `%` uses the GIN trigram index; similarity() ranks the (few) candidates it returns.
+            cursor.execute(
+                "SELECT similarity(normalized_name, %s) AS score, VendorID FROM Vendors "
+                "WHERE normalized_name %% %s ORDER BY score DESC LIMIT 1",
+                (normalized, normalized))
+            best = cursor.fetchone()
+        if best and best[0] >= self.threshold:
+            return best[1]
+        return None
+
+    @staticmethod
+    def _insert_vendor(cursor, name, normalized, details, sqlite):
+        """Inserts a vendor and returns its id; a concurrent insert of the same name returns that row."""
+        columns = ('VENDOR_NAME', 'normalized_name', 'blocking_key', 'VENDOR_ADDRESS', 'VENDOR_PHONE',
+                   'VENDOR_URL', 'STREET', 'CITY', 'STATE', 'COUNTRY', 'ZIP_CODE')
+        values = (name.strip(), normalized, blocking_key(normalized), details.get('vendor_address'),
+                  details.get('vendor_phone'), details.get('vendor_url'), details.get('street'),
+                  details.get('city'), details.get('state'), details.get('country'), details.get('zip_code'))
+        placeholder = '?' if sqlite else '%s'
+        cursor.execute(
+            f"INSERT INTO Vendors ({', '.join(columns)}) VALUES ({', '.join([placeholder] * len(columns))}) "
+            "ON CONFLICT (normalized_name) DO NOTHING",
+            values)
+        cursor.execute(f"SELECT VendorID FROM Vendors WHERE normalized_name = {placeholder}", (normalized,))
+        return cursor.fetchone()[0]
+
+    def _cache_get(self, key):
+        vendor_id = self._cache.get(key)
+        if vendor_id is not None:
+            self._cache.move_to_end(key)
+        return vendor_id
+
+    def _cache_put(self, key, vendor_id):
+        self._cache[key] = vendor_id
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+
+def extract_vendor(textract_json):
+    """
+    Returns the vendor fields of a parsed Textract expense response as keyword arguments for
+    `VendorResolver.resolve` (plus 'name'), taking the first value of each type in document order.
+    Address parts come only from the group Textract tags as VENDOR.
+    """
+    simple = {'VENDOR_NAME': 'name', 'VENDOR_ADDRESS': 'vendor_address',
+              'VENDOR_PHONE': 'vendor_phone', 'VENDOR_URL': 'vendor_url'}
+    grouped = {'STREET': 'street', 'CITY': 'city', 'STATE': 'state', 'COUNTRY': 'country', 'ZIP_CODE': 'zip_code'}
+    vendor = {}
+    for document in textract_json.get('ExpenseDocuments', []):
+        for field in document.get('SummaryFields', []):
+            field_type = field.get('Type', {}).get('Text')
+            value = (field.get('ValueDetection', {}).get('Text') or '').strip()
+            if not value:
+                continue
+            if field_type in simple:
+                vendor.setdefault(simple[field_type], value)
+            elif field_type in grouped and any('VENDOR' in group.get('Types', [])
+                                               for group in field.get('GroupProperties', [])):
+                vendor.setdefault(grouped[field_type], value)
+    return vendor
@@ -3,51 +3,114 @@ Unit tests for the AWS Lambda image preprocessing function.
 
 This module contains unit tests for the Lambda function defined in image_preprocessor.py.
 It uses the unittest framework for defining test cases and the unittest.mock library
-for mocking AWS services and image processing functionalities.
+for mocking AWS services. Images are generated in memory with Pillow.
+
+Run from the repository root:
+    python -m pytest elt/lambda/unit-tests/lambda_tests.py
 """
+import io
+import os
+import sys
 import unittest
-from unittest.mock import patch, MagicMock
-import elt.lambda.src.image_preprocessor as image_preprocessor
+from unittest.mock import patch, ANY
+from PIL import Image
+
+# The Lambda sources are deployed flat, so import them the same way the runtime does.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import image_preprocessor  # pylint: disable=wrong-import-position
+
+
+def make_image_bytes(size, image_format='JPEG'):
+    """Return an encoded solid-colour image of the given size."""
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color=(200, 30, 30)).save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+def s3_event(*keys):
+    """Build an S3 put event with one record per key."""
+    return {
+        'Records': [
+            {'s3': {'bucket': {'name': 'source-bucket'}, 'object': {'key': key}}}
+            for key in keys
+        ]
+    }
+
 
 class TestImagePreprocessorLambda(unittest.TestCase):
 
-    @patch('image_preprocessor.s3_client')
-    @patch('image_preprocessor.Image')
-    def test_lambda_handler(self, mock_image, mock_s3_client):
-        # Mock S3 event data
-        event = {
-            'Records': [
-                {
-                    's3': {
-                        'bucket': {
-                            'name': 'source-bucket'
-                        },
-                        'object': {
-                            'key': 'test.jpg'
-                        }
-                    }
-                }
-            ]
-        }
-        context = None  # Context is often not needed for basic testing
-
-        # Mock for s3_client.download_file
-        mock_s3_client.download_file.side_effect = lambda bucket, key, file: file.write(b'test data')
-
-        # Mock for s3_client.upload_file
-        mock_s3_client.upload_file.side_effect = MagicMock()
-
-        # Mock for Image.open and resize
-        mock_image_open = mock_image.open.return_value.__enter__.return_value
-        mock_image_open.resize.return_value = mock_image_open
-
-        # Call the lambda_handler function
-        image_preprocessor.lambda_handler(event, context)
-
-        # Assertions to verify expected behavior
-        mock_s3_client.download_file.assert_called_with('source-bucket', 'test.jpg', ANY)
-        mock_s3_client.upload_file.assert_called_with(ANY, 'your-resized-image-bucket', 'test.jpg')
-        mock_image_open.resize.assert_called_with((1280, 720))
+    def setUp(self):
+        patcher = patch.object(image_preprocessor, 's3_client')
+        self.mock_s3_client = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.uploads = {}
+
+        def get_object(Bucket, Key):  # pylint: disable=invalid-name,unused-argument
+            return {'Body': io.BytesIO(make_image_bytes((4000, 3000)))}
+
+        def upload_fileobj(fileobj, bucket, key, ExtraArgs=None):  # pylint: disable=invalid-name,unused-argument
+            self.uploads[key] = fileobj.read()
+
+        self.mock_s3_client.get_object.side_effect = get_object
+        self.mock_s3_client.upload_fileobj.side_effect = upload_fileobj
+
+    def test_lambda_handler(self):
+        image_preprocessor.lambda_handler(s3_event('images/user_1_test.jpeg'), None)
+
+        # Assertions to verify expected behavior: one download, one upload per derivative.
+        self.mock_s3_client.get_object.assert_called_once_with(Bucket='source-bucket', Key='images/user_1_test.jpeg')
+        self.mock_s3_client.upload_fileobj.assert_any_call(
+            ANY, image_preprocessor.DESTINATION_BUCKET, 'thumb/images/user_1_test.jpg',
+            ExtraArgs={'ContentType': 'image/jpeg'})
+        self.assertEqual(set(self.uploads), {
+            'train/images/user_1_test.jpg', 'preview/images/user_1_test.jpg', 'thumb/images/user_1_test.jpg'})
+
+        # A 4:3 source keeps its aspect ratio in every derivative.
+        expected_sizes = {'train': (960, 720), 'preview': (640, 480), 'thumb': (160, 120)}
+        for name, size in expected_sizes.items():
+            with Image.open(io.BytesIO(self.uploads[f'{name}/images/user_1_test.jpg'])) as derivative:
+                self.assertEqual(derivative.size, size)
+
+    def test_keys_with_slashes_and_encoding(self):
+        image_preprocessor.lambda_handler(s3_event('images/user_1_my+photo.jpg'), None)
+
+        self.assertIn('thumb/images/user_1_my photo.jpg', self.uploads)
+
+    def test_processes_all_records_before_failing(self):
+        self.mock_s3_client.get_object.side_effect = [
+            {'Body': io.BytesIO(b'not an image')},
+            {'Body': io.BytesIO(make_image_bytes((100, 50)))},
+        ]
+
+        with patch.object(image_preprocessor, 'MAX_CONCURRENT_RECORDS', 1):
+            with self.assertRaises(RuntimeError):
+                image_preprocessor.lambda_handler(s3_event('bad.jpg', 'good.jpg'), None)
+
+        self.assertIn('thumb/good.jpg', self.uploads)
+
+    def test_generate_derivatives_does_not_upscale(self):
+        derivatives = image_preprocessor.parse_derivatives('small:160x160, large:1280x720')
+        self.assertEqual([name for name, _ in derivatives], ['large', 'small'])
+
+        outputs = image_preprocessor.generate_derivatives(io.BytesIO(make_image_bytes((100, 50), 'PNG')), derivatives)
+
+        for output in outputs.values():
+            with Image.open(output) as image:
+                self.assertEqual((image.format, image.size), ('JPEG', (100, 50)))
+
+    def test_non_nested_boxes_are_scaled_from_the_source(self):
+        # The wide box comes after the square one, but does not fit inside it.
+        derivatives = image_preprocessor.parse_derivatives('square:1024x1024,wide:1600x300,thumb:160x160')
+        self.assertEqual([name for name, _ in derivatives], ['square', 'wide', 'thumb'])
+
+        outputs = image_preprocessor.generate_derivatives(io.BytesIO(make_image_bytes((4000, 500))), derivatives)
+
+        sizes = {}
+        for name, output in outputs.items():
+            with Image.open(output) as image:
+                sizes[name] = image.size
+        self.assertEqual(sizes, {'square': (1024, 128), 'wide': (1600, 200), 'thumb': (160, 20)})
+
 
 if __name__ == '__main__':
     unittest.main()
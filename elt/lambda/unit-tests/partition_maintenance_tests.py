@@ -0,0 +1,73 @@
+"""
+Unit tests for the staging-table partition maintenance job.
+
+The database connection is mocked; archives are written to a temporary local directory.
+
+Run from the repository root:
+    python -m pytest elt/lambda/unit-tests/partition_maintenance_tests.py
+"""
+import os
+import sys
+import gzip
+import tempfile
+import unittest
+from datetime import date
+from unittest.mock import MagicMock
+
+# The Lambda sources are deployed flat, so import them the same way the runtime does.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import partition_maintenance  # pylint: disable=wrong-import-position
+
+
+class TestPartitionMaintenance(unittest.TestCase):
+
+    def setUp(self):
+        temporary_directory = tempfile.TemporaryDirectory()
+        self.addCleanup(temporary_directory.cleanup)
+        self.directory = temporary_directory.name
+        self.statements = []
+        self.conn = MagicMock()
+        cursor = self.conn.cursor.return_value.__enter__.return_value
+
+        def execute(query, params=None):  # pylint: disable=unused-argument
+            self.statements.append(query)
+            if 'EXISTS' in query:
+                # Only January still has unprocessed rows.
+                cursor.fetchone.return_value = ('p202401' in query,)
+            else:
+                cursor.fetchone.return_value = (1,)
+
+        cursor.execute.side_effect = execute
+        cursor.fetchall.return_value = [
+            ('in_invoice_processing_p202403',), ('in_invoice_processing_default',),
+            ('in_invoice_processing_p202401',), ('in_invoice_processing_p202402',),
+        ]
+        cursor.copy_expert.side_effect = lambda query, fileobj: fileobj.write(b'id,s3_object_key\n1,a.json\n')
+
+    def test_retention_cutoff(self):
+        self.assertEqual(partition_maintenance.retention_cutoff(date(2024, 8, 15), 6), date(2024, 2, 1))
+        self.assertEqual(partition_maintenance.retention_cutoff(date(2024, 2, 1), 3), date(2023, 11, 1))
+
+    def test_archives_and_drops_expired_processed_partitions(self):
+        summary = partition_maintenance.run(self.conn, partition_maintenance.LocalSink(self.directory),
+                                            retention_months=1, today=date(2024, 4, 10))
+
+        # March is kept (retention), January is kept (unprocessed rows), the default partition is never touched.
+        self.assertEqual(summary['skipped'], ['in_invoice_processing_p202401'])
+        self.assertEqual(list(summary['archived']), ['in_invoice_processing_p202402'])
+        with gzip.open(summary['archived']['in_invoice_processing_p202402']) as archive:
+            self.assertEqual(archive.read(), b'id,s3_object_key\n1,a.json\n')
+        self.assertIn('ALTER TABLE in_invoice_processing DETACH PARTITION in_invoice_processing_p202402',
+                      self.statements)
+        self.assertIn('DROP TABLE in_invoice_processing_p202402', self.statements)
+        self.assertFalse(any('p202403' in statement or '_default' in statement for statement in self.statements))
+
+    def test_keep_detached_does_not_drop(self):
+        partition_maintenance.run(self.conn, partition_maintenance.LocalSink(self.directory),
+                                  retention_months=1, today=date(2024, 4, 10), drop=False)
+
+        self.assertFalse(any(statement.startswith('DROP TABLE') for statement in self.statements))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+"""
+Unit tests for the S3 -> PostgreSQL invoice JSON loader (incremental and event-driven modes).
+
+S3 and the database connection are mocked; `execute_values` is patched so the batching and
+transaction behaviour can be asserted without a PostgreSQL server.
+
+Run from the repository root:
+    python -m pytest elt/lambda/unit-tests/process_and_load_invoices_tests.py
+"""
+import io
+import os
+import sys
+import json
+import unittest
+from unittest.mock import patch, MagicMock
+import psycopg2
+
+# The Lambda sources are deployed flat, so import them the same way the runtime does.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import process_and_load_invoices as loader  # pylint: disable=wrong-import-position
+
+
+class TestIncrementalLoad(unittest.TestCase):
+
+    def setUp(self):
+        patcher = patch.object(loader, 's3_client')
+        self.mock_s3_client = patcher.start()
+        self.addCleanup(patcher.stop)
+        # Two listing pages, as the paginator would return for a bucket over 1000 keys.
+        self.mock_s3_client.get_paginator.return_value.paginate.return_value = [
+            {'Contents': [{'Key': 'a.json'}, {'Key': 'b.json'}]},
+            {'Contents': [{'Key': 'c.json'}, {'Key': 'broken.json'}]},
+        ]
+        self.mock_s3_client.get_object.side_effect = lambda Bucket, Key: {  # pylint: disable=invalid-name
+            'Body': io.BytesIO(b'{not json' if Key == 'broken.json' else json.dumps({'Key': Key}).encode())
+        }
+
+        self.conn = MagicMock(closed=0)
+        cursor = self.conn.cursor.return_value.__enter__.return_value
+        cursor.__iter__.return_value = iter([('a.json',)])  # already staged
+        cursor.rowcount = 1
+
+    @patch.object(loader, 'INSERT_BATCH_SIZE', 2)
+    @patch.object(loader, 'execute_values')
+    def test_skips_known_keys_and_batches_inserts(self, mock_execute_values):
+        counts = loader.simple_process_and_load(self.conn, 'json-bucket')
+
+        fetched = sorted(call.kwargs['Key'] for call in self.mock_s3_client.get_object.call_args_list)
+        self.assertEqual(fetched, ['b.json', 'broken.json', 'c.json'])
+        inserted = [row[0] for call in mock_execute_values.call_args_list for row in call.args[2]]
+        self.assertEqual(inserted, ['b.json', 'c.json'])
+        # [b, c] in the first batch; the second batch only held the unparseable object.
+        self.assertEqual(mock_execute_values.call_count, 1)
+        self.assertIn('ON CONFLICT (s3_object_key) DO NOTHING', mock_execute_values.call_args.args[1])
+        self.conn.commit.assert_called_once()
+        self.assertEqual(counts['new'], 3)
+        self.assertEqual(counts['failed'], 1)
+
+    @patch.object(loader, 'execute_values', side_effect=psycopg2.Error('boom'))
+    def test_database_error_rolls_back_whole_run(self, _mock_execute_values):
+        with self.assertRaises(psycopg2.Error):
+            loader.simple_process_and_load(self.conn, 'json-bucket')
+
+        self.conn.rollback.assert_called_once()
+        self.conn.commit.assert_not_called()
+
+
+class TestEventDrivenLoad(unittest.TestCase):
+
+    def setUp(self):
+        patcher = patch.object(loader, 's3_client')
+        self.mock_s3_client = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mock_s3_client.get_object.side_effect = lambda Bucket, Key: {  # pylint: disable=invalid-name
+            'Body': io.BytesIO(json.dumps({'Key': Key}).encode())
+        }
+        self.addCleanup(setattr, loader, '_conn', None)
+        env = patch.dict(os.environ, {'DB_NAME': 'db', 'DB_USER': 'user', 'DB_PASSWORD': 'pw',
+                                      'DB_HOST': 'localhost', 'DB_PORT': '5432'})
+        env.start()
+        self.addCleanup(env.stop)
+
+    @patch.object(loader, 'execute_values')
+    @patch.object(loader.psycopg2, 'connect')
+    def test_loads_only_event_objects_and_reuses_connection(self, mock_connect, mock_execute_values):
+        conn = mock_connect.return_value
+        conn.closed = 0
+        event = {'Records': [{'s3': {'bucket': {'name': 'json-bucket'},
+                                     'object': {'key': 'invoices/user_1/my+invoice.pdf.json'}}}]}
+
+        loader.lambda_handler(event, None)
+        loader.lambda_handler(event, None)
+
+        mock_connect.assert_called_once()
+        self.mock_s3_client.get_paginator.assert_not_called()
+        self.mock_s3_client.get_object.assert_called_with(
+            Bucket='json-bucket', Key='invoices/user_1/my invoice.pdf.json')
+        inserted = [row[0] for row in mock_execute_values.call_args.args[2]]
+        self.assertEqual(inserted, ['invoices/user_1/my invoice.pdf.json'])
+        self.assertEqual(conn.commit.call_count, 2)
+
+    @patch.object(loader, 'execute_values')
+    @patch.object(loader.vendor_resolver, 'resolve', return_value=7)
+    def test_stages_rows_with_resolved_vendor(self, mock_resolve, mock_execute_values):
+        document = {'ExpenseDocuments': [{'SummaryFields': [
+            {'Type': {'Text': 'VENDOR_NAME'}, 'ValueDetection': {'Text': 'KX Wholesale Seafood'}}]}]}
+        self.mock_s3_client.get_object.side_effect = None
+        self.mock_s3_client.get_object.return_value = {'Body': io.BytesIO(json.dumps(document).encode())}
+        conn = MagicMock(closed=0)
+
+        loader.load_event_objects(conn, [{'s3': {'bucket': {'name': 'json-bucket'}, 'object': {'key': 'a.json'}}}])
+
+        self.assertEqual(mock_resolve.call_args.args[1], 'KX Wholesale Seafood')
+        mock_execute_values.assert_called_once()
+        (key, _, vendor_id), = mock_execute_values.call_args.args[2]
+        self.assertEqual((key, vendor_id), ('a.json', 7))
+        self.assertIn('in_invoice_processing_key', mock_execute_values.call_args.args[1])
+        conn.commit.assert_called_once()
+
+    @patch.object(loader.psycopg2, 'connect')
+    def test_reconnects_when_liveness_check_fails(self, mock_connect):
+        stale, fresh = MagicMock(closed=0), MagicMock(closed=0)
+        stale.cursor.return_value.__enter__.return_value.execute.side_effect = psycopg2.OperationalError('gone')
+        mock_connect.return_value = fresh
+        loader._conn = stale  # pylint: disable=protected-access
+
+        self.assertIs(loader.get_connection(), fresh)
+        stale.close.assert_called_once()
+        mock_connect.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
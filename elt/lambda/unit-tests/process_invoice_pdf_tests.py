@@ -0,0 +1,129 @@
+"""
+Unit tests for the Textract invoice processing Lambda handlers.
+
+The handlers run against real boto3 clients wrapped in `botocore.stub.Stubber`, so request
+parameters are validated against the Textract/S3 API models without any network access.
+
+Run from the repository root:
+    python -m pytest elt/lambda/unit-tests/process_invoice_pdf_tests.py
+"""
+import os
+import sys
+import gzip
+import json
+import unittest
+from unittest.mock import patch
+import boto3
+from botocore.stub import Stubber, ANY
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+# The Lambda sources are deployed flat, so import them the same way the runtime does.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import process_invoice_pdf  # pylint: disable=wrong-import-position
+
+
+def make_client(service_name):
+    """Return a client with dummy credentials, suitable for stubbing."""
+    return boto3.client(service_name, region_name='us-east-1',
+                        aws_access_key_id='testing', aws_secret_access_key='testing')
+
+
+class TestProcessInvoicePdf(unittest.TestCase):
+
+    def setUp(self):
+        self.textract_client = make_client('textract')
+        self.s3_client = make_client('s3')
+        self.textract_stub = Stubber(self.textract_client)
+        self.s3_stub = Stubber(self.s3_client)
+        self.textract_stub.activate()
+        self.s3_stub.activate()
+        for name, client in (('textract_client', self.textract_client), ('s3_client', self.s3_client)):
+            patcher = patch.object(process_invoice_pdf, name, client)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    @patch.dict(os.environ, {'TEXTRACT_SNS_TOPIC_ARN': 'arn:aws:sns:us-east-1:123456789012:textract',
+                             'TEXTRACT_SNS_ROLE_ARN': 'arn:aws:iam::123456789012:role/textract'})
+    def test_start_handler_returns_without_waiting(self):
+        self.textract_stub.add_response(
+            'start_expense_analysis',
+            {'JobId': 'job-1'},
+            {
+                'DocumentLocation': {'S3Object': {'Bucket': 'invoice-bucket', 'Name': 'invoices/user_1/my invoice.pdf'}},
+                'NotificationChannel': {'SNSTopicArn': 'arn:aws:sns:us-east-1:123456789012:textract',
+                                        'RoleArn': 'arn:aws:iam::123456789012:role/textract'},
+                'ClientRequestToken': ANY,
+            })
+        event = {'Records': [{'s3': {'bucket': {'name': 'invoice-bucket'},
+                                     'object': {'key': 'invoices/user_1/my+invoice.pdf', 'eTag': 'abc'}}}]}
+
+        result = process_invoice_pdf.lambda_handler(event, None)
+
+        self.assertEqual(result['statusCode'], 202)
+        self.assertEqual(json.loads(result['body'])['jobs'][0]['JobId'], 'job-1')
+        self.textract_stub.assert_no_pending_responses()
+
+    def test_completion_handler_fetches_all_pages(self):
+        document = lambda index: {'ExpenseIndex': index, 'SummaryFields': [], 'LineItemGroups': []}
+        self.textract_stub.add_response(
+            'get_expense_analysis',
+            {'JobStatus': 'SUCCEEDED', 'NextToken': 'page-2', 'ExpenseDocuments': [document(1)]},
+            {'JobId': 'job-1'})
+        self.textract_stub.add_response(
+            'get_expense_analysis',
+            {'JobStatus': 'SUCCEEDED', 'ExpenseDocuments': [document(2)]},
+            {'JobId': 'job-1', 'NextToken': 'page-2'})
+        self.s3_stub.add_response(
+            'put_object', {},
+            {'Bucket': process_invoice_pdf.OUTPUT_BUCKET, 'Key': 'invoices/user_1/invoice.pdf.json',
+             'Body': ANY, 'ContentType': 'application/json', 'ContentEncoding': 'gzip'})
+
+        with patch.object(self.s3_client, 'put_object', wraps=self.s3_client.put_object) as put_object:
+            process_invoice_pdf.completion_handler(self.sns_event('job-1', 'SUCCEEDED'), None)
+
+        saved = json.loads(gzip.decompress(put_object.call_args.kwargs['Body']))
+        self.assertEqual([doc['ExpenseIndex'] for doc in saved['ExpenseDocuments']], [1, 2])
+        self.assertNotIn('NextToken', saved)
+        self.textract_stub.assert_no_pending_responses()
+        self.s3_stub.assert_no_pending_responses()
+
+    @patch.object(process_invoice_pdf, 'STORE_RAW_JSON', False)
+    def test_completion_handler_can_store_compact_json(self):
+        field = {'Type': {'Text': 'TOTAL', 'Confidence': 99.0}, 'ValueDetection': {
+            'Text': '$1.00', 'Confidence': 98.0, 'Geometry': {'BoundingBox': {'Width': 0.1}}}}
+        self.textract_stub.add_response(
+            'get_expense_analysis',
+            {'JobStatus': 'SUCCEEDED', 'ExpenseDocuments': [
+                {'ExpenseIndex': 1, 'SummaryFields': [field], 'LineItemGroups': [], 'Blocks': [{'BlockType': 'WORD'}]}]},
+            {'JobId': 'job-1'})
+        self.s3_stub.add_response('put_object', {}, None)
+
+        with patch.object(self.s3_client, 'put_object', wraps=self.s3_client.put_object) as put_object:
+            process_invoice_pdf.completion_handler(self.sns_event('job-1', 'SUCCEEDED'), None)
+
+        saved = json.loads(gzip.decompress(put_object.call_args.kwargs['Body']))
+        document = saved['ExpenseDocuments'][0]
+        self.assertNotIn('Blocks', document)
+        self.assertEqual(document['SummaryFields'][0]['ValueDetection'], {'Text': '$1.00', 'Confidence': 98.0})
+
+    def test_completion_handler_skips_failed_jobs(self):
+        result = process_invoice_pdf.completion_handler(self.sns_event('job-2', 'FAILED'), None)
+
+        self.assertEqual(json.loads(result['body'])['failed'], ['job-2'])
+        self.textract_stub.assert_no_pending_responses()
+
+    @staticmethod
+    def sns_event(job_id, status):
+        """Build the SNS event Textract publishes when a job completes."""
+        message = {
+            'JobId': job_id,
+            'Status': status,
+            'API': 'StartExpenseAnalysis',
+            'Timestamp': 1700000000000,
+            'DocumentLocation': {'S3ObjectName': 'invoices/user_1/invoice.pdf', 'S3Bucket': 'invoice-bucket'},
+        }
+        return {'Records': [{'Sns': {'Message': json.dumps(message)}}]}
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+"""
+Unit tests for the compact Textract expense response extraction.
+
+Uses the sample response in elt/sql/analyzeExpenseResponse.json. The streaming (ijson) path is
+tested when ijson is installed; the json fallback is always tested.
+
+Run from the repository root:
+    python -m pytest elt/lambda/unit-tests/textract_extract_tests.py
+"""
+import io
+import os
+import sys
+import gzip
+import json
+import unittest
+from unittest.mock import patch
+
+# The Lambda sources are deployed flat, so import them the same way the runtime does.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import textract_extract  # pylint: disable=wrong-import-position
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'sql', 'analyzeExpenseResponse.json')
+
+
+class TestTextractExtract(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with open(FIXTURE, 'rb') as fixture:
+            cls.raw = fixture.read()
+        cls.response = json.loads(cls.raw)
+
+    def extract(self, data):
+        return textract_extract.extract(textract_extract.open_json_stream(io.BytesIO(data)))
+
+    def test_keeps_fields_the_sql_reads(self):
+        with patch.object(textract_extract, 'ijson', None):
+            compact = self.extract(self.raw)
+
+        document = compact['ExpenseDocuments'][0]
+        source = self.response['ExpenseDocuments'][0]
+        self.assertNotIn('Blocks', document)
+        self.assertEqual(len(document['SummaryFields']), len(source['SummaryFields']))
+        self.assertEqual(
+            [field['Type']['Text'] for field in document['SummaryFields']],
+            [field['Type']['Text'] for field in source['SummaryFields']])
+        vendor_zip = next(field for field in document['SummaryFields']
+                          if field['Type']['Text'] == 'ZIP_CODE' and field['GroupProperties'][0]['Types'] == ['VENDOR'])
+        self.assertEqual(vendor_zip['ValueDetection']['Text'], '33634')
+        self.assertNotIn('Geometry', json.dumps(compact))
+        line_item = document['LineItemGroups'][0]['LineItems'][0]['LineItemExpenseFields'][0]
+        self.assertEqual(set(line_item), {'Type', 'LabelDetection', 'ValueDetection', 'PageNumber'})
+
+    def test_compact_form_is_an_order_of_magnitude_smaller(self):
+        with patch.object(textract_extract, 'ijson', None):
+            compact = self.extract(self.raw)
+
+        self.assertLess(len(textract_extract.dumps(compact)) * 10, len(self.raw))
+        self.assertEqual(textract_extract.compact(compact), compact)  # idempotent
+
+    @unittest.skipIf(textract_extract.ijson is None, 'ijson is not installed')
+    def test_streaming_matches_fallback(self):
+        with patch.object(textract_extract, 'ijson', None):
+            expected = self.extract(self.raw)
+
+        self.assertEqual(self.extract(self.raw), expected)
+
+    def test_reads_gzip_compressed_responses(self):
+        self.assertEqual(self.extract(textract_extract.dumps_gzip(self.response)), self.extract(self.raw))
+
+    def test_invalid_json_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            self.extract(b'{not json')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+"""
+Unit tests for vendor name normalization and resolution.
+
+Resolution runs against an in-memory SQLite database with the same Vendors/vendor_alias columns as
+elt/sql/tables/create_vendor_table.sql, which exercises the pure-Python trigram fallback.
+
+Run from the repository root:
+    python -m pytest elt/lambda/unit-tests/vendor_resolver_tests.py
+"""
+import os
+import sys
+import json
+import sqlite3
+import unittest
+
+# The Lambda sources are deployed flat, so import them the same way the runtime does.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import vendor_resolver  # pylint: disable=wrong-import-position
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'sql', 'analyzeExpenseResponse.json')
+
+SCHEMA = """
+CREATE TABLE Vendors (
+    VendorID INTEGER PRIMARY KEY AUTOINCREMENT,
+    VENDOR_NAME TEXT NOT NULL, VENDOR_ADDRESS TEXT, VENDOR_PHONE TEXT, VENDOR_URL TEXT,
+    STREET TEXT, CITY TEXT, STATE TEXT, COUNTRY TEXT, ZIP_CODE TEXT,
+    normalized_name TEXT UNIQUE, blocking_key TEXT
+);
+CREATE INDEX vendors_blocking_key_idx ON Vendors (blocking_key);
+CREATE TABLE vendor_alias (alias_key TEXT PRIMARY KEY, vendor_id INTEGER NOT NULL);
+"""
+
+
+class TestNormalization(unittest.TestCase):
+
+    def test_normalize_vendor_name(self):
+        self.assertEqual(vendor_resolver.normalize_vendor_name('KX Wholesale Seafood, Inc.'), 'KX WHOLESALE SEAFOOD')
+        self.assertEqual(vendor_resolver.normalize_vendor_name('  Smith &  Sons  Co '), 'SMITH AND SONS')
+        self.assertEqual(vendor_resolver.normalize_vendor_name(None), '')
+
+    def test_similarity_matches_pg_trgm(self):
+        # Documented pg_trgm result: similarity('word', 'words') = 4/7.
+        self.assertAlmostEqual(vendor_resolver.similarity('word', 'words'), 4 / 7)
+        self.assertEqual(vendor_resolver.similarity('abc', ''), 0.0)
+
+    def test_extract_vendor_uses_vendor_group(self):
+        with open(FIXTURE, encoding='utf-8') as fixture:
+            vendor = vendor_resolver.extract_vendor(json.load(fixture))
+
+        self.assertEqual(vendor['name'], 'KX Wholesale Seafood')
+        self.assertEqual(vendor['zip_code'], '33634')  # not the receiver's 34242
+        self.assertNotIn('street', vendor)
+
+
+class TestVendorResolver(unittest.TestCase):
+
+    def setUp(self):
+        self.conn = sqlite3.connect(':memory:')
+        self.conn.executescript(SCHEMA)
+        self.addCleanup(self.conn.close)
+        self.statements = []
+        self.conn.set_trace_callback(self.statements.append)
+        self.resolver = vendor_resolver.VendorResolver()
+
+    def test_ocr_variants_resolve_to_one_vendor(self):
+        first = self.resolver.resolve(self.conn, 'KX Wholesale Seafood', zip_code='33634')
+        same = self.resolver.resolve(self.conn, 'KX WHOLESALE SEAFOOD, INC.')
+        typo = self.resolver.resolve(self.conn, 'KX Wholsale Seafood')
+        other = self.resolver.resolve(self.conn, 'Sysco Food Services')
+
+        self.assertEqual(first, same)
+        self.assertEqual(first, typo)
+        self.assertNotEqual(first, other)
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM Vendors").fetchone()[0], 2)
+        aliases = dict(self.conn.execute("SELECT alias_key, vendor_id FROM vendor_alias"))
+        self.assertEqual(aliases['KX WHOLSALE SEAFOOD'], first)
+
+    def test_cached_names_skip_the_database(self):
+        vendor_id = self.resolver.resolve(self.conn, 'KX Wholesale Seafood')
+        self.statements.clear()
+
+        self.assertEqual(self.resolver.resolve(self.conn, 'kx wholesale seafood'), vendor_id)
+        self.assertEqual(self.statements, [])
+
+    def test_alias_table_is_used_after_cache_is_cleared(self):
+        vendor_id = self.resolver.resolve(self.conn, 'KX Wholsale Seafood')
+        self.resolver.clear_cache()
+        self.statements.clear()
+
+        self.assertEqual(self.resolver.resolve(self.conn, 'KX Wholsale Seafood'), vendor_id)
+        self.assertEqual(len(self.statements), 1)  # one primary-key alias lookup
+
+    def test_blank_names_are_not_resolved(self):
+        self.assertIsNone(self.resolver.resolve(self.conn, ' , '))
+        self.assertEqual(self.statements, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+-- Pivots the SummaryFields of one Textract expense response into a single row.
+--
+-- Every field takes the first matching value in document order, so results are
+-- deterministic when Textract reports a type more than once. Address parts come
+-- from the group Textract tags as VENDOR, so the receiver's (bill-to/ship-to)
+-- street and city never end up on the vendor. Values are trimmed here so every
+-- caller derives the same vendor key.
+CREATE OR REPLACE FUNCTION extract_invoice_summary(textract_json JSONB)
+RETURNS TABLE (
+    vendor_name TEXT,
+    vendor_address TEXT,
+    vendor_phone TEXT,
+    vendor_url TEXT,
+    street TEXT,
+    city TEXT,
+    state TEXT,
+    country TEXT,
+    zip_code TEXT,
+    invoice_number TEXT,
+    invoice_date TEXT,
+    due_date TEXT,
+    payment_terms TEXT,
+    total TEXT
+)
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    WITH fields AS (
+        SELECT
+            sf.value->'Type'->>'Text' AS field_type,
+            NULLIF(TRIM(sf.value->'ValueDetection'->>'Text'), '') AS field_value,
+            COALESCE(sf.value->'GroupProperties' @> '[{"Types": ["VENDOR"]}]', FALSE) AS in_vendor_group,
+            doc.ord AS doc_ord,
+            sf.ord AS field_ord
+        FROM jsonb_array_elements(textract_json->'ExpenseDocuments') WITH ORDINALITY AS doc(value, ord)
+        CROSS JOIN LATERAL jsonb_array_elements(doc.value->'SummaryFields') WITH ORDINALITY AS sf(value, ord)
+    )
+    SELECT
+        (array_agg(field_value ORDER BY doc_ord, field_ord) FILTER (WHERE field_type = 'VENDOR_NAME'))[1],
+        (array_agg(field_value ORDER BY doc_ord, field_ord) FILTER (WHERE field_type = 'VENDOR_ADDRESS'))[1],
+        (array_agg(field_value ORDER BY doc_ord, field_ord) FILTER (WHERE field_type = 'VENDOR_PHONE'))[1],
+        (array_agg(field_value ORDER BY doc_ord, field_ord) FILTER (WHERE field_type = 'VENDOR_URL'))[1],
+        (array_agg(field_value ORDER BY doc_ord, field_ord) FILTER (WHERE field_type = 'STREET' AND in_vendor_group))[1],
+        (array_agg(field_value ORDER BY doc_ord, field_ord) FILTER (WHERE field_type = 'CITY' AND in_vendor_group))[1],
+        (array_agg(field_value ORDER BY doc_ord, field_ord) FILTER (WHERE field_type = 'STATE' AND in_vendor_group))[1],
+        (array_agg(field_value ORDER BY doc_ord, field_ord) FILTER (WHERE field_type = 'COUNTRY' AND in_vendor_group))[1],
+        (array_agg(field_value ORDER BY doc_ord, field_ord) FILTER (WHERE field_type = 'ZIP_CODE' AND in_vendor_group))[1],
+        (array_agg(field_value ORDER BY doc_ord, field_ord) FILTER (WHERE field_type = 'INVOICE_RECEIPT_ID'))[1],
+        (array_agg(field_value ORDER BY doc_ord, field_ord) FILTER (WHERE field_type = 'INVOICE_RECEIPT_DATE'))[1],
+        (array_agg(field_value ORDER BY doc_ord, field_ord) FILTER (WHERE field_type = 'DUE_DATE'))[1],
+        (array_agg(field_value ORDER BY doc_ord, field_ord) FILTER (WHERE field_type = 'PAYMENT_TERMS'))[1],
+        (array_agg(field_value ORDER BY doc_ord, field_ord) FILTER (WHERE field_type = 'TOTAL'))[1]
+    FROM fields;
+$$;
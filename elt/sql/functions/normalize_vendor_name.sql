@@ -0,0 +1,16 @@
+-- Canonical comparison form of a vendor name: upper case, '&' spelled 'AND',
+-- punctuation removed, whitespace collapsed and legal suffixes dropped.
+-- Must stay in sync with normalize_vendor_name in elt/lambda/src/vendor_resolver.py.
+CREATE OR REPLACE FUNCTION normalize_vendor_name(name TEXT)
+RETURNS TEXT
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT COALESCE(string_agg(token, ' ' ORDER BY ord), '')
+    FROM regexp_split_to_table(
+             regexp_replace(replace(UPPER(COALESCE(name, '')), '&', ' AND '), '[^A-Z0-9 ]+', ' ', 'g'),
+             '\s+'
+         ) WITH ORDINALITY AS t(token, ord)
+    WHERE token <> ''
+      AND token NOT IN ('INC', 'LLC', 'LTD', 'CO', 'CORP', 'CORPORATION', 'COMPANY', 'INCORPORATED');
+$$;
@@ -0,0 +1,65 @@
+-- Parsers for the OCR text Textract returns for line-item amounts and quantities.
+-- Both return NULLs instead of raising, so one bad value never fails a batch;
+-- load_invoice_line_items records unparsed values in invoice_line_item_parse_error.
+
+-- '$1,234.50' -> (1234.50, 'USD'); '(12.00)' and '12.00-' -> -12.00; 'N/A' -> (NULL, NULL).
+CREATE OR REPLACE FUNCTION parse_money(raw TEXT, OUT amount NUMERIC, OUT currency TEXT)
+LANGUAGE plpgsql
+IMMUTABLE
+AS $$
+DECLARE
+    stripped TEXT;
+    digits TEXT;
+BEGIN
+    IF raw IS NULL THEN
+        RETURN;
+    END IF;
+
+    currency := CASE
+        WHEN raw ~ '\$' OR raw ~* '\mUSD\M' THEN 'USD'
+        WHEN raw ~ '€' OR raw ~* '\mEUR\M' THEN 'EUR'
+        WHEN raw ~ '£' OR raw ~* '\mGBP\M' THEN 'GBP'
+    END;
+
+    -- Anything other than symbols, separators, signs and digits is not an amount.
+    stripped := regexp_replace(raw, '\m(USD|EUR|GBP)\M', '', 'gi');
+    IF stripped !~ '^[\s$€£,.()0-9-]*$' THEN
+        currency := NULL;
+        RETURN;
+    END IF;
+
+    -- At most 10 integer digits, so the value fits the NUMERIC(14, x) columns.
+    digits := regexp_replace(stripped, '[^0-9.]', '', 'g');
+    IF digits !~ '^(\d{1,10}(\.\d+)?|\.\d+)$' THEN
+        currency := NULL;
+        RETURN;
+    END IF;
+
+    amount := digits::NUMERIC;
+    IF stripped ~ '^\s*\(.*\)\s*$' OR stripped ~ '^\s*[$€£]?\s*-' OR stripped ~ '-\s*$' THEN
+        amount := -amount;
+    END IF;
+END;
+$$;
+
+-- '2 CS' -> (2, 'CS'); '21.7' -> (21.7, NULL); '1,000 ea.' -> (1000, 'EA'); 'two' -> (NULL, NULL).
+CREATE OR REPLACE FUNCTION parse_quantity(raw TEXT, OUT amount NUMERIC, OUT unit TEXT)
+LANGUAGE plpgsql
+IMMUTABLE
+AS $$
+DECLARE
+    parts TEXT[];
+BEGIN
+    parts := regexp_match(raw, '^\s*(\d[\d,]*(?:\.\d+)?|\.\d+)\s*([A-Za-z#]+)?\.?\s*$');
+    IF parts IS NULL THEN
+        RETURN;
+    END IF;
+
+    IF length(split_part(replace(parts[1], ',', ''), '.', 1)) > 10 THEN
+        RETURN;
+    END IF;
+
+    amount := replace(parts[1], ',', '')::NUMERIC;
+    unit := UPPER(parts[2]);
+END;
+$$;
@@ -0,0 +1,6 @@
+-- Ad-hoc containment queries on the raw response, e.g.
+--     WHERE textract_json @> '{"ExpenseDocuments": [{"SummaryFields": [{"Type": {"Text": "VENDOR_URL"}}]}]}'
+-- jsonb_path_ops only supports @>, but is much smaller and faster than the default opclass.
+-- Routine lookups should use invoice_summary_field instead.
+CREATE INDEX IF NOT EXISTS in_invoice_processing_textract_json_idx
+    ON in_invoice_processing USING GIN (textract_json jsonb_path_ops);
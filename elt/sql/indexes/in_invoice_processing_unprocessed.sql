@@ -0,0 +1,6 @@
+-- Lets the incremental procedures find the next batch of unprocessed staging rows
+-- without scanning the whole history. Only rows still waiting to be processed are
+-- indexed, so the index stays small as in_invoice_processing grows.
+CREATE INDEX IF NOT EXISTS in_invoice_processing_unprocessed_idx
+    ON in_invoice_processing (id)
+    WHERE processed = FALSE;
@@ -0,0 +1,7 @@
+-- Trigram index for fuzzy vendor matching (vendor_resolver.py): the pg_trgm `%`
+-- operator finds similar normalized names with an index scan instead of
+-- comparing against every vendor.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS vendors_normalized_name_trgm_idx
+    ON Vendors USING GIN (normalized_name gin_trgm_ops);
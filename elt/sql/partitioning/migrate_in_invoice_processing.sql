@@ -0,0 +1,48 @@
+-- One-off migration of an existing, unpartitioned in_invoice_processing to the
+-- monthly-partitioned layout in tables/in_invoice_processing.sql. Run with psql
+-- from this directory, during a pause in loading:
+--     psql -v ON_ERROR_STOP=1 -f migrate_in_invoice_processing.sql
+-- The old table is kept as in_invoice_processing_unpartitioned; drop it once the
+-- migrated data has been checked.
+BEGIN;
+
+ALTER TABLE in_invoice_processing RENAME TO in_invoice_processing_unpartitioned;
+ALTER INDEX IF EXISTS in_invoice_processing_unprocessed_idx RENAME TO in_invoice_processing_unpartitioned_unprocessed_idx;
+ALTER INDEX IF EXISTS in_invoice_processing_textract_json_idx RENAME TO in_invoice_processing_unpartitioned_textract_json_idx;
+
+\ir ../tables/in_invoice_processing.sql
+
+-- Registry rows keep the existing ids, so derived tables stay valid.
+INSERT INTO in_invoice_processing_key (id, s3_object_key, received_timestamp)
+SELECT DISTINCT ON (s3_object_key) id, s3_object_key, COALESCE(received_timestamp, CURRENT_TIMESTAMP)
+FROM in_invoice_processing_unpartitioned
+ORDER BY s3_object_key, id;
+
+SELECT setval(pg_get_serial_sequence('in_invoice_processing_key', 'id'),
+              GREATEST((SELECT MAX(id) FROM in_invoice_processing_key), 1));
+
+-- Monthly partitions for the whole history, so nothing lands in the default partition.
+SELECT create_in_invoice_processing_partitions(
+    ((EXTRACT(YEAR FROM now()) - EXTRACT(YEAR FROM first_month)) * 12
+     + EXTRACT(MONTH FROM now()) - EXTRACT(MONTH FROM first_month))::INTEGER + 3,
+    first_month)
+FROM (SELECT (MIN(received_timestamp) AT TIME ZONE 'UTC')::DATE AS first_month FROM in_invoice_processing_key) history
+WHERE first_month IS NOT NULL;
+
+INSERT INTO in_invoice_processing (id, s3_object_key, textract_json, received_timestamp, processed, vendor_id)
+SELECT k.id, k.s3_object_key, old.textract_json, k.received_timestamp, old.processed, old.vendor_id
+FROM in_invoice_processing_unpartitioned old
+JOIN in_invoice_processing_key k ON k.id = old.id;
+
+-- Derived tables now reference the registry.
+ALTER TABLE invoices DROP CONSTRAINT IF EXISTS invoices_in_invoice_processing_id_fkey,
+    ADD FOREIGN KEY (in_invoice_processing_id) REFERENCES in_invoice_processing_key (id) ON DELETE CASCADE;
+ALTER TABLE invoice_line_item DROP CONSTRAINT IF EXISTS invoice_line_item_in_invoice_processing_id_fkey,
+    ADD FOREIGN KEY (in_invoice_processing_id) REFERENCES in_invoice_processing_key (id) ON DELETE CASCADE;
+ALTER TABLE invoice_summary_field DROP CONSTRAINT IF EXISTS invoice_summary_field_in_invoice_processing_id_fkey,
+    ADD FOREIGN KEY (in_invoice_processing_id) REFERENCES in_invoice_processing_key (id) ON DELETE CASCADE;
+
+\ir ../indexes/in_invoice_processing_unprocessed.sql
+\ir ../indexes/in_invoice_processing_textract_json.sql
+
+COMMIT;
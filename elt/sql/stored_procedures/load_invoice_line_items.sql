@@ -0,0 +1,89 @@
+-- Materializes the line items of the given staging rows into invoice_line_item.
+--
+-- Called by process_invoice_data for each claimed batch, inside the same
+-- transaction that flags the rows processed, so reporting cost is proportional
+-- to new invoices rather than the whole staging history. Quantities and prices
+-- are parsed to NUMERIC here, once, so rollups never re-parse OCR text. Re-running
+-- for the same rows is a no-op. batch_from (the batch's earliest received_timestamp)
+-- lets the planner skip older partitions of in_invoice_processing.
+
+-- Earlier signatures: (INTEGER) claimed its own batch; (INTEGER[]) had no partition bound.
+DROP PROCEDURE IF EXISTS load_invoice_line_items(INTEGER);
+DROP PROCEDURE IF EXISTS load_invoice_line_items(INTEGER[]);
+
+CREATE OR REPLACE PROCEDURE load_invoice_line_items(
+    batch_ids INTEGER[],
+    batch_from TIMESTAMP WITH TIME ZONE DEFAULT '-infinity'
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    WITH items AS (
+        SELECT
+            inp.id,
+            inp.s3_object_key,
+            inp.received_timestamp,
+            ROW_NUMBER() OVER (PARTITION BY inp.id ORDER BY doc.ord, grp.ord, item.ord) AS line_item_index,
+            item.value AS line_item
+        FROM in_invoice_processing inp
+        CROSS JOIN LATERAL jsonb_array_elements(inp.textract_json->'ExpenseDocuments') WITH ORDINALITY AS doc(value, ord)
+        CROSS JOIN LATERAL jsonb_array_elements(doc.value->'LineItemGroups') WITH ORDINALITY AS grp(value, ord)
+        CROSS JOIN LATERAL jsonb_array_elements(grp.value->'LineItems') WITH ORDINALITY AS item(value, ord)
+        WHERE inp.id = ANY (batch_ids)
+          AND inp.received_timestamp >= batch_from
+    )
+    INSERT INTO invoice_line_item (
+        in_invoice_processing_id, line_item_index, s3_object_key,
+        product_code, item_description, quantity, unit_price, total_price,
+        quantity_value, quantity_unit, unit_price_value, total_price_value, currency,
+        received_timestamp
+    )
+    SELECT
+        items.id,
+        items.line_item_index,
+        items.s3_object_key,
+        fields.product_code,
+        fields.item_description,
+        fields.quantity,
+        fields.unit_price,
+        fields.total_price,
+        qty.amount,
+        qty.unit,
+        unit_price.amount,
+        total_price.amount,
+        -- Textract's detected currency first, then the symbol in the text.
+        COALESCE(fields.currency_code, total_price.currency, unit_price.currency),
+        items.received_timestamp
+    FROM items
+    -- Pivot only this line item's fields, rather than grouping the whole history.
+    CROSS JOIN LATERAL (
+        SELECT
+            MAX(CASE WHEN field->'Type'->>'Text' = 'PRODUCT_CODE' THEN field->'ValueDetection'->>'Text' END) AS product_code,
+            MAX(CASE WHEN field->'Type'->>'Text' = 'ITEM' THEN field->'ValueDetection'->>'Text' END) AS item_description,
+            MAX(CASE WHEN field->'Type'->>'Text' = 'QUANTITY' THEN field->'ValueDetection'->>'Text' END) AS quantity,
+            MAX(CASE WHEN field->'Type'->>'Text' = 'UNIT_PRICE' THEN field->'ValueDetection'->>'Text' END) AS unit_price,
+            MAX(CASE WHEN field->'Type'->>'Text' = 'PRICE' THEN field->'ValueDetection'->>'Text' END) AS total_price,
+            MAX(UPPER(field->'Currency'->>'Code')) AS currency_code
+        FROM jsonb_array_elements(items.line_item->'LineItemExpenseFields') AS f(field)
+    ) AS fields
+    CROSS JOIN LATERAL parse_quantity(fields.quantity) AS qty
+    CROSS JOIN LATERAL parse_money(fields.unit_price) AS unit_price
+    CROSS JOIN LATERAL parse_money(fields.total_price) AS total_price
+    ON CONFLICT (in_invoice_processing_id, line_item_index) DO NOTHING;
+
+    -- Keep values that did not parse for review instead of failing the batch.
+    INSERT INTO invoice_line_item_parse_error (in_invoice_processing_id, line_item_index, field_name, raw_value)
+    SELECT li.in_invoice_processing_id, li.line_item_index, bad.field_name, bad.raw_value
+    FROM invoice_line_item li
+    CROSS JOIN LATERAL (
+        VALUES
+            ('quantity', li.quantity, li.quantity_value),
+            ('unit_price', li.unit_price, li.unit_price_value),
+            ('total_price', li.total_price, li.total_price_value)
+    ) AS bad(field_name, raw_value, parsed_value)
+    WHERE li.in_invoice_processing_id = ANY (batch_ids)
+      AND bad.raw_value IS NOT NULL
+      AND bad.parsed_value IS NULL
+    ON CONFLICT DO NOTHING;
+END;
+$$;
@@ -0,0 +1,40 @@
+-- Extracts the SummaryFields of the given staging rows into invoice_summary_field.
+--
+-- Called by process_invoice_data for each claimed batch, in the same transaction
+-- that flags the rows processed. Re-running for the same rows is a no-op; to
+-- backfill rows processed before this table existed:
+--     CALL load_invoice_summary_fields(ARRAY(SELECT id FROM in_invoice_processing WHERE processed));
+-- batch_from (the batch's earliest received_timestamp) lets the planner skip older
+-- partitions of in_invoice_processing.
+
+-- Earlier signature, without the partition bound.
+DROP PROCEDURE IF EXISTS load_invoice_summary_fields(INTEGER[]);
+
+CREATE OR REPLACE PROCEDURE load_invoice_summary_fields(
+    batch_ids INTEGER[],
+    batch_from TIMESTAMP WITH TIME ZONE DEFAULT '-infinity'
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO invoice_summary_field (
+        in_invoice_processing_id, field_index, field_type, group_type,
+        label_text, value_text, confidence
+    )
+    SELECT
+        inp.id,
+        ROW_NUMBER() OVER (PARTITION BY inp.id ORDER BY doc.ord, sf.ord),
+        sf.value->'Type'->>'Text',
+        sf.value->'GroupProperties'->0->'Types'->>0,
+        sf.value->'LabelDetection'->>'Text',
+        NULLIF(TRIM(sf.value->'ValueDetection'->>'Text'), ''),
+        (sf.value->'ValueDetection'->>'Confidence')::REAL
+    FROM in_invoice_processing inp
+    CROSS JOIN LATERAL jsonb_array_elements(inp.textract_json->'ExpenseDocuments') WITH ORDINALITY AS doc(value, ord)
+    CROSS JOIN LATERAL jsonb_array_elements(doc.value->'SummaryFields') WITH ORDINALITY AS sf(value, ord)
+    WHERE inp.id = ANY (batch_ids)
+      AND inp.received_timestamp >= batch_from
+      AND sf.value->'Type'->>'Text' IS NOT NULL
+    ON CONFLICT (in_invoice_processing_id, field_index) DO NOTHING;
+END;
+$$;
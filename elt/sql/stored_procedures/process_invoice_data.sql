@@ -1,11 +1,107 @@
-CREATE OR REPLACE PROCEDURE process_invoice_data()
+-- Set-based ELT from the staging table into invoice_summary_field, Vendors, invoices
+-- and invoice_line_item.
+--
+-- Each call claims up to batch_size rows WHERE processed = FALSE (partial index
+-- in_invoice_processing_unprocessed_idx) with FOR UPDATE SKIP LOCKED, so several
+-- workers can run it at once and each takes a disjoint batch. Every step is one
+-- statement over the whole batch, and the rows are flagged processed in the same
+-- transaction as the loads, so a failure leaves the batch to be retried as a whole.
+--
+-- processed_count returns the number of rows handled; call until it is 0:
+--     CALL process_invoice_data(500, NULL);
+CREATE OR REPLACE PROCEDURE process_invoice_data(
+    batch_size INTEGER DEFAULT 500,
+    INOUT processed_count INTEGER DEFAULT NULL
+)
 LANGUAGE plpgsql
 AS $$
+DECLARE
+    batch_ids INTEGER[];
+    batch_from TIMESTAMP WITH TIME ZONE;
 BEGIN
+    -- Locks are held until the caller's transaction ends. batch_from bounds every
+    -- later statement to the partitions the batch lives in.
+    SELECT array_agg(id ORDER BY id), MIN(received_timestamp) INTO batch_ids, batch_from
+    FROM (
+        SELECT id, received_timestamp
+        FROM in_invoice_processing
+        WHERE processed = FALSE
+        ORDER BY id
+        LIMIT batch_size
+        FOR UPDATE SKIP LOCKED
+    ) claimed;
 
+    processed_count := COALESCE(array_length(batch_ids, 1), 0);
+    IF processed_count = 0 THEN
+        RETURN;
+    END IF;
 
+    -- Typed summary fields, for indexed vendor/total/date lookups.
+    CALL load_invoice_summary_fields(batch_ids, batch_from);
 
+    -- Vendors for rows the loader did not resolve: match the normalized name directly
+    -- or through a recorded alias, and insert only names never seen before.
+    INSERT INTO Vendors (VENDOR_NAME, normalized_name, blocking_key, VENDOR_ADDRESS, VENDOR_PHONE, VENDOR_URL,
+                         STREET, CITY, STATE, COUNTRY, ZIP_CODE)
+    SELECT DISTINCT ON (n.normalized_name)
+        s.vendor_name, n.normalized_name, split_part(n.normalized_name, ' ', 1),
+        s.vendor_address, s.vendor_phone, s.vendor_url,
+        s.street, s.city, s.state, s.country, s.zip_code
+    FROM in_invoice_processing inp
+    CROSS JOIN LATERAL extract_invoice_summary(inp.textract_json) s
+    CROSS JOIN LATERAL (SELECT normalize_vendor_name(s.vendor_name) AS normalized_name) n
+    WHERE inp.id = ANY (batch_ids)
+      AND inp.received_timestamp >= batch_from
+      AND inp.vendor_id IS NULL
+      AND n.normalized_name <> ''
+      AND NOT EXISTS (SELECT 1 FROM vendor_alias a WHERE a.alias_key = n.normalized_name)
+    ORDER BY n.normalized_name, inp.id
+    ON CONFLICT (normalized_name) DO NOTHING;
 
+    -- Invoices: header fields, linked to the loader's vendor, else by normalized name,
+    -- and to the web upload whose PDF key the JSON key ('<pdf key>.json') was derived from.
+    -- invoice_invoice.s3_key is indexed but not unique (a PDF re-uploaded under the same key
+    -- gets a new row), so exactly one upload, the latest, is picked per source row: a join
+    -- fanning out to several would make ON CONFLICT DO UPDATE hit the same row twice and
+    -- abort the whole batch.
+    INSERT INTO invoices (
+        in_invoice_processing_id, s3_object_key, vendor_id,
+        invoice_number, invoice_date, due_date, payment_terms, total, received_timestamp,
+        web_invoice_id
+    )
+    SELECT
+        inp.id, inp.s3_object_key, COALESCE(inp.vendor_id, a.vendor_id, v.VendorID),
+        s.invoice_number, s.invoice_date, s.due_date, s.payment_terms, s.total, inp.received_timestamp,
+        w.id
+    FROM in_invoice_processing inp
+    CROSS JOIN LATERAL extract_invoice_summary(inp.textract_json) s
+    CROSS JOIN LATERAL (SELECT normalize_vendor_name(s.vendor_name) AS normalized_name) n
+    LEFT JOIN vendor_alias a ON a.alias_key = n.normalized_name
+    LEFT JOIN Vendors v ON v.normalized_name = n.normalized_name
+    LEFT JOIN LATERAL (
+        SELECT wi.id
+        FROM invoice_invoice wi
+        WHERE wi.s3_key = regexp_replace(inp.s3_object_key, '\.json$', '')
+        ORDER BY wi.id DESC
+        LIMIT 1
+    ) w ON TRUE
+    WHERE inp.id = ANY (batch_ids)
+      AND inp.received_timestamp >= batch_from
+    ON CONFLICT (in_invoice_processing_id) DO UPDATE SET
+        vendor_id = EXCLUDED.vendor_id,
+        invoice_number = EXCLUDED.invoice_number,
+        invoice_date = EXCLUDED.invoice_date,
+        due_date = EXCLUDED.due_date,
+        payment_terms = EXCLUDED.payment_terms,
+        total = EXCLUDED.total,
+        web_invoice_id = COALESCE(EXCLUDED.web_invoice_id, invoices.web_invoice_id);
 
+    -- Line items.
+    CALL load_invoice_line_items(batch_ids, batch_from);
 
--- After Further Processing: Once a record's data has been extracted from the JSON, analyzed, or otherwise processed (e.g., transformed and loaded into other tables or systems), the processed flag should be updated to TRUE. This update typically occurs as part of a batch process or a trigger, such as your Lambda function calling a stored procedure that handles the necessary data manipulation and marks each record as processed upon completion.
\ No newline at end of file
+    UPDATE in_invoice_processing
+    SET processed = TRUE
+    WHERE id = ANY (batch_ids)
+      AND received_timestamp >= batch_from;
+END;
+$$;
@@ -0,0 +1,67 @@
+-- Materialized line items extracted from the Textract responses in in_invoice_processing.
+-- Filled incrementally by stored_procedures/process_invoice_data.sql (via
+-- load_invoice_line_items.sql), so reporting reads
+-- plain rows instead of re-expanding every JSON document on every query.
+CREATE TABLE IF NOT EXISTS invoice_line_item (
+    -- Single-column key for the Django invoice.models.LineItem mapping.
+    id BIGINT GENERATED ALWAYS AS IDENTITY UNIQUE,
+
+    -- Staging row the line item was extracted from.
+    in_invoice_processing_id INTEGER NOT NULL
+        REFERENCES in_invoice_processing_key (id) ON DELETE CASCADE,
+
+    -- 1-based position of the line item within the Textract response
+    -- (across all ExpenseDocuments and LineItemGroups, in document order).
+    line_item_index INTEGER NOT NULL,
+
+    s3_object_key VARCHAR(255) NOT NULL,
+    product_code TEXT,
+    item_description TEXT,
+
+    -- Raw OCR text, as Textract returned it.
+    quantity TEXT,
+    unit_price TEXT,
+    total_price TEXT,
+
+    -- Parsed once at load time (functions/parse_line_item_values.sql); NULL when
+    -- the raw text could not be parsed, see invoice_line_item_parse_error.
+    quantity_value NUMERIC(14, 4),
+    quantity_unit TEXT,
+    unit_price_value NUMERIC(14, 4),
+    total_price_value NUMERIC(14, 2),
+    currency CHAR(3),
+
+    received_timestamp TIMESTAMP WITH TIME ZONE,
+
+    PRIMARY KEY (in_invoice_processing_id, line_item_index)
+);
+
+-- Existing databases created before the parsed columns were added.
+ALTER TABLE invoice_line_item
+    ADD COLUMN IF NOT EXISTS id BIGINT GENERATED ALWAYS AS IDENTITY UNIQUE,
+    ADD COLUMN IF NOT EXISTS quantity_value NUMERIC(14, 4),
+    ADD COLUMN IF NOT EXISTS quantity_unit TEXT,
+    ADD COLUMN IF NOT EXISTS unit_price_value NUMERIC(14, 4),
+    ADD COLUMN IF NOT EXISTS total_price_value NUMERIC(14, 2),
+    ADD COLUMN IF NOT EXISTS currency CHAR(3);
+
+-- Spend-per-product rollups (SUM(total_price_value) GROUP BY product_code) as index-only scans.
+CREATE INDEX IF NOT EXISTS invoice_line_item_product_spend_idx
+    ON invoice_line_item (product_code) INCLUDE (total_price_value, quantity_value);
+
+-- Raw values that could not be parsed, for review. Rows are kept after a fix;
+-- delete them once the line item has been corrected.
+CREATE TABLE IF NOT EXISTS invoice_line_item_parse_error (
+    in_invoice_processing_id INTEGER NOT NULL,
+    line_item_index INTEGER NOT NULL,
+    field_name TEXT NOT NULL,
+    raw_value TEXT NOT NULL,
+    logged_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (in_invoice_processing_id, line_item_index, field_name),
+    FOREIGN KEY (in_invoice_processing_id, line_item_index)
+        REFERENCES invoice_line_item (in_invoice_processing_id, line_item_index) ON DELETE CASCADE
+);
+
+COMMENT ON TABLE invoice_line_item IS 'One row per Textract line item, materialized from in_invoice_processing.';
+COMMENT ON COLUMN invoice_line_item.line_item_index IS 'Position of the line item within its Textract response.';
+COMMENT ON TABLE invoice_line_item_parse_error IS 'Line-item quantities and prices whose OCR text could not be parsed.';
@@ -0,0 +1,32 @@
+-- One row per processed Textract response: the invoice header fields, linked to
+-- the vendor and to the staging row it was extracted from.
+-- Filled by stored_procedures/process_invoice_data.sql; read by the Django app
+-- through the unmanaged invoice.models.ParsedInvoice.
+CREATE TABLE IF NOT EXISTS invoices (
+    invoice_id SERIAL PRIMARY KEY,
+
+    -- Staging row the invoice was extracted from; reprocessing updates in place.
+    in_invoice_processing_id INTEGER NOT NULL UNIQUE
+        REFERENCES in_invoice_processing_key (id) ON DELETE CASCADE,
+
+    s3_object_key VARCHAR(255) NOT NULL,
+    vendor_id INTEGER REFERENCES Vendors (VendorID),
+    invoice_number TEXT,
+    invoice_date TEXT,
+    due_date TEXT,
+    payment_terms TEXT,
+    total TEXT,
+    received_timestamp TIMESTAMP WITH TIME ZONE,
+
+    -- The web upload (Django invoice.Invoice) the PDF came from, matched on its S3 key.
+    web_invoice_id INTEGER UNIQUE REFERENCES invoice_invoice (id) ON DELETE SET NULL
+);
+
+-- Existing databases created before the web app read this table.
+ALTER TABLE invoices ADD COLUMN IF NOT EXISTS web_invoice_id INTEGER UNIQUE
+    REFERENCES invoice_invoice (id) ON DELETE SET NULL;
+
+CREATE INDEX IF NOT EXISTS invoices_vendor_id_idx ON invoices (vendor_id);
+
+COMMENT ON TABLE invoices IS 'Invoice header fields extracted from in_invoice_processing.';
+COMMENT ON COLUMN invoices.invoice_number IS 'Textract INVOICE_RECEIPT_ID.';
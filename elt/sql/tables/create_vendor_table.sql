@@ -1,13 +1,38 @@
-CREATE TABLE Vendors (
+CREATE TABLE IF NOT EXISTS Vendors (
     VendorID SERIAL PRIMARY KEY,
     VENDOR_NAME VARCHAR(255) NOT NULL,
     VENDOR_ADDRESS TEXT,
     VENDOR_PHONE VARCHAR(50),
     VENDOR_URL VARCHAR(255),
     -- Additional address fields if necessary
+    STREET VARCHAR(255),
     CITY VARCHAR(255),
     STATE VARCHAR(255),
     COUNTRY VARCHAR(255),
     ZIP_CODE VARCHAR(20),
-    UNIQUE (VENDOR_NAME, VENDOR_ADDRESS, VENDOR_PHONE)
-);
\ No newline at end of file
+
+    -- normalize_vendor_name(VENDOR_NAME): the vendor's identity, so OCR variants such as
+    -- 'KX Wholesale Seafood, Inc.' and 'KX WHOLESALE SEAFOOD' are one vendor.
+    normalized_name TEXT,
+    -- First token of normalized_name; fuzzy-match candidates must share it.
+    blocking_key TEXT
+);
+
+-- Existing databases created from earlier definitions: see upsert/dedupe_vendors.sql,
+-- which fills the new columns and merges duplicates before the unique index is built.
+ALTER TABLE Vendors ADD COLUMN IF NOT EXISTS STREET VARCHAR(255);
+ALTER TABLE Vendors ADD COLUMN IF NOT EXISTS normalized_name TEXT;
+ALTER TABLE Vendors ADD COLUMN IF NOT EXISTS blocking_key TEXT;
+ALTER TABLE Vendors DROP CONSTRAINT IF EXISTS vendors_vendor_name_vendor_address_vendor_phone_key;
+
+CREATE UNIQUE INDEX IF NOT EXISTS vendors_normalized_name_idx ON Vendors (normalized_name);
+CREATE INDEX IF NOT EXISTS vendors_blocking_key_idx ON Vendors (blocking_key);
+
+-- Every normalized spelling already resolved to a vendor, including fuzzy matches,
+-- so each spelling is matched once and then found by primary key.
+CREATE TABLE IF NOT EXISTS vendor_alias (
+    alias_key TEXT PRIMARY KEY,
+    vendor_id INTEGER NOT NULL REFERENCES Vendors (VendorID) ON DELETE CASCADE
+);
+
+COMMENT ON TABLE vendor_alias IS 'Normalized vendor-name spellings mapped to their canonical vendor.';
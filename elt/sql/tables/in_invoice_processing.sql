@@ -1,30 +1,95 @@
 -- Creates a table for storing raw JSON responses from Amazon Textract
 -- alongside metadata about the source file and processing status,
 -- serving as a staging area for further processing of invoice data.
-CREATE TABLE in_invoice_processing (
+--
+-- The staging table is range-partitioned by month on received_timestamp, so
+-- queries bounded by time only touch recent partitions, and old, fully processed
+-- months can be archived and dropped whole (lambda/src/partition_maintenance.py)
+-- instead of deleting rows. PostgreSQL requires unique keys on a partitioned
+-- table to include the partition key, so the one-row-per-S3-object guarantee and
+-- the id that derived tables reference live in the small, unpartitioned
+-- in_invoice_processing_key registry, which is kept after a month is archived.
+-- (Existing databases: see partitioning/migrate_in_invoice_processing.sql.)
+
+-- One row per S3 object ever staged.
+CREATE TABLE IF NOT EXISTS in_invoice_processing_key (
     -- Unique identifier for each entry in the staging area
     id SERIAL PRIMARY KEY,
-    
+
     -- The S3 object key where the source PDF/invoice is stored.
     -- This helps in tracking and referencing the original file.
+    s3_object_key VARCHAR(255) NOT NULL UNIQUE,
+
+    -- Partition the staging row was written to.
+    received_timestamp TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS in_invoice_processing (
+    -- Same id as the in_invoice_processing_key row.
+    id INTEGER NOT NULL,
+
     s3_object_key VARCHAR(255) NOT NULL,
-    
+
     -- Raw JSON response from Amazon Textract as a JSONB object.
     -- JSONB format allows for efficient querying and manipulation of the JSON data.
     textract_json JSONB NOT NULL,
-    
-    -- Timestamp when the record was inserted into the database.
-    -- Automatically captures the current timestamp at the time of insertion.
-    received_timestamp TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-    
+
+    -- Timestamp when the record was inserted into the database; the partition key.
+    received_timestamp TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
     -- Boolean flag indicating whether the Textract response has been processed.
     -- Useful for batch processing and ensuring data is processed only once.
-    processed BOOLEAN DEFAULT FALSE
-);
+    processed BOOLEAN DEFAULT FALSE,
+
+    -- Canonical vendor, resolved by the loader (vendor_resolver.py) when the row is staged.
+    -- NULL rows are resolved by exact normalized name in process_invoice_data.
+    vendor_id INTEGER,
+
+    PRIMARY KEY (id, received_timestamp)
+) PARTITION BY RANGE (received_timestamp);
+
+-- Catches rows outside every monthly partition, so a missed maintenance run never
+-- fails inserts. It should stay empty: a month cannot be attached while its rows sit here.
+CREATE TABLE IF NOT EXISTS in_invoice_processing_default PARTITION OF in_invoice_processing DEFAULT;
+
+-- Creates the monthly partitions in_invoice_processing_pYYYYMM (UTC months) from
+-- from_month through months_ahead months later, skipping ones that exist.
+-- Returns the number created. Run by partition_maintenance.py ahead of time.
+CREATE OR REPLACE FUNCTION create_in_invoice_processing_partitions(
+    months_ahead INTEGER DEFAULT 3,
+    from_month DATE DEFAULT (now() AT TIME ZONE 'UTC')::DATE
+)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    month_start DATE;
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    FOR i IN 0..months_ahead LOOP
+        month_start := (date_trunc('month', from_month) + make_interval(months => i))::DATE;
+        partition_name := format('in_invoice_processing_p%s', to_char(month_start, 'YYYYMM'));
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF in_invoice_processing FOR VALUES FROM (%L) TO (%L)',
+                partition_name,
+                month_start::TIMESTAMP AT TIME ZONE 'UTC',
+                (month_start + INTERVAL '1 month')::TIMESTAMP AT TIME ZONE 'UTC');
+            created := created + 1;
+        END IF;
+    END LOOP;
+    RETURN created;
+END;
+$$;
+
+SELECT create_in_invoice_processing_partitions();
 
 -- Optional: Add comments to the table and its columns for further clarification
-COMMENT ON TABLE in_invoice_processing IS 'Staging area for raw JSON responses from Amazon Textract with metadata.';
+COMMENT ON TABLE in_invoice_processing_key IS 'One row per staged S3 object; survives archiving of its partition.';
+COMMENT ON TABLE in_invoice_processing IS 'Staging area for raw JSON responses from Amazon Textract with metadata, partitioned by month.';
 COMMENT ON COLUMN in_invoice_processing.s3_object_key IS 'S3 object key for the source file.';
 COMMENT ON COLUMN in_invoice_processing.textract_json IS 'Raw JSON response from Amazon Textract.';
 COMMENT ON COLUMN in_invoice_processing.received_timestamp IS 'Timestamp when the record was inserted.';
-COMMENT ON COLUMN in_invoice_processing.processed IS 'Flag indicating if the response has been processed.';
\ No newline at end of file
+COMMENT ON COLUMN in_invoice_processing.processed IS 'Flag indicating if the response has been processed.';
+COMMENT ON COLUMN in_invoice_processing.vendor_id IS 'Canonical Vendors.VendorID resolved at load time.';
@@ -0,0 +1,38 @@
+-- Typed extraction of Textract SummaryFields: one row per field, keyed by the
+-- staging row and the field's position. Lookups by vendor, total or date are
+-- index scans on this table instead of expanding textract_json for every invoice.
+-- Filled by stored_procedures/load_invoice_summary_fields.sql from process_invoice_data.
+CREATE TABLE IF NOT EXISTS invoice_summary_field (
+    in_invoice_processing_id INTEGER NOT NULL
+        REFERENCES in_invoice_processing_key (id) ON DELETE CASCADE,
+
+    -- 1-based position within the response (across all ExpenseDocuments).
+    field_index INTEGER NOT NULL,
+
+    -- Type->>'Text', e.g. VENDOR_NAME, TOTAL, INVOICE_RECEIPT_DATE.
+    field_type TEXT NOT NULL,
+
+    -- First GroupProperties type, e.g. VENDOR or RECEIVER_BILL_TO; NULL when ungrouped.
+    group_type TEXT,
+
+    label_text TEXT,
+    value_text TEXT,
+    confidence REAL,
+
+    PRIMARY KEY (in_invoice_processing_id, field_index)
+);
+
+-- "All invoices whose TOTAL / INVOICE_RECEIPT_DATE / VENDOR_NAME is X".
+CREATE INDEX IF NOT EXISTS invoice_summary_field_type_value_idx
+    ON invoice_summary_field (field_type, value_text);
+
+-- Per-invoice pivots (ext1_vendor) read only the types they need.
+CREATE INDEX IF NOT EXISTS invoice_summary_field_processing_type_idx
+    ON invoice_summary_field (in_invoice_processing_id, field_type);
+
+-- Case-insensitive vendor search.
+CREATE INDEX IF NOT EXISTS invoice_summary_field_vendor_name_idx
+    ON invoice_summary_field (LOWER(value_text))
+    WHERE field_type = 'VENDOR_NAME';
+
+COMMENT ON TABLE invoice_summary_field IS 'One row per Textract summary field, extracted from in_invoice_processing.';
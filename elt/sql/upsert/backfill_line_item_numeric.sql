@@ -0,0 +1,30 @@
+-- One-off: parse quantities and prices of line items loaded before the NUMERIC
+-- columns existed. New rows are parsed by load_invoice_line_items.
+UPDATE invoice_line_item li
+SET quantity_value = qty.amount,
+    quantity_unit = qty.unit,
+    unit_price_value = unit_price.amount,
+    total_price_value = total_price.amount,
+    currency = COALESCE(total_price.currency, unit_price.currency)
+FROM invoice_line_item src
+CROSS JOIN LATERAL parse_quantity(src.quantity) AS qty
+CROSS JOIN LATERAL parse_money(src.unit_price) AS unit_price
+CROSS JOIN LATERAL parse_money(src.total_price) AS total_price
+WHERE li.in_invoice_processing_id = src.in_invoice_processing_id
+  AND li.line_item_index = src.line_item_index
+  AND li.quantity_value IS NULL
+  AND li.unit_price_value IS NULL
+  AND li.total_price_value IS NULL;
+
+INSERT INTO invoice_line_item_parse_error (in_invoice_processing_id, line_item_index, field_name, raw_value)
+SELECT li.in_invoice_processing_id, li.line_item_index, bad.field_name, bad.raw_value
+FROM invoice_line_item li
+CROSS JOIN LATERAL (
+    VALUES
+        ('quantity', li.quantity, li.quantity_value),
+        ('unit_price', li.unit_price, li.unit_price_value),
+        ('total_price', li.total_price, li.total_price_value)
+) AS bad(field_name, raw_value, parsed_value)
+WHERE bad.raw_value IS NOT NULL
+  AND bad.parsed_value IS NULL
+ON CONFLICT DO NOTHING;
@@ -0,0 +1,40 @@
+-- One-off migration to normalized vendor identity. Run in a single transaction
+-- before building vendors_normalized_name_idx on an existing database.
+
+-- The (name, address, phone) index is replaced by the normalized-name index.
+DROP INDEX IF EXISTS vendors_identity_idx;
+
+UPDATE Vendors
+SET normalized_name = normalize_vendor_name(VENDOR_NAME),
+    blocking_key = split_part(normalize_vendor_name(VENDOR_NAME), ' ', 1)
+WHERE normalized_name IS NULL;
+
+-- Keep the oldest vendor per normalized name; remember the rest as aliases.
+CREATE TEMP TABLE vendor_merge ON COMMIT DROP AS
+SELECT v.VendorID AS duplicate_id, keep.VendorID AS canonical_id
+FROM Vendors v
+JOIN LATERAL (
+    SELECT MIN(VendorID) AS VendorID FROM Vendors k WHERE k.normalized_name = v.normalized_name
+) keep ON keep.VendorID <> v.VendorID;
+
+UPDATE invoices i
+SET vendor_id = m.canonical_id
+FROM vendor_merge m
+WHERE i.vendor_id = m.duplicate_id;
+
+UPDATE in_invoice_processing inp
+SET vendor_id = m.canonical_id
+FROM vendor_merge m
+WHERE inp.vendor_id = m.duplicate_id;
+
+DELETE FROM Vendors v
+USING vendor_merge m
+WHERE v.VendorID = m.duplicate_id;
+
+INSERT INTO vendor_alias (alias_key, vendor_id)
+SELECT normalized_name, VendorID
+FROM Vendors
+WHERE normalized_name <> ''
+ON CONFLICT (alias_key) DO NOTHING;
+
+CREATE UNIQUE INDEX IF NOT EXISTS vendors_normalized_name_idx ON Vendors (normalized_name);
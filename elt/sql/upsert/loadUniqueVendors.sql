@@ -1,15 +1,23 @@
-INSERT INTO Vendors (VENDOR_NAME, VENDOR_ADDRESS, VENDOR_PHONE, VENDOR_URL, ADDRESS_BLOCK, STREET, CITY, STATE, COUNTRY, ZIP_CODE)
-SELECT 
-vendor_name, 
-vendor_address, 
-vendor_phone, 
-vendor_url, 
-vendor_address AS ADDRESS_BLOCK,
-street,
-city, 
-state, 
-country, 
-zip_code
-
-FROM for_vendor
-ON CONFLICT (VENDOR_NAME, VENDOR_ADDRESS, VENDOR_PHONE) DO NOTHING;
+-- One-off backfill of Vendors from every staged Textract response, including rows
+-- already marked processed. Routine loading is done by process_invoice_data.
+INSERT INTO Vendors (VENDOR_NAME, normalized_name, blocking_key, VENDOR_ADDRESS, VENDOR_PHONE, VENDOR_URL,
+                     STREET, CITY, STATE, COUNTRY, ZIP_CODE)
+SELECT DISTINCT ON (n.normalized_name)
+    s.vendor_name,
+    n.normalized_name,
+    split_part(n.normalized_name, ' ', 1),
+    s.vendor_address,
+    s.vendor_phone,
+    s.vendor_url,
+    s.street,
+    s.city,
+    s.state,
+    s.country,
+    s.zip_code
+FROM in_invoice_processing inp
+CROSS JOIN LATERAL extract_invoice_summary(inp.textract_json) s
+CROSS JOIN LATERAL (SELECT normalize_vendor_name(s.vendor_name) AS normalized_name) n
+WHERE n.normalized_name <> ''
+  AND NOT EXISTS (SELECT 1 FROM vendor_alias a WHERE a.alias_key = n.normalized_name)
+ORDER BY n.normalized_name, inp.id
+ON CONFLICT (normalized_name) DO NOTHING;
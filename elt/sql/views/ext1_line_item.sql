@@ -1,3 +1,6 @@
+-- Raw, per-field expansion of every staged Textract response. Useful for ad-hoc
+-- inspection only: it re-reads all of in_invoice_processing on each query.
+-- Reporting should use ext2_line_item, which reads the materialized invoice_line_item table.
 CREATE OR REPLACE VIEW ext1_line_item AS
 SELECT
     inp.id AS in_invoice_processing_id,
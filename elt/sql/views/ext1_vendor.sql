@@ -1,19 +1,26 @@
+-- Vendor fields per staged invoice, read from the typed invoice_summary_field table
+-- (indexed on processing id and field type) rather than by expanding textract_json.
+-- Address parts are taken from the group Textract tags as VENDOR, so the receiver's
+-- bill-to/ship-to address is not mixed in.
 CREATE OR REPLACE VIEW ext1_vendor AS
 SELECT
     inp.id AS processing_id,
     inp.s3_object_key,
-    MAX(CASE WHEN sf.value->>'VENDOR_NAME' THEN sf.value->'ValueDetection'->>'Text' END) AS vendor_name,
-    MAX(CASE WHEN sf.value->>'Type' = 'ADDRESS' THEN sf.value->'ValueDetection'->>'Text' END) AS vendor_address,
-    MAX(CASE WHEN sf.value->>'Type' = 'STREET' THEN sf.value->'ValueDetection'->>'Text' END) AS street,
+    MAX(CASE WHEN sf.field_type = 'VENDOR_NAME' THEN sf.value_text END) AS vendor_name,
+    MAX(CASE WHEN sf.field_type = 'VENDOR_ADDRESS' THEN sf.value_text END) AS vendor_address,
+    MAX(CASE WHEN sf.field_type = 'STREET' AND sf.group_type = 'VENDOR' THEN sf.value_text END) AS street,
     -- Add other fields as necessary, following the pattern above
-    MAX(CASE WHEN sf.value->>'Type' = 'CITY' THEN sf.value->'ValueDetection'->>'Text' END) AS city,
-    MAX(CASE WHEN sf.value->>'Type' = 'STATE' THEN sf.value->'ValueDetection'->>'Text' END) AS state,
-    MAX(CASE WHEN sf.value->>'Type' = 'COUNTRY' THEN sf.value->'ValueDetection'->>'Text' END) AS country,
-    MAX(CASE WHEN sf.value->>'Type' = 'ZIP_CODE' THEN sf.value->'ValueDetection'->>'Text' END) AS zip_code,
-    MAX(CASE WHEN sf.value->>'Type' = 'VENDOR_PHONE' THEN sf.value->'ValueDetection'->>'Text' END) AS vendor_phone,
-    MAX(CASE WHEN sf.value->>'Type' = 'VENDOR_URL' THEN sf.value->'ValueDetection'->>'Text' END) AS vendor_url
+    MAX(CASE WHEN sf.field_type = 'CITY' AND sf.group_type = 'VENDOR' THEN sf.value_text END) AS city,
+    MAX(CASE WHEN sf.field_type = 'STATE' AND sf.group_type = 'VENDOR' THEN sf.value_text END) AS state,
+    MAX(CASE WHEN sf.field_type = 'COUNTRY' AND sf.group_type = 'VENDOR' THEN sf.value_text END) AS country,
+    MAX(CASE WHEN sf.field_type = 'ZIP_CODE' AND sf.group_type = 'VENDOR' THEN sf.value_text END) AS zip_code,
+    MAX(CASE WHEN sf.field_type = 'VENDOR_PHONE' THEN sf.value_text END) AS vendor_phone,
+    MAX(CASE WHEN sf.field_type = 'VENDOR_URL' THEN sf.value_text END) AS vendor_url
 FROM
-    in_invoice_processing inp,
-    jsonb_array_elements(inp.textract_json->'ExpenseDocuments'->0->'SummaryFields') AS sf(value)
+    in_invoice_processing inp
+    JOIN invoice_summary_field sf ON sf.in_invoice_processing_id = inp.id
+WHERE
+    sf.field_type IN ('VENDOR_NAME', 'VENDOR_ADDRESS', 'STREET', 'CITY', 'STATE', 'COUNTRY',
+                      'ZIP_CODE', 'VENDOR_PHONE', 'VENDOR_URL')
 GROUP BY
     inp.id, inp.s3_object_key;
@@ -1,16 +1,22 @@
+-- Reporting view over the materialized invoice_line_item table
+-- (see stored_procedures/load_invoice_line_items.sql). Keeps the original
+-- ext2_line_item columns, but reads stored rows instead of re-expanding and
+-- pivoting every Textract document on each query. The parsed NUMERIC columns are
+-- appended so existing consumers of the original column list keep working.
 CREATE OR REPLACE VIEW ext2_line_item AS
 SELECT
     in_invoice_processing_id,
     s3_object_key,
-    MAX(CASE WHEN line_item_expense_field->'Type'->>'Text' = 'PRODUCT_CODE' THEN line_item_expense_field->'ValueDetection'->>'Text' END) AS product_code,
-    MAX(CASE WHEN line_item_expense_field->'Type'->>'Text' = 'ITEM' THEN line_item_expense_field->'LabelDetection'->>'Text' END) AS item_description,
-    MAX(CASE WHEN line_item_expense_field->'Type'->>'Text' = 'QUANTITY' THEN line_item_expense_field->'ValueDetection'->>'Text' END) AS quantity,
-    MAX(CASE WHEN line_item_expense_field->'Type'->>'Text' = 'UNIT_PRICE' THEN line_item_expense_field->'ValueDetection'->>'Text' END) AS unit_price,
-    MAX(CASE WHEN line_item_expense_field->'Type'->>'Text' = 'PRICE' THEN line_item_expense_field->'ValueDetection'->>'Text' END) AS total_price,
-    received_timestamp
+    product_code,
+    item_description,
+    quantity,
+    unit_price,
+    total_price,
+    received_timestamp,
+    quantity_value,
+    quantity_unit,
+    unit_price_value,
+    total_price_value,
+    currency
 FROM
-    ext1_line_item
-GROUP BY
-    in_invoice_processing_id,
-    s3_object_key,
-    received_timestamp;
+    invoice_line_item;
@@ -3,7 +3,8 @@ Django AppConfig for the inventory app.
 
 This module defines the Django AppConfig, `InventoryConfig`, for the
 inventory app. It specifies the default auto field, app name, and a
-unique label.
+unique label. `ready()` connects the app's signal receivers and the
+project's database connection tuning (WebApp/db.py).
 
 Imported Modules:
     - django.apps: Provides tools for configuring Django applications.
@@ -20,3 +21,8 @@ class InventoryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inventory' # app name
     label = 'inventory_app' # unique label
+
+    def ready(self):
+        """ Connect the GL tree cache invalidation signals and the SQLite connection tuning. """
+        from . import signals  # pylint: disable=import-outside-toplevel,unused-import
+        from WebApp import db  # pylint: disable=import-outside-toplevel,unused-import
@@ -9,6 +9,9 @@ Imported Modules:
     - django.forms: Provides tools for working with forms.
     - .models.InventoryItem: The InventoryItem model.
 
+`InventoryBatchFormSet` takes many images, each with its own GL/product selection, in one
+request (see `views.inventory_batch_view`).
+
 Usage:
     - Import this module within a Django project's views to instantiate the form with request data.
     - Render the `InventoryDataCollectionForm` in templates to capture inventory data from users.
@@ -17,8 +20,11 @@ Requirements:
     - The InventoryItem model, as well as related GL level models, must be defined within the models.py file of the application.
 """
 
+from concurrent.futures import ThreadPoolExecutor
 from django import forms
+from django.conf import settings
 from .models import InventoryItem, GLLevel1, GLLevel2, GLLevel3, Product
+from .storage_backends import is_user_image_key
 
 class InventoryDataCollectionForm(forms.ModelForm):
     """A form class for collecting and validating data related to the
@@ -36,3 +42,130 @@ class InventoryDataCollectionForm(forms.ModelForm):
         - Meta.fields (list): List of fields included in the form, corresponding to model attributes."""
         model = InventoryItem
         fields = ['image', 'gl_level_1', 'gl_level_2', 'gl_level_3', 'product']
+
+
+class InventoryUploadConfirmForm(InventoryDataCollectionForm):
+    """Records an image the browser uploaded straight to S3 (see WebApp/direct_uploads.py).
+
+    Takes the same GL/product fields as `InventoryDataCollectionForm`, plus the S3 `key` returned
+    by the presign endpoint instead of the image file. The key must belong to `user`.
+    """
+    key = forms.CharField(max_length=255)
+
+    class Meta(InventoryDataCollectionForm.Meta):
+        fields = ['gl_level_1', 'gl_level_2', 'gl_level_3', 'product']
+
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.user = user
+
+    def clean_key(self):
+        key = self.cleaned_data['key']
+        if self.user is None or not is_user_image_key(key, self.user.id):
+            raise forms.ValidationError("This upload key does not belong to you.")
+        return key
+
+
+# (field, model, parent field) in parent-before-child order.
+BATCH_LEVELS = [
+    ('gl_level_1', GLLevel1, None),
+    ('gl_level_2', GLLevel2, 'gl_level_1'),
+    ('gl_level_3', GLLevel3, 'gl_level_2'),
+    ('product', Product, 'gl_level_3'),
+]
+
+
+class InventoryBatchItemForm(forms.Form):
+    """One image of a batch submission, with its GL/product selection as ids.
+
+    The ids are resolved and checked by `BaseInventoryBatchFormSet.clean` for the whole batch at
+    once, instead of one lookup query per field per image as a ModelChoiceField would do. Every
+    level is required: the upload worker cannot build a label for an item missing one.
+    """
+    image = forms.ImageField()
+    gl_level_1 = forms.IntegerField()
+    gl_level_2 = forms.IntegerField()
+    gl_level_3 = forms.IntegerField()
+    product = forms.IntegerField()
+
+
+class BaseInventoryBatchFormSet(forms.BaseFormSet):
+    """Validates a batch of images together and saves it with one bulk_create."""
+
+    @property
+    def filled_forms(self):
+        """The forms of a validated formset that hold an item; rows left blank are skipped."""
+        return [form for form in self.forms if form.cleaned_data]
+
+    def clean(self):
+        """Resolves every selected GL level and product with one query per level and checks the hierarchy."""
+        if any(self.errors):
+            return
+        for field, model, parent_field in BATCH_LEVELS:
+            ids = {form.cleaned_data[field] for form in self.filled_forms if form.cleaned_data.get(field) is not None}
+            found = model.objects.in_bulk(ids)  # pylint: disable=no-member
+            for form in self.filled_forms:
+                selected = form.cleaned_data.get(field)
+                if selected is None:
+                    continue
+                if selected not in found:
+                    form.add_error(field, 'Select a valid choice.')
+                    continue
+                parent = form.cleaned_data.get(parent_field) if parent_field else None
+                if parent is not None and found[selected].parent_id != parent:
+                    form.add_error(field, 'Does not belong to the selected parent level.')
+
+    def save(self, user):
+        """
+        Stores every image concurrently, then inserts all the rows with one bulk_create.
+
+        Images are staged through the 'inventory_images' storage under their final S3 keys; the
+        upload worker puts them to S3 once the rows are queued.
+
+        Args:
+            user: The submitting user.
+
+        Returns:
+            list: The created InventoryItem instances, in submission order, with primary keys.
+        """
+        filled_forms = self.filled_forms
+        items = []
+        for form in filled_forms:
+            data = form.cleaned_data
+            items.append(InventoryItem(
+                user=user,
+                gl_level_1_id=data['gl_level_1'],
+                gl_level_2_id=data['gl_level_2'],
+                gl_level_3_id=data['gl_level_3'],
+                product_id=data['product'],
+                status=InventoryItem.STATUS_PENDING,
+            ))
+
+        def store(index):
+            image = filled_forms[index].cleaned_data['image']
+            items[index].image.save(image.name, image, save=False)
+
+        with ThreadPoolExecutor(max_workers=min(len(items), settings.INVENTORY_UPLOAD_WORKERS) or 1,
+                                thread_name_prefix='inventory-batch') as pool:
+            futures = [pool.submit(store, index) for index in range(len(items))]
+        errors = [future.exception() for future in futures if future.exception() is not None]
+        if errors:
+            # No row will reference the images that were stored; do not leave them behind.
+            for item, future in zip(items, futures):
+                if future.exception() is None:
+                    item.image.storage.delete(item.image.name)
+            raise errors[0]
+
+        return InventoryItem.objects.bulk_create(items)
+
+
+InventoryBatchFormSet = forms.formset_factory(
+    InventoryBatchItemForm,
+    formset=BaseInventoryBatchFormSet,
+    extra=0,
+    min_num=1,
+    validate_min=True,
+    max_num=settings.INVENTORY_BATCH_MAX_ITEMS,
+    absolute_max=settings.INVENTORY_BATCH_MAX_ITEMS,
+    validate_max=True,
+)
@@ -0,0 +1,73 @@
+"""
+In-process cache of the GL Level 1 -> GL Level 2 -> GL Level 3 -> Product hierarchy.
+
+The inventory form used to fill its cascading dropdowns with three AJAX round trips per item.
+This module builds the whole hierarchy once as compact JSON so `views.get_gl_tree` can serve it
+in a single response, tagged with an ETag that browsers revalidate with conditional requests.
+
+Payload format:
+    {"tree": [[gl1_id, gl1_name, [[gl2_id, gl2_name, [[gl3_id, gl3_name, [[product_id, product_name], ...]], ...]], ...]], ...]}
+
+Invalidation:
+    - post_save/post_delete of the four models call `invalidate_gl_tree` once their transaction
+      commits (`signals.py`). Bulk operations (which send no signals) must call it explicitly,
+      after the commit.
+    - Other processes pick up changes after GL_TREE_CACHE_TIMEOUT seconds.
+"""
+import json
+import time
+import hashlib
+import threading
+from django.conf import settings
+from .models import GLLevel1, GLLevel2, GLLevel3, Product
+
+
+_cache = {'payload': None, 'etag': None, 'built_at': 0.0}
+_cache_lock = threading.Lock()
+
+
+def _build_payload():
+    """Query the four levels (one query each) and nest them into the compact tree."""
+    # pylint: disable=no-member
+    products = {}
+    for product_id, name, parent_id in Product.objects.order_by('name').values_list('id', 'name', 'parent_id'):
+        products.setdefault(parent_id, []).append([product_id, name])
+
+    gl3_children = {}
+    for gl3_id, name, parent_id in GLLevel3.objects.order_by('name').values_list('id', 'name', 'parent_id'):
+        gl3_children.setdefault(parent_id, []).append([gl3_id, name, products.get(gl3_id, [])])
+
+    gl2_children = {}
+    for gl2_id, name, parent_id in GLLevel2.objects.order_by('name').values_list('id', 'name', 'parent_id'):
+        gl2_children.setdefault(parent_id, []).append([gl2_id, name, gl3_children.get(gl2_id, [])])
+
+    tree = [
+        [gl1_id, name, gl2_children.get(gl1_id, [])]
+        for gl1_id, name in GLLevel1.objects.order_by('name').values_list('id', 'name')
+    ]
+    return json.dumps({'tree': tree}, separators=(',', ':')).encode('utf-8')
+
+
+def get_gl_tree():
+    """
+    Return the cached hierarchy payload and its ETag, rebuilding it if needed.
+
+    Returns:
+        tuple: (payload bytes, ETag string). The ETag is a hash of the payload, so every
+        process serving the same data hands out the same tag.
+    """
+    with _cache_lock:
+        expired = time.monotonic() - _cache['built_at'] > settings.GL_TREE_CACHE_TIMEOUT
+        if _cache['payload'] is None or expired:
+            payload = _build_payload()
+            _cache['payload'] = payload
+            _cache['etag'] = hashlib.sha1(payload).hexdigest()
+            _cache['built_at'] = time.monotonic()
+        return _cache['payload'], _cache['etag']
+
+
+def invalidate_gl_tree(**kwargs):  # pylint: disable=unused-argument
+    """Drop the cached hierarchy. Usable directly or as a model signal receiver."""
+    with _cache_lock:
+        _cache['payload'] = None
+        _cache['etag'] = None
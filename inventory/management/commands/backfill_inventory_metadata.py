@@ -0,0 +1,60 @@
+"""
+Management command that re-writes the DynamoDB label metadata of uploaded inventory items.
+
+Used after the label table is recreated or its attributes change. Items are streamed from the
+database and written through `BatchMetadataWriter`, 25 per batch_write_item request, with
+unprocessed items retried under backoff.
+
+Usage:
+    python manage.py backfill_inventory_metadata [--since YYYY-MM-DD] [--user-id ID] [--dry-run]
+"""
+import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from inventory.models import InventoryItem
+from inventory.storage_backends import AWSStorageBackend
+from inventory.upload_queue import build_item_data
+
+
+class Command(BaseCommand):
+    """ Batched DynamoDB backfill of inventory label metadata. """
+    help = 'Re-write the DynamoDB label metadata of uploaded inventory items in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Only items uploaded on or after this date (YYYY-MM-DD).')
+        parser.add_argument('--user-id', type=int, help='Only items uploaded by this user.')
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Rows fetched from the database per query.')
+        parser.add_argument('--dry-run', action='store_true', help='Count the items without writing them.')
+
+    def handle(self, *args, **options):
+        items = InventoryItem.objects.filter(status=InventoryItem.STATUS_UPLOADED).exclude(filename='')
+        if options['since']:
+            try:
+                since = datetime.date.fromisoformat(options['since'])
+            except ValueError as e:
+                raise CommandError(f"Invalid --since date: {options['since']}") from e
+            items = items.filter(timestamp__gte=timezone.make_aware(datetime.datetime.combine(since, datetime.time())))
+        if options['user_id']:
+            items = items.filter(user_id=options['user_id'])
+        items = items.select_related('gl_level_1', 'gl_level_2', 'gl_level_3', 'product').order_by('id')
+
+        if options['dry_run']:
+            self.stdout.write(f'{items.count()} item(s) would be written.')
+            return
+
+        queued = 0
+        failed = []
+        # No interval timer: the writer flushes whenever a full batch is buffered, and on exit.
+        with AWSStorageBackend().metadata_writer(flush_interval=0) as writer:
+            for item in items.iterator(chunk_size=options['chunk_size']):
+                if item.gl_level_1 is None or item.gl_level_2 is None or item.gl_level_3 is None or item.product is None:
+                    self.stderr.write(f'Skipping item {item.id}: missing GL levels or product')
+                    continue
+                writer.add(build_item_data(item, item.filename),
+                           callback=lambda written, item_id=item.id: written or failed.append(item_id))
+                queued += 1
+
+        if failed:
+            raise CommandError(f'{len(failed)} of {queued} item(s) could not be written: {failed[:20]}')
+        self.stdout.write(self.style.SUCCESS(f'{queued} item(s) written.'))
@@ -0,0 +1,138 @@
+"""
+Management command that bulk-loads the GL hierarchy and product catalog from CSV files.
+
+Replaces the old `import_gl_data.py` script, which issued one `get_or_create` and one parent
+lookup query per CSV row. This command streams each CSV once, resolves parents from a
+name -> id map built with a single query per level, and writes with `bulk_create` /
+`bulk_update` in batches, all inside one transaction.
+
+Expected files (override individually with --gl1/--gl2/--gl3/--products):
+    <directory>/GLLevel1.csv  columns: name
+    <directory>/GLLevel2.csv  columns: name, parent (GL Level 1 name)
+    <directory>/GLLevel3.csv  columns: name, parent (GL Level 2 name)
+    <directory>/Products.csv  columns: name, parent (GL Level 3 name)
+
+Usage:
+    python manage.py load_catalog "/path/to/Django GL and Product CSV"
+"""
+import csv
+import os
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from inventory.gl_tree import invalidate_gl_tree
+from inventory.models import GLLevel1, GLLevel2, GLLevel3, Product
+
+
+# (option name, default filename, model, label), in parent-before-child order.
+LEVELS = [
+    ('gl1', 'GLLevel1.csv', GLLevel1, 'GL Level 1'),
+    ('gl2', 'GLLevel2.csv', GLLevel2, 'GL Level 2'),
+    ('gl3', 'GLLevel3.csv', GLLevel3, 'GL Level 3'),
+    ('products', 'Products.csv', Product, 'Products'),
+]
+
+
+def read_rows(path):
+    """Yield CSV rows with BOMs and surrounding whitespace stripped from keys and values."""
+    with open(path, newline='', encoding='utf-8-sig') as csvfile:
+        for row in csv.DictReader(csvfile):
+            yield {key.lstrip('\ufeff').strip(): (value or '').strip() for key, value in row.items() if key}
+
+
+class Command(BaseCommand):
+    """ Bulk, transactional loader for GLLevel1/2/3 and Product rows. """
+    help = 'Load the GL hierarchy and product catalog from CSV files in bulk.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', nargs='?', default='.',
+                            help='Directory containing GLLevel1.csv, GLLevel2.csv, GLLevel3.csv and Products.csv.')
+        for option, filename, _, label in LEVELS:
+            parser.add_argument(f'--{option}', help=f'Path to the {label} CSV (default: <directory>/{filename}).')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Rows per bulk_create/bulk_update statement.')
+
+    def handle(self, *args, **options):
+        paths = []
+        for option, filename, model, label in LEVELS:
+            path = options[option] or os.path.join(options['directory'], filename)
+            if not os.path.exists(path):
+                raise CommandError(f'{label} CSV not found: {path}')
+            paths.append((path, model, label))
+
+        with transaction.atomic():
+            parent_ids = None
+            for path, model, label in paths:
+                parent_ids, counts = self.load_level(path, model, parent_ids, options['batch_size'])
+                self.stdout.write(
+                    f"{label}: {counts['inserted']} inserted, {counts['updated']} updated, "
+                    f"{counts['skipped']} skipped"
+                )
+
+        # bulk_create/bulk_update send no model signals, so drop the dropdown cache explicitly.
+        invalidate_gl_tree()
+        self.stdout.write(self.style.SUCCESS('Catalog loaded successfully.'))
+
+    def load_level(self, path, model, parent_ids, batch_size):
+        """
+        Stream one CSV into `model`.
+
+        Args:
+            path (str): CSV path.
+            model: GLLevel1, GLLevel2, GLLevel3 or Product.
+            parent_ids (dict | None): Parent name -> id map, or None for GL Level 1.
+            batch_size (int): Rows per bulk statement.
+
+        Returns:
+            tuple: (name -> id map for this level, counts dict).
+        """
+        has_parent = parent_ids is not None
+        fields = ('name', 'id', 'parent_id') if has_parent else ('name', 'id')
+        # One query per level; every later lookup is a dict hit.
+        existing = {row[0]: row[1:] for row in model.objects.values_list(*fields)}  # pylint: disable=no-member
+        counts = {'inserted': 0, 'updated': 0, 'skipped': 0}
+        seen = set()
+        to_create = []
+        to_update = []
+
+        for row in read_rows(path):
+            name = row.get('name', '')
+            if not name or name in seen:
+                counts['skipped'] += 1
+                continue
+            seen.add(name)
+
+            parent_id = None
+            if has_parent:
+                parent_id = parent_ids.get(row.get('parent', ''))
+                if parent_id is None:
+                    self.stderr.write(f"Parent not found for {name!r}: {row.get('parent', '')!r}")
+                    counts['skipped'] += 1
+                    continue
+
+            current = existing.get(name)
+            if current is None:
+                to_create.append(model(name=name, parent_id=parent_id) if has_parent else model(name=name))
+            elif has_parent and current[1] != parent_id:
+                to_update.append(model(id=current[0], name=name, parent_id=parent_id))
+            else:
+                counts['skipped'] += 1
+                continue
+
+            if len(to_create) >= batch_size:
+                model.objects.bulk_create(to_create, ignore_conflicts=True)  # pylint: disable=no-member
+                to_create = []
+            if len(to_update) >= batch_size:
+                model.objects.bulk_update(to_update, ['parent'])  # pylint: disable=no-member
+                counts['updated'] += len(to_update)
+                to_update = []
+
+        if to_create:
+            model.objects.bulk_create(to_create, ignore_conflicts=True)  # pylint: disable=no-member
+        if to_update:
+            model.objects.bulk_update(to_update, ['parent'])  # pylint: disable=no-member
+            counts['updated'] += len(to_update)
+
+        # ignore_conflicts returns no primary keys, so rebuild the map for the next level.
+        name_to_id = dict(model.objects.values_list('name', 'id'))  # pylint: disable=no-member
+        counts['inserted'] = len(name_to_id) - len(existing)
+        return name_to_id, counts
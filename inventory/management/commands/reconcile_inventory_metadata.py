@@ -0,0 +1,53 @@
+"""
+Management command that reconciles inventory label metadata between the database and DynamoDB.
+
+See `inventory/reconcile.py` for what is compared and repaired. The table is read with a
+parallel segmented scan and rows are streamed in id-ordered chunks, so the job costs a fixed
+number of requests per page/chunk rather than one get per row.
+
+Usage:
+    python manage.py reconcile_inventory_metadata [--segments 4] [--chunk-size 1000]
+        [--min-age-minutes 15] [--delete-orphans] [--dry-run]
+"""
+import datetime
+from django.core.management.base import BaseCommand, CommandError
+from inventory.reconcile import reconcile
+from inventory.storage_backends import AWSStorageBackend
+
+
+class Command(BaseCommand):
+    """ Diff and repair InventoryItem rows against the DynamoDB label table. """
+    help = 'Reconcile InventoryItem rows with the DynamoDB label table and repair the differences.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--segments', type=int, default=4, help='Parallel DynamoDB scan segments.')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Rows per database query and per repair batch.')
+        parser.add_argument('--min-age-minutes', type=int, default=15,
+                            help='Leave rows newer than this to the upload worker.')
+        parser.add_argument('--delete-orphans', action='store_true',
+                            help='Delete DynamoDB items that have no row and cannot be backfilled.')
+        parser.add_argument('--dry-run', action='store_true', help='Report the differences without repairing them.')
+
+    def handle(self, *args, **options):
+        if options['segments'] < 1 or options['chunk_size'] < 1:
+            raise CommandError('--segments and --chunk-size must be positive.')
+
+        backend = AWSStorageBackend()
+        with backend.metadata_writer(flush_interval=0) as writer:
+            report = reconcile(
+                backend.dynamodb_client, backend.table_name, writer,
+                segments=options['segments'],
+                chunk_size=options['chunk_size'],
+                min_age=datetime.timedelta(minutes=options['min_age_minutes']),
+                delete_orphans=options['delete_orphans'],
+                dry_run=options['dry_run'],
+            )
+
+        for name, value in report.as_dict().items():
+            self.stdout.write(f'{name}: {value}')
+        if report.orphans and not options['delete_orphans']:
+            self.stdout.write(f'Orphaned DynamoDB items (not deleted): {report.orphan_keys[:20]}')
+        if report.failed:
+            raise CommandError(f'{report.failed} DynamoDB write(s) failed; re-run to retry them.')
+        self.stdout.write(self.style.SUCCESS('Reconciliation finished.' if not options['dry_run'] else 'Dry run finished.'))
@@ -0,0 +1,55 @@
+"""
+Management command that retries inventory uploads left 'pending' by the background worker.
+
+`enqueue_upload` hands jobs to an in-process thread pool, so a job is lost if its process restarts
+(deploys, crashes, gunicorn worker recycling) before the job ran or before its batched metadata
+was flushed; nothing else re-submits those rows. This command picks up 'pending' rows older than
+a threshold and runs `process_upload` for each, writing the labels through one batched writer.
+Run it from cron or after a deploy. Re-running a row is safe: the image goes to the same S3 key
+and the label write is a put.
+
+Usage:
+    python manage.py requeue_pending_uploads [--older-than-minutes 15] [--limit N] [--dry-run]
+"""
+import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from inventory.models import InventoryItem
+from inventory.storage_backends import AWSStorageBackend
+from inventory.upload_queue import process_upload
+
+
+class Command(BaseCommand):
+    """ Retry stale 'pending' inventory uploads. """
+    help = "Retry inventory uploads that have been 'pending' for longer than a threshold."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-minutes', type=int, default=15,
+                            help='Only rows pending for longer than this; newer ones may still be in a worker.')
+        parser.add_argument('--limit', type=int, help='Retry at most this many rows, oldest first.')
+        parser.add_argument('--dry-run', action='store_true', help='Count the rows without retrying them.')
+
+    def handle(self, *args, **options):
+        if options['older_than_minutes'] < 0:
+            raise CommandError('--older-than-minutes must not be negative.')
+        cutoff = timezone.now() - datetime.timedelta(minutes=options['older_than_minutes'])
+        item_ids = InventoryItem.objects.filter(
+            status=InventoryItem.STATUS_PENDING, timestamp__lt=cutoff).order_by('timestamp').values_list('id', flat=True)
+        if options['limit']:
+            item_ids = item_ids[:options['limit']]
+        item_ids = list(item_ids)
+
+        if options['dry_run']:
+            self.stdout.write(f'{len(item_ids)} pending item(s) would be retried.')
+            return
+
+        # The writer sets each row's final status when it flushes, at the latest on exit.
+        with AWSStorageBackend().metadata_writer(flush_interval=0) as writer:
+            for item_id in item_ids:
+                process_upload(item_id, writer=writer)
+
+        uploaded = InventoryItem.objects.filter(id__in=item_ids, status=InventoryItem.STATUS_UPLOADED).count()
+        failed = len(item_ids) - uploaded
+        if failed:
+            raise CommandError(f'{failed} of {len(item_ids)} pending item(s) could not be uploaded.')
+        self.stdout.write(self.style.SUCCESS(f'{uploaded} pending item(s) uploaded.'))
@@ -0,0 +1,272 @@
+"""
+Batched writes of inventory label metadata to DynamoDB.
+
+`AWSStorageBackend.create_inventory_item` costs one `put_item` round trip per upload. During bulk
+counting sessions and backfills, `BatchMetadataWriter` buffers the item records and writes them
+with `batch_write_item`, 25 items (the API limit) per request:
+
+- The buffer is flushed when it reaches `flush_size` items, or `flush_interval` seconds after the
+  first buffered item, whichever comes first.
+- Items DynamoDB returns as `UnprocessedItems`, and whole batches rejected for throttling or lost
+  to connection errors (`BotoCoreError`), are retried with exponential backoff and full jitter,
+  up to `max_attempts` requests per batch.
+- Each buffered item can carry a callback that receives True once it is written, or False if it
+  could not be; every callback runs exactly once, whatever the client raised. `delete` buffers
+  deletions the same way.
+
+`InMemoryDynamoDB` implements the subset of the DynamoDB client used by the inventory app
+(including segmented scans), so tests and local runs without AWS need no table. It can be told
+to leave items unprocessed to exercise the retry path.
+
+Settings:
+    - DYNAMODB_BATCH_FLUSH_SIZE: Buffered items that trigger a flush.
+    - DYNAMODB_BATCH_FLUSH_INTERVAL: Seconds an item may wait in the buffer.
+    - DYNAMODB_BATCH_MAX_ATTEMPTS: batch_write_item requests per batch before items are given up.
+"""
+import time
+import zlib
+import random
+import logging
+import threading
+from botocore.exceptions import BotoCoreError, ClientError
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+BATCH_LIMIT = 25  # batch_write_item accepts at most 25 put/delete requests
+RETRYABLE_ERRORS = frozenset({
+    'ProvisionedThroughputExceededException', 'ThrottlingException', 'RequestLimitExceeded',
+    'InternalServerError',
+})
+
+
+class MetadataWriteError(Exception):
+    """Raised when inventory metadata could not be written to DynamoDB."""
+    def __init__(self, message, items=None):
+        super().__init__(message)
+        self.items = items or []
+
+
+class BatchMetadataWriter:
+    """
+    Buffers DynamoDB item records and writes them with batch_write_item.
+
+    Thread-safe: `add` may be called from several upload worker threads.
+
+    Args:
+        client: DynamoDB client (boto3, or `InMemoryDynamoDB`).
+        table_name (str): Destination table.
+        flush_size (int): Buffered items that trigger a flush (defaults to the setting).
+        flush_interval (float | None): Seconds before a non-empty buffer is flushed by a
+            background timer (defaults to the setting); None or 0 disables the timer.
+        max_attempts (int): Requests per batch, including retries of unprocessed items.
+        base_delay / max_delay (float): Backoff bounds in seconds.
+        on_timer_flush_done (callable | None): Called in the timer thread after it flushed, e.g. to
+            close that thread's database connections.
+        sleep: Injected for tests.
+    """
+    def __init__(self, client, table_name, flush_size=None, flush_interval=None, max_attempts=None,
+                 base_delay=0.05, max_delay=2.0, on_timer_flush_done=None, sleep=time.sleep):
+        self.client = client
+        self.table_name = table_name
+        self.flush_size = flush_size or settings.DYNAMODB_BATCH_FLUSH_SIZE
+        self.flush_interval = settings.DYNAMODB_BATCH_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.max_attempts = max_attempts or settings.DYNAMODB_BATCH_MAX_ATTEMPTS
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.on_timer_flush_done = on_timer_flush_done
+        self._sleep = sleep
+        self._buffer = []  # [(write request, callback)]
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add(self, item, callback=None):
+        """Buffers one item (a DynamoDB attribute map); flushes if the buffer is full."""
+        self._buffer_request({'PutRequest': {'Item': item}}, callback)
+
+    def delete(self, key, callback=None):
+        """Buffers the deletion of one item, given its key attributes; flushes if the buffer is full."""
+        self._buffer_request({'DeleteRequest': {'Key': key}}, callback)
+
+    def _buffer_request(self, request, callback):
+        with self._lock:
+            self._buffer.append((request, callback))
+            full = len(self._buffer) >= self.flush_size
+            if not full and self._timer is None and self.flush_interval:
+                self._timer = threading.Timer(self.flush_interval, self._flush_from_timer)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+
+    def pending(self):
+        """Number of buffered items not yet handed to DynamoDB."""
+        with self._lock:
+            return len(self._buffer)
+
+    def flush(self):
+        """
+        Writes every buffered item.
+
+        Returns:
+            list: The items (or, for deletions, keys) that could not be written; empty if all were.
+        """
+        with self._lock:
+            entries, self._buffer = self._buffer, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+        failed = []
+        for start in range(0, len(entries), BATCH_LIMIT):
+            failed.extend(self._write_batch(entries[start:start + BATCH_LIMIT]))
+        if failed:
+            logger.error("%d metadata item(s) could not be written to %s", len(failed), self.table_name)
+        return failed
+
+    def close(self):
+        """Flushes the buffer and stops the interval timer."""
+        return self.flush()
+
+    def _flush_from_timer(self):
+        try:
+            self.flush()
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Interval flush of DynamoDB metadata failed")
+        finally:
+            if self.on_timer_flush_done is not None:
+                self.on_timer_flush_done()
+
+    def _write_batch(self, entries):
+        """Writes up to 25 entries, retrying unprocessed ones; returns the items given up on."""
+        # The entries are no longer in the buffer: whatever happens, each callback must still run.
+        remaining = list(entries)
+        try:
+            remaining = self._attempt_batch(remaining)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("batch_write_item failed unexpectedly")
+        for entry in remaining:
+            _notify(entry, False)
+        return [_request_payload(request) for request, _ in remaining]
+
+    def _attempt_batch(self, remaining):
+        """Sends `remaining` up to max_attempts times; returns the entries still unwritten."""
+        for attempt in range(self.max_attempts):
+            if attempt:
+                # Full jitter: concurrent writers that were throttled together do not retry together.
+                self._sleep(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)))
+            try:
+                response = self.client.batch_write_item(RequestItems={
+                    self.table_name: [request for request, _ in remaining],
+                })
+            except ClientError as e:
+                if e.response.get('Error', {}).get('Code') in RETRYABLE_ERRORS:
+                    logger.warning("batch_write_item throttled (attempt %d): %s", attempt + 1, e)
+                    continue
+                logger.error("batch_write_item failed: %s", e)
+                return remaining
+            except BotoCoreError as e:
+                # Connection, timeout and credential errors: the request may not have reached DynamoDB.
+                logger.warning("batch_write_item failed (attempt %d): %s", attempt + 1, e)
+                continue
+
+            unprocessed = response.get('UnprocessedItems', {}).get(self.table_name, [])
+            still_pending = []
+            for entry in remaining:
+                if entry[0] in unprocessed:
+                    still_pending.append(entry)
+                else:
+                    _notify(entry, True)
+            remaining = still_pending
+            if not remaining:
+                return []
+        return remaining
+
+
+def _request_payload(request):
+    """The item of a PutRequest, or the key of a DeleteRequest."""
+    if 'PutRequest' in request:
+        return request['PutRequest']['Item']
+    return request['DeleteRequest']['Key']
+
+
+def _notify(entry, written):
+    """Runs an entry's callback; a failing callback must not abort the rest of the batch."""
+    _, callback = entry
+    if callback is None:
+        return
+    try:
+        callback(written)
+    except Exception:  # pylint: disable=broad-except
+        logger.exception("Metadata write callback failed")
+
+
+class InMemoryDynamoDB:
+    """
+    In-memory stand-in for the DynamoDB client calls used by the inventory app.
+
+    Items are stored per table, keyed by `key_attribute`. `unprocessed_rounds` makes the next N
+    batch_write_item calls return their last request as unprocessed, like a throttled table would.
+    `scan` honors Segment/TotalSegments, Limit and ExclusiveStartKey.
+    """
+    def __init__(self, key_attribute='filename', unprocessed_rounds=0):
+        self.key_attribute = key_attribute
+        self.unprocessed_rounds = unprocessed_rounds
+        self.tables = {}
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def put_item(self, TableName, Item):  # pylint: disable=invalid-name
+        with self._lock:
+            self.calls.append(('put_item', 1))
+            self.tables.setdefault(TableName, {})[self._key(Item)] = Item
+        return {}
+
+    def batch_write_item(self, RequestItems):  # pylint: disable=invalid-name
+        unprocessed = {}
+        with self._lock:
+            for table_name, requests in RequestItems.items():
+                if len(requests) > BATCH_LIMIT:
+                    raise ClientError({'Error': {'Code': 'ValidationException',
+                                                 'Message': 'Too many items requested for the BatchWriteItem call'}},
+                                      'BatchWriteItem')
+                self.calls.append(('batch_write_item', len(requests)))
+                if self.unprocessed_rounds and requests:
+                    self.unprocessed_rounds -= 1
+                    requests, unprocessed[table_name] = requests[:-1], requests[-1:]
+                table = self.tables.setdefault(table_name, {})
+                for request in requests:
+                    if 'PutRequest' in request:
+                        item = request['PutRequest']['Item']
+                        table[self._key(item)] = item
+                    else:
+                        table.pop(self._key(request['DeleteRequest']['Key']), None)
+        return {'UnprocessedItems': unprocessed}
+
+    def get_item(self, TableName, Key):  # pylint: disable=invalid-name
+        item = self.tables.get(TableName, {}).get(self._key(Key))
+        return {'Item': item} if item is not None else {}
+
+    def scan(self, TableName, Segment=0, TotalSegments=1, Limit=100, ExclusiveStartKey=None):  # pylint: disable=invalid-name
+        with self._lock:
+            self.calls.append(('scan', Segment))
+            keys = sorted(key for key in self.tables.get(TableName, {})
+                          if zlib.crc32(key.encode('utf-8')) % TotalSegments == Segment)
+            if ExclusiveStartKey is not None:
+                start = self._key(ExclusiveStartKey)
+                keys = [key for key in keys if key > start]
+            page = [self.tables[TableName][key] for key in keys[:Limit]]
+        response = {'Items': page, 'Count': len(page)}
+        if len(keys) > Limit:
+            response['LastEvaluatedKey'] = {self.key_attribute: page[-1][self.key_attribute]}
+        return response
+
+    def _key(self, item):
+        return next(iter(item[self.key_attribute].values()))
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.9 on 2026-10-18 04:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0004_gllevel1_gllevel2_gllevel3_remove_inventoryitem_type_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeightReading',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weight', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        # Rows created before the upload worker existed were uploaded synchronously.
+        migrations.AddField(
+            model_name='inventoryitem',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('uploaded', 'Uploaded'), ('failed', 'Failed')], default='uploaded', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='inventoryitem',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('uploaded', 'Uploaded'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='gllevel1',
+            name='name',
+            field=models.CharField(max_length=100, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='gllevel2',
+            name='name',
+            field=models.CharField(max_length=100, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='gllevel3',
+            name='name',
+            field=models.CharField(max_length=100, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='name',
+            field=models.CharField(max_length=100, unique=True),
+        ),
+    ]
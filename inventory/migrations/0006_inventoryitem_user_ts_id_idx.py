@@ -0,0 +1,17 @@
+# Generated by Django 4.2.9 on 2026-10-18 04:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0005_inventoryitem_status'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['user', 'timestamp', 'id'], name='inventory_user_ts_id_idx'),
+        ),
+    ]
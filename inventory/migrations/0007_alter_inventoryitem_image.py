@@ -0,0 +1,20 @@
+# Generated by Django 4.2.9 on 2026-10-18 04:39
+
+import WebApp.storage
+from django.db import migrations, models
+import inventory.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0006_inventoryitem_user_ts_id_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='inventoryitem',
+            name='image',
+            field=models.ImageField(max_length=255, storage=WebApp.storage.inventory_image_storage, upload_to=inventory.models.inventory_image_path),
+        ),
+    ]
@@ -28,6 +28,8 @@ Model `InventoryItem`:
           including the username, type, and timestamp."""
 from django.db import models
 from django.contrib.auth import get_user_model
+from WebApp.storage import inventory_image_storage
+from .storage_backends import image_key
 # Create your models here.
 # from django.contrib.auth.models import User use if I switch from get_user_model()
 
@@ -70,6 +72,11 @@ class Product(models.Model):
 
 
 
+def inventory_image_path(instance, filename):
+    """upload_to for InventoryItem.image: the same `images/user_{id}_...` key the S3 pipeline uses."""
+    return image_key(instance.user_id, filename)
+
+
 # Create your models here.
 class InventoryItem(models.Model):
     """ 
@@ -81,22 +88,41 @@ class InventoryItem(models.Model):
 
     Fields:
     - user: ForeignKey to the user model. Links the inventory item to a user.
-    - image: ImageField storing the path to an image file. Temporary field until AWS is configured.
+    - image: ImageField staged through the 'inventory_images' storage (local disk) until the
+      upload worker puts it to S3 and clears it. Empty for browser-to-S3 uploads.
     - filename: CharField storing the filename in S3. Used for AWS integration.
     - timestamp: DateTimeField capturing the time the inventory item was added.
     - gl_level_1: ForeignKey linking to the first level of General Ledger. Optional.
     - gl_level_2: ForeignKey linking to the second level of General Ledger. Optional.
     - gl_level_3: ForeignKey linking to the third level of General Ledger. Optional.
     - product: ForeignKey linking the inventory item to a specific product. Optional.
+    - status: CharField tracking the background upload to S3 and DynamoDB. Rows start as
+      'pending' and are flipped to 'uploaded' or 'failed' by `inventory.upload_queue`.
     """
+    STATUS_PENDING = 'pending'
+    STATUS_UPLOADED = 'uploaded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_UPLOADED, 'Uploaded'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
     user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, db_index=True) # try User instead of get_user_model if needed.
-    image = models.ImageField(upload_to='inventory_images/') #keep this to test, but get rid of after AWS works.
+    image = models.ImageField(upload_to=inventory_image_path, storage=inventory_image_storage, max_length=255) # written once, to S3 when configured (WebApp/storage.py).
     filename = models.CharField(max_length=255) # to store the image filename in S3.
     timestamp = models.DateTimeField(auto_now_add=True)  # Add timestamp
     gl_level_1 = models.ForeignKey(GLLevel1, on_delete=models.CASCADE, null=True, blank=True)
     gl_level_2 = models.ForeignKey(GLLevel2, on_delete=models.CASCADE, null=True, blank=True)
     gl_level_3 = models.ForeignKey(GLLevel3, on_delete=models.CASCADE, null=True, blank=True)
     product = models.ForeignKey(Product, on_delete=models.CASCADE, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING) # S3/DynamoDB upload state, set by the upload worker.
+
+    class Meta:
+        """ The composite index backs the keyset-paginated upload history (user, then timestamp/id order). """
+        indexes = [
+            models.Index(fields=['user', 'timestamp', 'id'], name='inventory_user_ts_id_idx'),
+        ]
 
     def __str__(self):
         # Adjusted to handle cases where GL levels or product might be null
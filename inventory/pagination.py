@@ -0,0 +1,62 @@
+"""
+Keyset ("seek") pagination helpers for the inventory and invoice upload histories.
+
+Offset pagination gets slower the further a user pages, because the database still walks every
+skipped row. Keyset pagination instead remembers the (timestamp, id) of the last row shown and
+asks for rows strictly after it, which the composite (user, timestamp, id) index on
+InventoryItem answers directly regardless of how many uploads a user has.
+
+Cursors are opaque strings of the form '<epoch microseconds>-<id>'.
+"""
+import datetime
+from django.db.models import Q
+
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def encode_cursor(item, field='timestamp'):
+    """Return the cursor pointing just past `item`."""
+    delta = getattr(item, field) - _EPOCH
+    microseconds = (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+    return f'{microseconds}-{item.pk}'
+
+
+def decode_cursor(cursor):
+    """Return (timestamp, id) for a cursor string, or None if it is missing or malformed."""
+    try:
+        microseconds, pk = cursor.split('-', 1)
+        return _EPOCH + datetime.timedelta(microseconds=int(microseconds)), int(pk)
+    except (AttributeError, ValueError, OverflowError):
+        return None
+
+
+def keyset_page(queryset, cursor=None, descending=True, page_size=25, field='timestamp'):
+    """
+    Return one page of `queryset` ordered by (`field`, id).
+
+    Args:
+        queryset: Queryset of a model with a datetime `field` and an `id` field.
+        cursor (str | None): Cursor from a previous page, or None for the first page.
+        descending (bool): Newest first when True, oldest first when False.
+        page_size (int): Maximum number of rows on the page.
+        field (str): Datetime field to order by, e.g. 'timestamp' or 'uploaded_at'.
+
+    Returns:
+        tuple: (list of rows, cursor for the next page or None if this is the last page).
+    """
+    position = decode_cursor(cursor)
+    if position is not None:
+        timestamp, pk = position
+        if descending:
+            queryset = queryset.filter(Q(**{f'{field}__lt': timestamp}) | Q(**{field: timestamp, 'id__lt': pk}))
+        else:
+            queryset = queryset.filter(Q(**{f'{field}__gt': timestamp}) | Q(**{field: timestamp, 'id__gt': pk}))
+
+    ordering = (f'-{field}', '-id') if descending else (field, 'id')
+    # One extra row tells us whether another page exists without a COUNT query.
+    rows = list(queryset.order_by(*ordering)[:page_size + 1])
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        return rows, encode_cursor(rows[-1], field)
+    return rows, None
@@ -0,0 +1,296 @@
+"""
+Reconciliation of inventory label metadata between the database and DynamoDB.
+
+Every upload is recorded twice: as an `InventoryItem` row and as a DynamoDB label item. The rows
+are written before the S3 upload, and the DynamoDB write can fail or be lost afterwards, so the
+two sides drift apart. `reconcile` compares them in bulk, without a get per row:
+
+1. `InventoryItem` rows with an S3 filename are streamed in id-ordered chunks. Each row is reduced
+   to a 16-byte hash of its key (the filename) and a 16-byte digest of the label it should have.
+2. The table is read with a parallel segmented scan. Each DynamoDB item is matched against that
+   map by its hashed key, as it arrives.
+3. The differences are repaired in batches:
+   - rows missing from DynamoDB, or with a stale label there, are re-written with
+     `BatchMetadataWriter` and marked 'uploaded';
+   - rows whose label matches but whose status is not 'uploaded' are marked 'uploaded';
+   - DynamoDB items without a row are backfilled as `InventoryItem` rows with one bulk_create
+     per chunk, when their user, GL levels and product still exist. The others are orphans,
+     deleted from the table only when `delete_orphans` is set.
+
+Rows younger than `min_age` are matched but left alone, because the upload worker may still be
+handling them; so are rows without GL levels or a product, which have no complete label. Likewise,
+DynamoDB-only items whose label is younger than `min_age`, or whose filename has a row by the time
+their chunk is backfilled (an upload that finished during the scan), are neither backfilled nor
+treated as orphans.
+"""
+import json
+import hashlib
+import logging
+import datetime
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from .models import InventoryItem, GLLevel1, GLLevel2, GLLevel3, Product
+from .upload_queue import ITEM_ATTRIBUTES, build_item_data
+
+
+logger = logging.getLogger(__name__)
+
+KEY_ATTRIBUTE = 'filename'
+
+
+def key_hash(filename):
+    """Compact, fixed-size map key for a label's filename."""
+    return hashlib.blake2b(filename.encode('utf-8'), digest_size=16).digest()
+
+
+def label_digest(item):
+    """Digest of the label attributes the app writes; other attributes on the item are ignored."""
+    label = {name: item.get(name) for name in ITEM_ATTRIBUTES}
+    return hashlib.blake2b(json.dumps(label, sort_keys=True).encode('utf-8'), digest_size=16).digest()
+
+
+@dataclass
+class _Row:
+    """What the diff keeps per InventoryItem row."""
+    id: int
+    digest: bytes
+    uploaded: bool
+    held: bool  # matched, but never repaired: too young, or missing GL levels/product
+    seen: bool = False
+
+
+@dataclass
+class ReconcileReport:
+    """Counts of what `reconcile` found and repaired."""
+    rows: int = 0
+    items: int = 0
+    in_sync: int = 0
+    incomplete_rows: int = 0
+    missing_in_dynamodb: int = 0
+    stale_in_dynamodb: int = 0
+    status_fixed: int = 0
+    rewritten: int = 0
+    backfilled: int = 0
+    backfill_skipped: int = 0
+    orphans: int = 0
+    orphans_deleted: int = 0
+    failed: int = 0
+    orphan_keys: list = field(default_factory=list)
+
+    def as_dict(self):
+        return {name: value for name, value in self.__dict__.items() if name != 'orphan_keys'}
+
+
+def stream_rows(chunk_size=1000):
+    """Yields InventoryItem rows that have an S3 filename, in id order, one query per chunk."""
+    last_id = 0
+    queryset = InventoryItem.objects.exclude(filename='').select_related(
+        'gl_level_1', 'gl_level_2', 'gl_level_3', 'product').order_by('id')
+    while True:
+        chunk = list(queryset.filter(id__gt=last_id)[:chunk_size])
+        if not chunk:
+            return
+        yield from chunk
+        last_id = chunk[-1].id
+
+
+def scan_table(client, table_name, segments=4, page_size=1000):
+    """
+    Reads the whole table with a parallel scan, one thread per segment.
+
+    Yields:
+        list: Pages of DynamoDB items, as each segment returns them.
+    """
+    def scan_segment(segment):
+        pages = []
+        kwargs = {'TableName': table_name, 'Segment': segment, 'TotalSegments': segments, 'Limit': page_size}
+        while True:
+            response = client.scan(**kwargs)
+            pages.append(response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                return pages
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    with ThreadPoolExecutor(max_workers=segments, thread_name_prefix='dynamodb-scan') as pool:
+        for pages in pool.map(scan_segment, range(segments)):
+            yield from pages
+
+
+def reconcile(client, table_name, writer, segments=4, chunk_size=1000, min_age=datetime.timedelta(minutes=15),
+              delete_orphans=False, dry_run=False):
+    """
+    Diffs InventoryItem rows against the DynamoDB label table and repairs the differences.
+
+    Args:
+        client: DynamoDB client used for the scan.
+        table_name (str): Label table.
+        writer (BatchMetadataWriter): Writer for re-written labels and deleted orphans.
+        segments (int): Parallel scan segments.
+        chunk_size (int): Rows per database query and per repair batch.
+        min_age (timedelta): Rows newer than this are compared but never repaired.
+        delete_orphans (bool): Delete DynamoDB items that have no row and cannot be backfilled.
+        dry_run (bool): Only count the differences.
+
+    Returns:
+        ReconcileReport
+    """
+    report = ReconcileReport()
+    cutoff = timezone.now() - min_age
+
+    rows = {}
+    for row in stream_rows(chunk_size):
+        report.rows += 1
+        incomplete = None in (row.gl_level_1, row.gl_level_2, row.gl_level_3, row.product)
+        report.incomplete_rows += incomplete
+        rows[key_hash(row.filename)] = _Row(
+            id=row.id,
+            digest=b'' if incomplete else label_digest(build_item_data(row, row.filename)),
+            uploaded=row.status == InventoryItem.STATUS_UPLOADED,
+            held=incomplete or row.timestamp > cutoff,
+        )
+
+    to_rewrite = []
+    to_mark_uploaded = []
+    unmatched = []
+    for page in scan_table(client, table_name, segments=segments):
+        for item in page:
+            report.items += 1
+            filename = item.get(KEY_ATTRIBUTE, {}).get('S')
+            row = rows.get(key_hash(filename)) if filename else None
+            if row is None:
+                unmatched.append(item)
+                continue
+            row.seen = True
+            if row.held:
+                continue
+            if row.digest != label_digest(item):
+                report.stale_in_dynamodb += 1
+                to_rewrite.append(row.id)
+            elif not row.uploaded:
+                to_mark_uploaded.append(row.id)
+            else:
+                report.in_sync += 1
+
+    missing = [row.id for row in rows.values() if not row.seen and not row.held]
+    report.missing_in_dynamodb = len(missing)
+    to_rewrite.extend(missing)
+    del rows
+
+    if dry_run:
+        report.status_fixed = len(to_mark_uploaded)
+        report.orphans = len(unmatched)
+        return report
+
+    for start in range(0, len(to_mark_uploaded), chunk_size):
+        report.status_fixed += InventoryItem.objects.filter(id__in=to_mark_uploaded[start:start + chunk_size]).update(
+            status=InventoryItem.STATUS_UPLOADED)
+
+    for start in range(0, len(to_rewrite), chunk_size):
+        _rewrite_chunk(to_rewrite[start:start + chunk_size], writer, report)
+
+    for start in range(0, len(unmatched), chunk_size):
+        _backfill_chunk(unmatched[start:start + chunk_size], writer, report, delete_orphans, cutoff)
+
+    return report
+
+
+def _rewrite_chunk(ids, writer, report):
+    """Re-writes the labels of one chunk of rows and marks the written ones 'uploaded'."""
+    written = []
+    chunk = InventoryItem.objects.filter(id__in=ids).select_related(
+        'gl_level_1', 'gl_level_2', 'gl_level_3', 'product')
+    for row in chunk:
+        writer.add(build_item_data(row, row.filename),
+                   callback=lambda ok, row_id=row.id: written.append(row_id) if ok else None)
+    report.failed += len(writer.flush())
+    report.rewritten += len(written)
+    InventoryItem.objects.filter(id__in=written).exclude(status=InventoryItem.STATUS_UPLOADED).update(
+        status=InventoryItem.STATUS_UPLOADED)
+
+
+def _existing_ids(model, ids):
+    return set(model.objects.filter(id__in=ids).values_list('id', flat=True))  # pylint: disable=no-member
+
+
+def _backfill_chunk(items, writer, report, delete_orphans, cutoff):
+    """
+    Creates rows for one chunk of DynamoDB-only items; the rest are orphans.
+
+    Items written after `cutoff`, or whose filename got a row after the rows were streamed, belong
+    to uploads that are still in flight or just finished, so they are skipped.
+    """
+    existing_filenames = set(InventoryItem.objects.filter(
+        filename__in=[item[KEY_ATTRIBUTE]['S'] for item in items if 'S' in item.get(KEY_ATTRIBUTE, {})],
+    ).values_list('filename', flat=True))
+    pending = []
+    for item in items:
+        timestamp = _parse_timestamp(item)
+        if (timestamp is not None and timestamp > cutoff) or \
+                item.get(KEY_ATTRIBUTE, {}).get('S') in existing_filenames:
+            report.backfill_skipped += 1
+        else:
+            pending.append((item, timestamp))
+    items = [item for item, _ in pending]
+
+    def ids(attribute, number_type='S'):
+        return {int(item[attribute][number_type]) for item in items if attribute in item}
+
+    existing = {
+        'user_id': _existing_ids(get_user_model(), ids('user_id', 'N')),
+        'gl_level_1_id': _existing_ids(GLLevel1, ids('gl_level_1_id')),
+        'gl_level_2_id': _existing_ids(GLLevel2, ids('gl_level_2_id')),
+        'gl_level_3_id': _existing_ids(GLLevel3, ids('gl_level_3_id')),
+        'product_id': _existing_ids(Product, ids('product_id')),
+    }
+
+    new_rows = []
+    timestamps = []
+    deletions = 0
+    for item, timestamp in pending:
+        try:
+            values = {
+                attribute: int(item[attribute]['N' if attribute == 'user_id' else 'S'])
+                for attribute in existing
+            }
+        except (KeyError, ValueError):
+            values = None
+        if values is None or any(value not in existing[attribute] for attribute, value in values.items()):
+            report.orphans += 1
+            report.orphan_keys.append(item.get(KEY_ATTRIBUTE))
+            if delete_orphans and KEY_ATTRIBUTE in item:
+                writer.delete({KEY_ATTRIBUTE: item[KEY_ATTRIBUTE]})
+                deletions += 1
+            continue
+        new_rows.append(InventoryItem(filename=item[KEY_ATTRIBUTE]['S'], status=InventoryItem.STATUS_UPLOADED,
+                                      **values))
+        timestamps.append(timestamp)
+
+    if deletions:
+        failed = writer.flush()
+        report.failed += len(failed)
+        report.orphans_deleted += deletions - len(failed)
+
+    if new_rows:
+        with transaction.atomic():
+            created = InventoryItem.objects.bulk_create(new_rows)
+            # auto_now_add stamped the rows with now; keep the original upload time where known.
+            dated = []
+            for row, timestamp in zip(created, timestamps):
+                if timestamp is not None and row.pk is not None:
+                    row.timestamp = timestamp
+                    dated.append(row)
+            if dated:
+                InventoryItem.objects.bulk_update(dated, ['timestamp'])
+        report.backfilled += len(created)
+
+
+def _parse_timestamp(item):
+    """The label's 'timestamp' attribute (UTC, '%Y-%m-%d %H:%M:%S'), or None."""
+    try:
+        naive = datetime.datetime.strptime(item['timestamp']['S'], '%Y-%m-%d %H:%M:%S')
+    except (KeyError, ValueError):
+        return None
+    return naive.replace(tzinfo=datetime.timezone.utc)
@@ -0,0 +1,25 @@
+"""
+Signal wiring for the inventory app.
+
+Connects post_save/post_delete of the GL hierarchy models to `gl_tree.invalidate_gl_tree`,
+so the cached dropdown tree served by `views.get_gl_tree` never outlives a catalog change
+made in this process. Imported from `InventoryConfig.ready()`.
+
+The cache is dropped once the change commits: dropped inside the transaction, a request could
+rebuild it from the old rows before the commit and keep serving them until the cache expires.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from .gl_tree import invalidate_gl_tree
+from .models import GLLevel1, GLLevel2, GLLevel3, Product
+
+
+def invalidate_gl_tree_on_commit(**kwargs):  # pylint: disable=unused-argument
+    """Signal receiver: drop the cached hierarchy after the current transaction commits."""
+    transaction.on_commit(invalidate_gl_tree, using=kwargs.get('using'))
+
+
+for _model in (GLLevel1, GLLevel2, GLLevel3, Product):
+    post_save.connect(invalidate_gl_tree_on_commit, sender=_model, dispatch_uid=f'gl_tree_save_{_model.__name__}')
+    post_delete.connect(invalidate_gl_tree_on_commit, sender=_model,
+                        dispatch_uid=f'gl_tree_delete_{_model.__name__}')
@@ -1,20 +1,55 @@
 /**
  * Script for Dynamic Dropdown Population in Inventory Management System.
- * 
- * Utilizes jQuery to implement cascading dropdown behavior in a web application form. 
- * This script dynamically populates the options of GL Level 2, GL Level 3, and Product dropdowns 
+ *
+ * Utilizes jQuery to implement cascading dropdown behavior in a web application form.
+ * This script dynamically populates the options of GL Level 2, GL Level 3, and Product dropdowns
  * based on the user's selections in preceding dropdowns to ensure a coherent selection flow.
- * 
+ *
  * Features:
- * - Cascading dropdowns: GL Level 2 and GL Level 3 options are updated based on GL Level 1 selection. 
+ * - Cascading dropdowns: GL Level 2 and GL Level 3 options are updated based on GL Level 1 selection.
  *   Product options are updated based on GL Level 3 selection.
- * - AJAX calls: Fetches the relevant options for each dropdown from the server without reloading the page.
+ * - Single payload: The whole GL hierarchy is fetched once from '/get_gl_tree/' and every cascade is
+ *   resolved on the client. The endpoint sends an ETag, so the browser revalidates its cached copy
+ *   with a conditional request (304) instead of downloading the tree again.
  * - User experience: Enhances form usability by ensuring that users can only select from relevant options at each step.
- * 
+ *
+ * Tree format: [[id, name, children], ...] for GL levels, [[id, name], ...] for products.
+ *
  * Dependencies: jQuery library.
  */
 
 $(document).ready(function() {
+    // Children of every GL node keyed by id, filled once the tree arrives.
+    var gl1Children = {};
+    var gl2Children = {};
+    var gl3Products = {};
+    var treeLoaded = $.ajax({url: '/get_gl_tree/', dataType: 'json'}).done(function(data) {
+        $.each(data.tree, function(i, gl1) {
+            gl1Children[gl1[0]] = gl1[2];
+            $.each(gl1[2], function(j, gl2) {
+                gl2Children[gl2[0]] = gl2[2];
+                $.each(gl2[2], function(k, gl3) {
+                    gl3Products[gl3[0]] = gl3[2];
+                });
+            });
+        });
+    }).fail(function() {
+        // Without the tree the dropdowns cannot be filled; tell the user instead of leaving them empty.
+        $('#gl-level-1').closest('form').before($('<div>', {
+            'class': 'alert alert-danger mb-4',
+            text: 'Could not load the GL categories. Please reload the page to try again.'
+        }));
+    });
+
+    // Build <option> markup for a list of [id, name, ...] entries.
+    function buildOptions(placeholder, items) {
+        var select = $('<select>').append($('<option>', {value: '', text: placeholder}));
+        $.each(items || [], function(index, item) {
+            select.append($('<option>', {value: item[0], text: item[1]}));
+        });
+        return select.html();
+    }
+
     // Handle change in GL Level 1 dropdown to update GL Level 2 options.
     $('#gl-level-1').change(function() {
         var gl1_id = $(this).val();
@@ -22,19 +57,8 @@ $(document).ready(function() {
         $('#gl-level-2, #gl-level-3, #product').html('<option value="">-- Select an Option --</option>').prop('disabled', true);
 
         if (gl1_id) {
-            $.ajax({
-                url: '/get_gl_level_2/',
-                data: {'gl1_id': gl1_id},
-                success: function(data) {
-                    console.log(data); // Add this line
-                    // Build options for the GL Level 2 dropdown from the AJAX response.
-                    var options = '<option value="">-- Select GL Level 2 --</option>';
-                    $.each(data, function(index, item) {
-                        options += '<option value="' + item.id + '">' + item.name + '</option>';
-                    });
-                    // Update the GL Level 2 dropdown with the new options.
-                    $('#gl-level-2').html(options).prop('disabled', false);
-                }
+            treeLoaded.done(function() {
+                $('#gl-level-2').html(buildOptions('-- Select GL Level 2 --', gl1Children[gl1_id])).prop('disabled', false);
             });
         }
     });
@@ -46,19 +70,8 @@ $(document).ready(function() {
         $('#gl-level-3, #product').html('<option value="">-- Select an Option --</option>').prop('disabled', true);
 
         if (gl2_id) {
-            $.ajax({
-                url: '/get_gl_level_3/',
-                data: {'gl2_id': gl2_id},
-                success: function(data) {
-                    console.log(data); // Add this line
-                    // Build options for GL Level 3 dropdown.
-                    var options = '<option value="">-- Select GL Level 3 --</option>';
-                    $.each(data, function(index, item) {
-                        options += '<option value="' + item.id + '">' + item.name + '</option>';
-                    });
-                    // Populate GL Level 3 dropdown with relevant options.
-                    $('#gl-level-3').html(options).prop('disabled', false);
-                }
+            treeLoaded.done(function() {
+                $('#gl-level-3').html(buildOptions('-- Select GL Level 3 --', gl2Children[gl2_id])).prop('disabled', false);
             });
         }
     });
@@ -70,23 +83,9 @@ $(document).ready(function() {
         $('#product').html('<option value="">-- Select a Product --</option>').prop('disabled', true);
 
         if (gl3_id) {
-            $.ajax({
-                url: '/get_products/',
-                data: {'gl3_id': gl3_id},
-                success: function(data) {
-                    console.log(data); // Add this line
-                    // Build options for the Product dropdown.
-                    var options = '<option value="">-- Select a Product --</option>';
-                    $.each(data, function(index, item) {
-                        options += '<option value="' + item.id + '">' + item.name + '</option>';
-                    });
-                    // Update Product dropdown with options based on GL Level 3 selection.
-                    $('#product').html(options).prop('disabled', false);
-                }
+            treeLoaded.done(function() {
+                $('#product').html(buildOptions('-- Select a Product --', gl3Products[gl3_id])).prop('disabled', false);
             });
         }
     });
 });
-
-
-
@@ -1,73 +1,112 @@
-""" Add Module Doc String"""
+"""
+AWS storage helpers for inventory images.
+
+- `AWSStorageBackend`: Uploads inventory images to S3 and writes their label metadata to DynamoDB,
+  one item at a time or batched through `metadata_writer()`.
+- `image_key`: The `images/user_{id}_{timestamp}_{uuid}{ext}` key scheme, shared by server-side and
+  direct (presigned) uploads.
+- `derivative_key` / `derivative_url`: Locate the thumbnail/preview/training derivatives that the
+  image_preprocessor Lambda writes to the S3_BUCKET_NAME_DERIVATIVES bucket.
+"""
 from datetime import datetime
 import os
 import uuid
 import logging
-from botocore.config import Config
 from django.conf import settings
-import boto3
+from WebApp.aws_clients import get_client
+from WebApp.direct_uploads import presigned_post, uploaded_object
+from .metadata_writer import BatchMetadataWriter, MetadataWriteError
 
 
 # logger instance
 logger = logging.getLogger(__name__)
 
 
+def image_key(user_id, file_name):
+    """Return a new, unique S3 key for an inventory image uploaded by `user_id`."""
+    # Format the current timestamp
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    # Extract the file extension
+    file_extension = os.path.splitext(file_name)[1]
+    return f"images/user_{user_id}_{timestamp}_{uuid.uuid4()}{file_extension}"
+
+
+def is_user_image_key(key, user_id):
+    """True if `key` follows the image key scheme for `user_id` (and so may be confirmed by them)."""
+    prefix = f"images/user_{user_id}_"
+    return key.startswith(prefix) and '/' not in key[len(prefix):]
+
+
+def derivative_key(filename, name):
+    """Return the S3 key of an image derivative produced by the image_preprocessor Lambda.
+
+    Must match elt/lambda/src/image_preprocessor.derivative_key, e.g.
+    'images/user_1_<ts>_<uuid>.jpeg' -> 'thumb/images/user_1_<ts>_<uuid>.jpg'.
+    """
+    return f"{name}/{os.path.splitext(filename)[0]}.jpg"
+
+
+def derivative_url(filename, name='thumb', expires_in=3600):
+    """Return a presigned GET URL for an image derivative, or None if derivatives are not configured.
+
+    Signing happens locally with the shared S3 client, so this makes no AWS round trip and the
+    page never has to pull the original multi-megabyte photo.
+    """
+    bucket_name = os.environ.get('S3_BUCKET_NAME_DERIVATIVES') # resized image bucket
+    if not bucket_name or not filename:
+        return None
+    return get_client('s3').generate_presigned_url(
+        'get_object',
+        Params={'Bucket': bucket_name, 'Key': derivative_key(filename, name)},
+        ExpiresIn=expires_in,
+    )
+
+
 class AWSStorageBackend:
     """Handles interactions with AWS S3 and DynamoDB for image storage and metadata management."""
     def __init__(self) -> None:
-        """Initialize the S3 and DynamoDB clients using environment variables for credentials""" 
+        """Attach the process-wide S3 and DynamoDB clients and read bucket/table names from the environment"""
         try:
-            self.s3_client = boto3.client(
-                's3',
-                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-                region_name=settings.AWS_REGION,
-                config=Config(signature_version='s3v4')
-                )
-            logger.debug(f"Initialized S3 client with region: {settings.AWS_REGION}")
-            
-            self.dynamodb_client = boto3.client(
-                'dynamodb',
-                region_name=settings.AWS_REGION
-                )
-            logger.debug(f"Initialized DynamoDB client with region: {settings.AWS_REGION}")
+            # Shared, pooled clients; see WebApp/aws_clients.py.
+            self.s3_client = get_client('s3')
+            self.dynamodb_client = get_client('dynamodb')
 
             #set bucket and table names from environment variables
             self.bucket_name = os.environ['S3_BUCKET_NAME'] # user image upload bucket  
             self.table_name = os.environ['DYNAMODB_TABLE_NAME'] # image label bucket
 
-            logger.info("AWS clients for S3 and DynamoDB initialized successfully")
+            logger.debug("AWS clients for S3 and DynamoDB initialized successfully")
         except Exception as e:
             logger.error("Error initializing AWS clients: %s", e)
             raise
 
 
-    def upload_file(self, file, user_id):
-        """Uploads a file to S3 and returns the generated filename"""
-        # Format the current timestamp
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        # Extract the file extension
-        file_extension = os.path.splitext(file.name)[1]
+    def upload_file(self, file, user_id, key=None):
+        """Uploads a file to S3 under `key` (a new image_key() if omitted) and returns the key"""
         # Construct the filename string
-        filename = f"images/user_{user_id}_{timestamp}_{uuid.uuid4()}{file_extension}"
-
-        logger.debug(f"Attempting to upload file {filename} to S3")
+        filename = key or image_key(user_id, file.name)
 
-        print("Attempting to upload file to S3:", filename) # Debug print
-    
+        logger.debug("Uploading %s to S3", filename, extra={'bucket': self.bucket_name})
         try:
             self.s3_client.upload_fileobj(file, self.bucket_name, filename)
-            # Logging successful upload
-            logger.info(f"File {filename} successfully uploaded to S3")
-            print("File successfully uploaded to S3:", filename) # Debug Print
+            logger.info("File %s uploaded to S3", filename)
             return filename
         except Exception as e:
-            logger.error(f"Error occurred during file upload to S3: {e}")
-            print("Error occured during file upload to S3:", e) # Debug print
+            logger.error("Error occurred during file upload to S3: %s", e, extra={'s3_key': filename})
             raise Exception(f'Error uploading file to S3: {e}') from e 
             #will add less generic exception handling eventually. 
     
 
+    def presigned_upload(self, user_id, file_name, content_type):
+        """Returns a presigned POST ({'url', 'fields', 'key'}) for the browser to upload an image itself."""
+        return presigned_post(self.bucket_name, image_key(user_id, file_name), content_type,
+                              settings.INVENTORY_IMAGE_MAX_BYTES)
+
+    def uploaded_image(self, key):
+        """Returns (size, content type) of a directly uploaded image, or None if it is not in S3."""
+        return uploaded_object(self.bucket_name, key)
+
+
     def create_inventory_item(self, item_data):
         """Creates an item in the DynamoDB table with the provided data
         - Calls the put_item method on the DynamoDB client instance -> responsible for
@@ -77,11 +116,15 @@ class AWSStorageBackend:
          Provides the actual data to be inserted into the item. It's a dictionary containing
           the attribute name and values from the new item. 
         """
-        print("Attempting to successfully upload to dynamoDB:", item_data, self.table_name)
+        # Log the key only: the payload is large and includes the user id.
+        filename = item_data.get('filename', {}).get('S')
         try:
             self.dynamodb_client.put_item(TableName=self.table_name, Item=item_data)
-            print("Item_data successfully uploaded to dynamoDB:", item_data, self.table_name)
+            logger.debug("Wrote label %s to %s", filename, self.table_name)
         except Exception as e: 
-            raise Exception(f'Error creating item in DynamopDB: {e}') from e
-            #will add less generic exception handling eventually. 
+            raise MetadataWriteError(f'Error creating item in DynamopDB: {e}', [item_data]) from e
+
+    def metadata_writer(self, **options):
+        """Returns a BatchMetadataWriter for this backend's table (see metadata_writer.py)."""
+        return BatchMetadataWriter(self.dynamodb_client, self.table_name, **options)
 
@@ -1,20 +1,37 @@
 import datetime
 import io
+import json
+import logging
+import sys
 from unittest.mock import patch, MagicMock, ANY
 import os
 import tempfile  # Add this import
+import threading
 import uuid
 from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.contrib.auth.models import User
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.files.uploadedfile import InMemoryUploadedFile
 from django.utils import timezone
 from django.urls import reverse
-from botocore.exceptions import ClientError
-from .forms import InventoryDataCollectionForm
+from botocore.exceptions import ClientError, EndpointConnectionError
+import boto3
+from .forms import InventoryDataCollectionForm, InventoryBatchFormSet
 from .models import InventoryItem, GLLevel1, GLLevel2, GLLevel3, Product
-from .storage_backends import AWSStorageBackend
+from .storage_backends import AWSStorageBackend, derivative_key, derivative_url
+from .upload_queue import process_upload, build_item_data
+from .metadata_writer import BatchMetadataWriter, InMemoryDynamoDB, MetadataWriteError
+from .reconcile import reconcile, scan_table
+from .gl_tree import invalidate_gl_tree
+from WebApp.aws_clients import get_client, reset_clients
+from WebApp.storage import S3Storage, is_s3
+from WebApp.testing import QueryBudgetMixin
+from WebApp.log import JsonFormatter, QueueStreamHandler, SampleFilter, parse_levels
 
 
 # Create your tests here.
@@ -27,6 +44,11 @@ def fake_upload_file(file):
 class AWSStorageBackendTest(TestCase):
     """Test suite for the AWSStorageBackend class."""
 
+    def setUp(self):
+        # Make sure each test builds its clients from the patched boto3.client.
+        reset_clients()
+        self.addCleanup(reset_clients)
+
     @patch('boto3.client')
     def test_upload_file(self, mock_s3_client):
         """Test the upload_file method of AWSStorageBackend.
@@ -90,7 +112,218 @@ class AWSStorageBackendTest(TestCase):
             # Assertions
             mock_dynamodb_client.return_value.put_item.assert_called_with(TableName=storage.table_name, Item=item_data)
 
+class StructuredLoggingTest(TestCase):
+    """Tests for the JSON, sampled, queue-backed logging in WebApp/log.py."""
+    def make_record(self, level=logging.INFO, msg='Uploaded %s', args=('images/a.jpg',), **extra):
+        record = logging.LogRecord('inventory.test', level, __file__, 1, msg, args, None)
+        record.__dict__.update(extra)
+        return record
+
+    def test_json_formatter_keeps_extra_fields(self):
+        entry = json.loads(JsonFormatter().format(self.make_record(item_id=7)))
+
+        self.assertEqual((entry['level'], entry['logger'], entry['message']),
+                         ('INFO', 'inventory.test', 'Uploaded images/a.jpg'))
+        self.assertEqual(entry['item_id'], 7)
+        self.assertNotIn('args', entry)
+
+    def test_sample_filter_only_drops_sampled_levels(self):
+        sample = SampleFilter(rate=0)
+
+        self.assertFalse(sample.filter(self.make_record(logging.DEBUG)))
+        self.assertTrue(sample.filter(self.make_record(logging.INFO)))
+        self.assertTrue(SampleFilter(rate=1).filter(self.make_record(logging.DEBUG)))
+
+    def test_queue_handler_writes_from_listener_thread(self):
+        stream = io.StringIO()
+        handler = QueueStreamHandler(stream)
+        handler.setFormatter(JsonFormatter())
+        self.addCleanup(handler.close)
+        args = ['images/a.jpg']
+
+        handler.handle(self.make_record(args=(args,)))
+        args.append('mutated after logging')
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            record = self.make_record(logging.ERROR, 'Upload failed', ())
+            record.exc_info = sys.exc_info()
+            handler.handle(record)
+        handler.flush()
+
+        first, second = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual(first['message'], "Uploaded ['images/a.jpg']")
+        self.assertIn('ValueError: boom', second['exc_info'])
+
+    def test_flush_keeps_listener_running_across_threads(self):
+        stream = io.StringIO()
+        handler = QueueStreamHandler(stream)
+        handler.setFormatter(JsonFormatter())
+        self.addCleanup(handler.close)
+        listener = handler._listener
+
+        def log_and_flush(index):
+            for _ in range(20):
+                handler.handle(self.make_record(args=(f'images/{index}.jpg',)))
+            handler.flush()
+
+        threads = [threading.Thread(target=log_and_flush, args=(index,)) for index in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertIs(handler._listener, listener)
+        self.assertEqual(len(stream.getvalue().splitlines()), 80)
+
+    def test_parse_levels(self):
+        self.assertEqual(parse_levels('inventory=debug, botocore=INFO,,bad'),
+                         {'inventory': 'DEBUG', 'botocore': 'INFO'})
+
+    @patch('boto3.client')
+    def test_upload_does_not_print(self, _mock_boto3_client):
+        reset_clients()
+        self.addCleanup(reset_clients)
+        with patch.dict(os.environ, {'S3_BUCKET_NAME': 'test-bucket', 'DYNAMODB_TABLE_NAME': 'test-table'}), \
+                patch('sys.stdout', new_callable=io.StringIO) as stdout:
+            storage = AWSStorageBackend()
+            storage.upload_file(SimpleUploadedFile('a.jpg', b'data'), user_id=1)
+            storage.create_inventory_item(label('images/a.jpg'))
+
+        self.assertEqual(stdout.getvalue(), '')
+
+
+class DerivativeUrlTest(TestCase):
+    """Tests for locating image_preprocessor derivatives from the web app."""
+
+    def setUp(self):
+        reset_clients()
+        self.addCleanup(reset_clients)
+
+    def test_derivative_key_matches_lambda_scheme(self):
+        self.assertEqual(derivative_key('images/user_1_20240101120000_abc.jpeg', 'thumb'),
+                         'thumb/images/user_1_20240101120000_abc.jpg')
+
+    @patch('boto3.client')
+    def test_derivative_url_is_presigned_for_thumbnail(self, mock_boto_client):
+        mock_boto_client.return_value.generate_presigned_url.return_value = 'https://signed/thumb.jpg'
+        with patch.dict(os.environ, {'S3_BUCKET_NAME_DERIVATIVES': 'derivative-bucket'}):
+            url = derivative_url('images/user_1_abc.png')
+
+        self.assertEqual(url, 'https://signed/thumb.jpg')
+        mock_boto_client.return_value.generate_presigned_url.assert_called_once_with(
+            'get_object', Params={'Bucket': 'derivative-bucket', 'Key': 'thumb/images/user_1_abc.jpg'}, ExpiresIn=3600)
+
+    def test_derivative_url_without_bucket(self):
+        with patch.dict(os.environ, clear=False):
+            os.environ.pop('S3_BUCKET_NAME_DERIVATIVES', None)
+            self.assertIsNone(derivative_url('images/user_1_abc.png'))
+
+
+class AWSClientRegistryTest(TestCase):
+    """Tests for the process-wide boto3 client registry in WebApp.aws_clients."""
+
+    def setUp(self):
+        reset_clients()
+        self.addCleanup(reset_clients)
+
+    @patch('boto3.client')
+    def test_client_created_once_per_service(self, mock_boto_client):
+        mock_boto_client.side_effect = lambda service_name, **kwargs: MagicMock(name=service_name)
+
+        s3_client = get_client('s3')
+
+        self.assertIs(get_client('s3'), s3_client)
+        self.assertIsNot(get_client('dynamodb'), s3_client)
+        self.assertEqual(mock_boto_client.call_count, 2)
+        config = mock_boto_client.call_args_list[0].kwargs['config']
+        self.assertTrue(config.tcp_keepalive)
+        self.assertEqual(config.signature_version, 's3v4')
+
+    @patch('boto3.client')
+    def test_client_shared_across_threads(self, mock_boto_client):
+        mock_boto_client.side_effect = lambda service_name, **kwargs: MagicMock(name=service_name)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(get_client('s3'))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len({id(client) for client in results}), 1)
+        self.assertEqual(mock_boto_client.call_count, 1)
+
+    @patch('boto3.client')
+    def test_clients_rebuilt_after_fork(self, mock_boto_client):
+        mock_boto_client.side_effect = lambda service_name, **kwargs: MagicMock(name=service_name)
+        parent_client = get_client('s3')
+
+        # Simulate running in a forked child with a different pid.
+        with patch('WebApp.aws_clients.os.getpid', return_value=os.getpid() + 1):
+            child_client = get_client('s3')
+
+        self.assertIsNot(child_client, parent_client)
+
+
+S3_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    'inventory_images': {'BACKEND': 'WebApp.storage.S3Storage', 'OPTIONS': {'bucket_name': 'test-images'}},
+    'invoices': {'BACKEND': 'WebApp.storage.S3Storage', 'OPTIONS': {'bucket_name': 'test-invoices'}},
+}
+
+
+class S3StorageTest(TestCase):
+    """Tests for the S3-backed FileField storage in `WebApp.storage`."""
+    def setUp(self):
+        self.s3_client = MagicMock()
+        self.s3_client.head_object.side_effect = ClientError({'Error': {'Code': '404'}}, 'HeadObject')
+        patcher = patch('WebApp.storage.get_client', return_value=self.s3_client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+
+    def test_save_uploads_once_under_given_key(self):
+        storage = S3Storage(bucket_name='test-images')
+
+        name = storage.save('images/user_1_a.jpg', SimpleUploadedFile('a.jpg', b'jpeg', content_type='image/jpeg'))
+
+        self.assertEqual(name, 'images/user_1_a.jpg')
+        self.s3_client.upload_fileobj.assert_called_once_with(
+            ANY, 'test-images', 'images/user_1_a.jpg', ExtraArgs={'ContentType': 'image/jpeg'})
+        # Keys are unique already; no head_object round trip to check for a collision.
+        self.s3_client.head_object.assert_not_called()
+        self.assertFalse(storage.exists('images/user_1_b.jpg'))
+
+    @override_settings(STORAGES=S3_STORAGES)
+    @patch('inventory.upload_queue.AWSStorageBackend')
+    def test_image_field_writes_to_s3_and_worker_does_not_reupload(self, mock_storage_backend):
+        gl_level_1 = GLLevel1.objects.create(name="Test GL Level 1")
+        gl_level_2 = GLLevel2.objects.create(name="Test GL Level 2", parent=gl_level_1)
+        gl_level_3 = GLLevel3.objects.create(name="Test GL Level 3", parent=gl_level_2)
+        item = InventoryItem.objects.create(
+            user=self.user,
+            gl_level_1=gl_level_1,
+            gl_level_2=gl_level_2,
+            gl_level_3=gl_level_3,
+            product=Product.objects.create(name="Test Product", parent=gl_level_3),
+            image=SimpleUploadedFile('photo.jpg', b'jpeg', content_type='image/jpeg'),
+        )
+
+        self.assertRegex(item.image.name, rf'^images/user_{self.user.id}_\d{{14}}_[0-9a-f-]{{36}}\.jpg$')
+        self.s3_client.upload_fileobj.assert_called_once_with(ANY, 'test-images', item.image.name, ExtraArgs=ANY)
+
+        self.assertTrue(process_upload(item.id))
+
+        mock_storage_backend.return_value.upload_file.assert_not_called()
+        item.refresh_from_db()
+        self.assertEqual(item.filename, item.image.name)
+
+
 class InventoryViewTest(TestCase):
+    # Smallest valid JPEG, so form ImageField validation passes.
+    IMAGE_DATA = b'\xff\xd8\xff\xe0\x00\x10JFIF\x00\x01\x01\x01\x00H\x00H\x00\x00\xff\xdb\x00C\x00\x03\x02\x02\x03\x02\x02\x03\x03\x03\x03\x04\x03\x03\x04\x05\x08\x05\x05\x04\x04\x05\n\x07\x07\x06\x08\x0c\n\x0c\x0c\x0b\n\x0b\x0b\r\x0e\x12\x10\r\x0e\x11\x0e\x0b\x0b\x10\x16\x10\x11\x13\x14\x15\x15\x15\x0c\x0f\x17\x18\x16\x14\x18\x12\x14\x15\x14\xff\xc0\x00\x11\x08\x00\x01\x00\x01\x03\x01"\x00\x02\x11\x01\x03\x11\x01\xff\xc4\x00\x14\x00\x01\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x06\xff\xc4\x00\x14\x01\x01\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x05\xff\xda\x00\x0c\x03\x01\x00\x02\x10\x03\x10\x00\x00\x01\xdf\x00\xff\xd9'
+
     """Tests the inventory_view function with detailed print statements."""
     def setUp(self):
         """
@@ -114,51 +347,41 @@ class InventoryViewTest(TestCase):
         self.product = Product.objects.create(name="Product", parent=self.gl_level_3)
 
         # Dummy image file setup for upload testing
-        self.image_data = b'\xff\xd8\xff\xe0\x00\x10JFIF\x00\x01\x01\x01\x00H\x00H\x00\x00\xff\xdb\x00C\x00\x03\x02\x02\x03\x02\x02\x03\x03\x03\x03\x04\x03\x03\x04\x05\x08\x05\x05\x04\x04\x05\n\x07\x07\x06\x08\x0c\n\x0c\x0c\x0b\n\x0b\x0b\r\x0e\x12\x10\r\x0e\x11\x0e\x0b\x0b\x10\x16\x10\x11\x13\x14\x15\x15\x15\x0c\x0f\x17\x18\x16\x14\x18\x12\x14\x15\x14\xff\xc0\x00\x11\x08\x00\x01\x00\x01\x03\x01"\x00\x02\x11\x01\x03\x11\x01\xff\xc4\x00\x14\x00\x01\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x06\xff\xc4\x00\x14\x01\x01\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x05\xff\xda\x00\x0c\x03\x01\x00\x02\x10\x03\x10\x00\x00\x01\xdf\x00\xff\xd9'
+        self.image_data = self.IMAGE_DATA
         self.image_file = SimpleUploadedFile(name='test_image.jpg', content=self.image_data, content_type='image/jpeg')
         print('Test environment setup complete.')
 
-    @patch('inventory.views.AWSStorageBackend')
-    def test_inventory_view_post_request(self, mock_storage_backend):
+    @patch('inventory.views.enqueue_upload')
+    def test_inventory_view_post_request(self, mock_enqueue_upload):
             """
             Tests the POST request handling of the inventory_view function. This method simulates a form submission
-            with valid data and checks the interaction with the AWSStorageBackend for file upload and metadata storage.
+            with valid data and checks that the item is saved as pending and handed to the upload worker.
 
-            The method uses patching to mock the AWSStorageBackend, avoiding real AWS interactions during the test.
+            The method patches `enqueue_upload`, avoiding real AWS interactions during the test.
             It asserts the correct behavior of the inventory_view function when receiving a POST request, including:
             - Form validation and submission.
-            - Interaction with AWSStorageBackend for file uploads.
+            - A pending InventoryItem row being created for the user.
+            - The upload worker being scheduled for that row.
             - Correct response status code.
             """
             print('Testing inventory_view POST request functionality.')
-            # Mock setup for AWS interactions
-            mock_storage_backend.return_value.upload_file.return_value = 'uploaded/test_image.jpg'
-            mock_storage_backend.return_value.create_inventory_item.return_value = None
-
-            # Prepare form submission
+            # Prepare form submission, including the image file
             post_data = {
                 'gl_level_1': str(self.gl_level_1.id),
                 'gl_level_2': str(self.gl_level_2.id),
                 'gl_level_3': str(self.gl_level_3.id),
-                'product': str(self.product.id)
+                'product': str(self.product.id),
+                'image': self.image_file,
             }
-    
-            # Prepare files separately
-            files = {'image': self.image_file}
 
-            response = self.client.post('/inventory/', data=post_data, files=files)
+            response = self.client.post('/inventory/', data=post_data)
             print(f'POST request to inventory_view made with status code {response.status_code}.')
 
-            # Add this to print form errors if the form is invalid
-            if response.context and 'form' in response.context:
-                form = response.context['form']
-                if not form.is_valid():
-                    print("Form errors", form.errors.as_text())
-
             # Assertions
-            mock_storage_backend.assert_called_once()
-            print('AWSStorageBackend mocked methods called as expected.')
-            self.assertEqual(response.status_code, 200)
+            item = InventoryItem.objects.get(user=self.user)
+            self.assertEqual(item.status, InventoryItem.STATUS_PENDING)
+            mock_enqueue_upload.assert_called_once_with(item.id)
+            self.assertEqual(response.status_code, 302)
             print('inventory_view POST request test completed successfully.')
 
     def test_inventory_view_GET(self):
@@ -464,8 +687,298 @@ class InventoryDataCollectionFormTest(TestCase):
 
 
 
+@patch.dict(os.environ, {'S3_BUCKET_NAME': 'test-images', 'DYNAMODB_TABLE_NAME': 'test-labels'})
+class DirectUploadApiTest(TestCase):
+    """Tests for the presign/confirm endpoints that let the browser upload photos straight to S3."""
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+        self.gl_level_1 = GLLevel1.objects.create(name="Test GL Level 1")
+        self.gl_level_2 = GLLevel2.objects.create(name="Test GL Level 2", parent=self.gl_level_1)
+        self.gl_level_3 = GLLevel3.objects.create(name="Test GL Level 3", parent=self.gl_level_2)
+        self.product = Product.objects.create(name="Test Product", parent=self.gl_level_3)
+        # A real client signs locally, so the presigned policy can be checked without AWS.
+        self.s3_client = boto3.client('s3', region_name='us-east-1',
+                                      aws_access_key_id='testing', aws_secret_access_key='testing')
+        self.s3_client.head_object = MagicMock(return_value={'ContentLength': 1024, 'ContentType': 'image/jpeg'})
+        patcher = patch('WebApp.direct_uploads.get_client', return_value=self.s3_client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def confirm(self, key):
+        return self.client.post(reverse('inventory_upload_confirm'), {
+            'key': key,
+            'gl_level_1': self.gl_level_1.id,
+            'gl_level_2': self.gl_level_2.id,
+            'gl_level_3': self.gl_level_3.id,
+            'product': self.product.id,
+        })
+
+    @patch('inventory.storage_backends.get_client', return_value=MagicMock())
+    def test_presign_returns_post_scoped_to_user_key(self, _mock_get_client):
+        response = self.client.post(reverse('inventory_upload_presign'),
+                                    {'file_name': 'shrimp.jpg', 'content_type': 'image/jpeg'},
+                                    content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        upload = response.json()
+        self.assertRegex(upload['key'], rf'^images/user_{self.user.id}_\d{{14}}_[0-9a-f-]{{36}}\.jpg$')
+        self.assertEqual(upload['fields']['key'], upload['key'])
+        self.assertEqual(upload['fields']['Content-Type'], 'image/jpeg')
+        self.assertIn('policy', upload['fields'])
+
+    def test_presign_rejects_other_content_types(self):
+        response = self.client.post(reverse('inventory_upload_presign'),
+                                    {'file_name': 'notes.txt', 'content_type': 'text/plain'})
+
+        self.assertEqual(response.status_code, 400)
+
+    @patch('inventory.views.enqueue_upload')
+    @patch('inventory.storage_backends.get_client', return_value=MagicMock())
+    def test_confirm_records_pending_item(self, _mock_get_client, mock_enqueue_upload):
+        key = f'images/user_{self.user.id}_20240101000000_abc.jpg'
+
+        response = self.confirm(key)
+
+        self.assertEqual(response.status_code, 201)
+        item = InventoryItem.objects.get(pk=response.json()['id'])
+        self.assertEqual(item.filename, key)
+        self.assertEqual(item.status, InventoryItem.STATUS_PENDING)
+        self.assertFalse(item.image)
+        mock_enqueue_upload.assert_called_once_with(item.id)
+        # A retried confirm returns the same row.
+        self.assertEqual(self.confirm(key).json()['id'], item.id)
+        self.assertEqual(InventoryItem.objects.count(), 1)
+
+    @patch('inventory.views.enqueue_upload')
+    def test_confirm_rejects_other_users_keys(self, mock_enqueue_upload):
+        response = self.confirm(f'images/user_{self.user.id + 1}_20240101000000_abc.jpg')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('key', response.json()['errors'])
+        mock_enqueue_upload.assert_not_called()
+
+    @patch('inventory.views.enqueue_upload')
+    @patch('inventory.storage_backends.get_client', return_value=MagicMock())
+    def test_confirm_requires_uploaded_object(self, _mock_get_client, mock_enqueue_upload):
+        self.s3_client.head_object.side_effect = ClientError({'Error': {'Code': '404'}}, 'HeadObject')
+
+        response = self.confirm(f'images/user_{self.user.id}_20240101000000_abc.jpg')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(InventoryItem.objects.exists())
+        mock_enqueue_upload.assert_not_called()
+
+
+@override_settings(MEDIA_ROOT='/tmp/django_test')
+class InventoryBatchViewTest(TestCase):
+    """Tests for batch submission of many images in one request."""
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+        self.gl_level_1 = GLLevel1.objects.create(name="Test GL Level 1")
+        self.gl_level_2 = GLLevel2.objects.create(name="Test GL Level 2", parent=self.gl_level_1)
+        self.gl_level_3 = GLLevel3.objects.create(name="Test GL Level 3", parent=self.gl_level_2)
+        self.product = Product.objects.create(name="Test Product", parent=self.gl_level_3)
+        other_gl_level_3 = GLLevel3.objects.create(name="Other GL Level 3", parent=self.gl_level_2)
+        self.other_product = Product.objects.create(name="Other Product", parent=other_gl_level_3)
+
+    def image(self, index):
+        return SimpleUploadedFile(f'photo_{index}.jpg', InventoryViewTest.IMAGE_DATA, content_type='image/jpeg')
+
+    def post_batch(self, count, blank_rows=0, product=None):
+        data = {'form-TOTAL_FORMS': str(count + blank_rows), 'form-INITIAL_FORMS': '0'}
+        for index in range(count):
+            data.update({
+                f'form-{index}-image': self.image(index),
+                f'form-{index}-gl_level_1': str(self.gl_level_1.id),
+                f'form-{index}-gl_level_2': str(self.gl_level_2.id),
+                f'form-{index}-gl_level_3': str(self.gl_level_3.id),
+                f'form-{index}-product': str((product or self.product).id),
+            })
+        for index in range(count, count + blank_rows):
+            data[f'form-{index}-gl_level_1'] = ''
+        return self.client.post(reverse('inventory_batch'), data)
+
+    @patch('inventory.views.enqueue_upload')
+    def test_batch_creates_all_items(self, mock_enqueue_upload):
+        response = self.post_batch(3, blank_rows=2)
+
+        self.assertRedirects(response, reverse('inventory_app'), fetch_redirect_response=False)
+        items = InventoryItem.objects.filter(user=self.user).order_by('id')
+        self.assertEqual(items.count(), 3)
+        self.assertTrue(all(item.status == InventoryItem.STATUS_PENDING and item.image for item in items))
+        self.assertEqual(sorted(call.args[0] for call in mock_enqueue_upload.call_args_list),
+                         [item.id for item in items])
+
+    @patch('inventory.views.enqueue_upload')
+    def test_validation_queries_do_not_grow_with_batch_size(self, _mock_enqueue_upload):
+        with CaptureQueriesContext(connection) as two_items:
+            self.post_batch(2)
+        with CaptureQueriesContext(connection) as eight_items:
+            self.post_batch(8)
+
+        self.assertEqual(len(two_items), len(eight_items))
+        self.assertEqual(InventoryItem.objects.count(), 10)
+
+    @patch('inventory.views.enqueue_upload')
+    def test_product_outside_selected_level_rejects_whole_batch(self, mock_enqueue_upload):
+        response = self.post_batch(2, product=self.other_product)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['formset'].forms[0].errors['product'])
+        self.assertFalse(InventoryItem.objects.exists())
+        mock_enqueue_upload.assert_not_called()
+
+    @patch('inventory.views.enqueue_upload')
+    def test_incomplete_row_rejects_whole_batch(self, mock_enqueue_upload):
+        data = {'form-TOTAL_FORMS': '1', 'form-INITIAL_FORMS': '0', 'form-0-image': self.image(0),
+                'form-0-gl_level_1': str(self.gl_level_1.id), 'form-0-gl_level_2': str(self.gl_level_2.id)}
+
+        response = self.client.post(reverse('inventory_batch'), data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['formset'].forms[0].errors['product'])
+        self.assertFalse(InventoryItem.objects.exists())
+        mock_enqueue_upload.assert_not_called()
+
+    def test_failed_image_store_deletes_the_stored_ones(self):
+        data = {'form-TOTAL_FORMS': '3', 'form-INITIAL_FORMS': '0'}
+        for index in range(3):
+            data.update({f'form-{index}-image': self.image(index), f'form-{index}-gl_level_1': str(self.gl_level_1.id),
+                         f'form-{index}-gl_level_2': str(self.gl_level_2.id),
+                         f'form-{index}-gl_level_3': str(self.gl_level_3.id),
+                         f'form-{index}-product': str(self.product.id)})
+        formset = InventoryBatchFormSet(data, data)
+        self.assertTrue(formset.is_valid())
+        stored = []
+        lock = threading.Lock()
+
+        def save(storage, name, content, max_length=None):
+            if 'photo_1' in content.name:
+                raise OSError('disk full')
+            with lock:
+                stored.append(name)
+            return name
+
+        with patch('django.core.files.storage.FileSystemStorage.save', save), \
+                patch('django.core.files.storage.FileSystemStorage.delete') as mock_delete:
+            with self.assertRaises(OSError):
+                formset.save(self.user)
+
+        self.assertEqual(sorted(call.args[0] for call in mock_delete.call_args_list), sorted(stored))
+        self.assertEqual(len(stored), 2)
+        self.assertFalse(InventoryItem.objects.exists())
+
+    def test_get_renders_requested_rows(self):
+        response = self.client.get(reverse('inventory_batch'), {'rows': 4})
+
+        self.assertEqual(response.context['formset'].total_form_count(), 4)
+
+
+def label(filename):
+    """A minimal DynamoDB label record for metadata writer tests."""
+    return {'filename': {'S': filename}, 'product_name': {'S': 'Shrimp'}}
+
+
+class BatchMetadataWriterTest(TestCase):
+    """Tests for batched DynamoDB writes, against the in-memory DynamoDB stand-in."""
+    def setUp(self):
+        self.dynamodb = InMemoryDynamoDB()
+        self.sleeps = []
+
+    def writer(self, **options):
+        options.setdefault('flush_interval', 0)
+        return BatchMetadataWriter(self.dynamodb, 'labels', sleep=self.sleeps.append, **options)
+
+    def test_flushes_in_batches_of_25(self):
+        with self.writer(flush_size=100) as writer:
+            for index in range(60):
+                writer.add(label(f'images/{index}.jpg'))
+            self.assertEqual(self.dynamodb.calls, [])
+
+        self.assertEqual(self.dynamodb.calls, [('batch_write_item', 25), ('batch_write_item', 25),
+                                               ('batch_write_item', 10)])
+        self.assertEqual(len(self.dynamodb.tables['labels']), 60)
+
+    def test_flush_on_size(self):
+        writer = self.writer(flush_size=3)
+        for index in range(4):
+            writer.add(label(f'images/{index}.jpg'))
+
+        self.assertEqual(self.dynamodb.calls, [('batch_write_item', 3)])
+        self.assertEqual(writer.pending(), 1)
+
+    def test_unprocessed_items_are_retried_with_jittered_backoff(self):
+        self.dynamodb.unprocessed_rounds = 2
+        results = []
+        writer = self.writer()
+        for index in range(3):
+            writer.add(label(f'images/{index}.jpg'), callback=results.append)
+
+        self.assertEqual(writer.flush(), [])
+        self.assertEqual(results, [True, True, True])
+        self.assertEqual([size for _, size in self.dynamodb.calls], [3, 1, 1])
+        self.assertEqual(len(self.sleeps), 2)
+        self.assertTrue(0 <= self.sleeps[1] <= 0.05 * 4)
+
+    def test_items_are_given_up_after_max_attempts(self):
+        self.dynamodb.unprocessed_rounds = 10
+        results = []
+        writer = self.writer(max_attempts=3)
+        writer.add(label('images/a.jpg'), callback=results.append)
+
+        self.assertEqual(writer.flush(), [label('images/a.jpg')])
+        self.assertEqual(results, [False])
+        self.assertEqual(len(self.dynamodb.calls), 3)
+
+    def test_throttled_batches_are_retried(self):
+        client = MagicMock()
+        client.batch_write_item.side_effect = [
+            ClientError({'Error': {'Code': 'ProvisionedThroughputExceededException'}}, 'BatchWriteItem'),
+            {'UnprocessedItems': {}},
+        ]
+        writer = BatchMetadataWriter(client, 'labels', flush_interval=0, sleep=self.sleeps.append)
+        writer.add(label('images/a.jpg'))
+
+        self.assertEqual(writer.flush(), [])
+        self.assertEqual(client.batch_write_item.call_count, 2)
+
+    def test_connection_errors_are_retried_then_reported(self):
+        client = MagicMock()
+        client.batch_write_item.side_effect = EndpointConnectionError(endpoint_url='https://dynamodb')
+        results = []
+        writer = BatchMetadataWriter(client, 'labels', flush_interval=0, max_attempts=3, sleep=self.sleeps.append)
+        writer.add(label('images/a.jpg'), callback=results.append)
+
+        self.assertEqual(writer.flush(), [label('images/a.jpg')])
+        self.assertEqual(results, [False])
+        self.assertEqual(client.batch_write_item.call_count, 3)
+        self.assertEqual(len(self.sleeps), 2)
+
+    def test_unexpected_errors_still_run_callbacks(self):
+        client = MagicMock()
+        client.batch_write_item.side_effect = RuntimeError('bug')
+        results = []
+        writer = BatchMetadataWriter(client, 'labels', flush_interval=0, sleep=self.sleeps.append)
+        writer.add(label('images/a.jpg'), callback=results.append)
+
+        self.assertEqual(writer.flush(), [label('images/a.jpg')])
+        self.assertEqual(results, [False])
+
+    def test_flush_on_interval(self):
+        flushed = threading.Event()
+        writer = self.writer(flush_interval=0.05, on_timer_flush_done=flushed.set)
+        writer.add(label('images/a.jpg'))
+
+        self.assertTrue(flushed.wait(5))
+        self.assertEqual(writer.pending(), 0)
+        self.assertIn('images/a.jpg', self.dynamodb.tables['labels'])
+
+
 @override_settings(MEDIA_ROOT='/tmp/django_test')
 class FileUploadTests(TestCase):
+    """Tests for the background upload worker in `inventory.upload_queue`."""
     def setUp(self):
         # Create a test user
         self.user = User.objects.create_user(username='testuser', password='testpassword')
@@ -473,33 +986,532 @@ class FileUploadTests(TestCase):
         self.gl_level_2 = GLLevel2.objects.create(name="Test GL Level 2", parent=self.gl_level_1)
         self.gl_level_3 = GLLevel3.objects.create(name="Test GL Level 3", parent=self.gl_level_2)
         self.product = Product.objects.create(name="Test Product", parent=self.gl_level_3)
+        self.item = InventoryItem.objects.create(
+            user=self.user,
+            gl_level_1=self.gl_level_1,
+            gl_level_2=self.gl_level_2,
+            gl_level_3=self.gl_level_3,
+            product=self.product,
+            image=SimpleUploadedFile('test_file.jpg', b'file content', content_type='image/jpeg'),
+        )
+
+    @patch('inventory.upload_queue.AWSStorageBackend')
+    def test_upload_marks_item_uploaded(self, mock_storage_backend):
+        mock_storage_backend.return_value.upload_file.return_value = 'images/user_1_test.jpg'
+
+        self.assertTrue(process_upload(self.item.id))
+
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.status, InventoryItem.STATUS_UPLOADED)
+        self.assertEqual(self.item.filename, 'images/user_1_test.jpg')
+        item_data = mock_storage_backend.return_value.create_inventory_item.call_args[0][0]
+        self.assertEqual(item_data['filename'], {'S': 'images/user_1_test.jpg'})
+        self.assertEqual(item_data['product_name'], {'S': self.product.name})
+
+    @patch('inventory.upload_queue.AWSStorageBackend')
+    def test_worker_uploads_staged_image_under_its_key(self, mock_storage_backend):
+        mock_storage_backend.return_value.upload_file.side_effect = lambda file, user_id, key: key
+        staged_name = self.item.image.name
+        storage = self.item.image.storage
+        # The request only staged the photo locally; S3 is the worker's job.
+        self.assertFalse(is_s3(storage))
+        self.assertTrue(storage.exists(staged_name))
+
+        self.assertTrue(process_upload(self.item.id))
+
+        self.assertEqual(mock_storage_backend.return_value.upload_file.call_args.kwargs['key'], staged_name)
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.filename, self.item.image.name), (staged_name, ''))
+        self.assertFalse(storage.exists(staged_name))
+
+    @patch('inventory.upload_queue.AWSStorageBackend')
+    def test_failed_label_write_keeps_s3_key(self, mock_storage_backend):
+        mock_storage_backend.return_value.upload_file.side_effect = lambda file, user_id, key: key
+        mock_storage_backend.return_value.create_inventory_item.side_effect = MetadataWriteError('put_item failed')
+        staged_name = self.item.image.name
 
-    @patch('inventory.views.AWSStorageBackend.upload_file', side_effect=ClientError({}, "operation_name"))
-    def test_upload_file_error(self, mock_upload):
-        # Log in the test user
+        self.assertFalse(process_upload(self.item.id))
+
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.status, InventoryItem.STATUS_FAILED)
+        # The photo is in S3 and the local copy is gone; the row must still point at the object.
+        self.assertEqual((self.item.filename, self.item.image.name), (staged_name, ''))
+
+    @patch('inventory.upload_queue.AWSStorageBackend')
+    def test_upload_file_error(self, mock_storage_backend):
+        mock_storage_backend.return_value.upload_file.side_effect = ClientError({}, "operation_name")
+
+        self.assertFalse(process_upload(self.item.id))
+
+        # The row stays visible in the upload history, flagged as failed.
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.status, InventoryItem.STATUS_FAILED)
+        mock_storage_backend.return_value.create_inventory_item.assert_not_called()
+
+    @patch('inventory.upload_queue.AWSStorageBackend')
+    def test_direct_upload_only_writes_metadata(self, mock_storage_backend):
+        item = InventoryItem.objects.create(user=self.user, product=self.product, gl_level_1=self.gl_level_1,
+                                            gl_level_2=self.gl_level_2, gl_level_3=self.gl_level_3,
+                                            filename='images/user_1_direct.jpg')
+
+        self.assertTrue(process_upload(item.id))
+
+        mock_storage_backend.return_value.upload_file.assert_not_called()
+        item_data = mock_storage_backend.return_value.create_inventory_item.call_args[0][0]
+        self.assertEqual(item_data['filename'], {'S': 'images/user_1_direct.jpg'})
+
+    @patch('inventory.upload_queue.AWSStorageBackend')
+    def test_batched_metadata_sets_status_on_flush(self, mock_storage_backend):
+        mock_storage_backend.return_value.upload_file.return_value = 'images/user_1_test.jpg'
+        dynamodb = InMemoryDynamoDB()
+        writer = BatchMetadataWriter(dynamodb, 'labels', flush_interval=0)
+
+        self.assertTrue(process_upload(self.item.id, writer=writer))
+
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.status, InventoryItem.STATUS_PENDING)
+        self.assertEqual(self.item.filename, 'images/user_1_test.jpg')
+        mock_storage_backend.return_value.create_inventory_item.assert_not_called()
+
+        writer.flush()
+
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.status, InventoryItem.STATUS_UPLOADED)
+        self.assertEqual(dynamodb.tables['labels']['images/user_1_test.jpg']['product_name'], {'S': self.product.name})
+
+    @patch('inventory.storage_backends.AWSStorageBackend.__init__', return_value=None)
+    def test_backfill_command_writes_uploaded_items_in_batches(self, _mock_storage_init):
+        InventoryItem.objects.filter(pk=self.item.pk).update(status=InventoryItem.STATUS_UPLOADED,
+                                                             filename='images/user_1_test.jpg')
+        dynamodb = InMemoryDynamoDB()
+
+        def metadata_writer(_backend, **options):
+            return BatchMetadataWriter(dynamodb, 'labels', **options)
+
+        with patch('inventory.storage_backends.AWSStorageBackend.metadata_writer', metadata_writer):
+            call_command('backfill_inventory_metadata', stdout=io.StringIO())
+
+        self.assertEqual(dynamodb.calls, [('batch_write_item', 1)])
+        self.assertIn('images/user_1_test.jpg', dynamodb.tables['labels'])
+
+    @patch('inventory.storage_backends.AWSStorageBackend.__init__', return_value=None)
+    @patch('inventory.upload_queue.AWSStorageBackend')
+    def test_requeue_command_retries_only_stale_pending_items(self, mock_storage_backend, _mock_storage_init):
+        mock_storage_backend.return_value.upload_file.side_effect = lambda file, user_id, key: key
+        stale = self.item
+        InventoryItem.objects.filter(pk=stale.pk).update(timestamp=timezone.now() - datetime.timedelta(hours=1))
+        recent = InventoryItem.objects.create(user=self.user, gl_level_1=self.gl_level_1, gl_level_2=self.gl_level_2,
+                                              gl_level_3=self.gl_level_3, product=self.product,
+                                              filename='images/user_1_recent.jpg')
+        dynamodb = InMemoryDynamoDB()
+
+        def metadata_writer(_backend, **options):
+            return BatchMetadataWriter(dynamodb, 'labels', **options)
+
+        with patch('inventory.storage_backends.AWSStorageBackend.metadata_writer', metadata_writer):
+            call_command('requeue_pending_uploads', stdout=io.StringIO())
+
+        stale.refresh_from_db()
+        recent.refresh_from_db()
+        self.assertEqual(stale.status, InventoryItem.STATUS_UPLOADED)
+        self.assertIn(stale.filename, dynamodb.tables['labels'])
+        self.assertEqual(recent.status, InventoryItem.STATUS_PENDING)
+
+    def test_upload_history_shows_status(self):
+        InventoryItem.objects.filter(pk=self.item.pk).update(status=InventoryItem.STATUS_FAILED)
         self.client.login(username='testuser', password='testpassword')
 
-        # Prepare a dummy file (consider using an actual small image file here)
-        with open('/Users/claytonthompson/Desktop/Source/WebApp/inventory_images/FishBinHotelPans.jpeg', 'rb') as img:
-            dummy_file = SimpleUploadedFile('test_file.jpg', img.read(), content_type='image/jpeg')
+        response = self.client.get(reverse('inventory_app'))
 
-        # Prepare POST data including the required fields
-        post_data = {
-            'image': dummy_file,
-            'gl_level_1': self.gl_level_1.id,
-            'gl_level_2': self.gl_level_2.id,
-            'gl_level_3': self.gl_level_3.id,
-            'product': self.product.id,
-        }
+        self.assertContains(response, 'upload-status-failed')
+
+
+class ReconcileTest(TestCase):
+    """Tests for the database/DynamoDB reconciliation, against the in-memory DynamoDB stand-in."""
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.gl_level_1 = GLLevel1.objects.create(name="Seafood")
+        self.gl_level_2 = GLLevel2.objects.create(name="Shellfish", parent=self.gl_level_1)
+        self.gl_level_3 = GLLevel3.objects.create(name="Shrimp", parent=self.gl_level_2)
+        self.product = Product.objects.create(name="Shrimp 16/20", parent=self.gl_level_3)
+        self.dynamodb = InMemoryDynamoDB()
+
+    def create_item(self, filename, status=InventoryItem.STATUS_UPLOADED):
+        return InventoryItem.objects.create(user=self.user, gl_level_1=self.gl_level_1, gl_level_2=self.gl_level_2,
+                                            gl_level_3=self.gl_level_3, product=self.product, filename=filename,
+                                            status=status)
+
+    def put_label(self, item):
+        self.dynamodb.put_item(TableName='labels', Item=build_item_data(item, item.filename))
+
+    def reconcile(self, **options):
+        options.setdefault('min_age', datetime.timedelta(0))
+        options.setdefault('segments', 3)
+        with BatchMetadataWriter(self.dynamodb, 'labels', flush_interval=0) as writer:
+            return reconcile(self.dynamodb, 'labels', writer, **options)
+
+    def test_in_sync_rows_are_left_alone(self):
+        self.put_label(self.create_item('images/user_1_a.jpg'))
+
+        report = self.reconcile()
+
+        self.assertEqual((report.rows, report.items, report.in_sync), (1, 1, 1))
+        self.assertEqual([call for call in self.dynamodb.calls if call[0] == 'batch_write_item'], [])
+
+    def test_missing_and_stale_labels_are_rewritten(self):
+        missing = self.create_item('images/user_1_missing.jpg', status=InventoryItem.STATUS_FAILED)
+        stale = self.create_item('images/user_1_stale.jpg')
+        self.put_label(stale)
+        self.dynamodb.tables['labels'][stale.filename]['product_name'] = {'S': 'Old name'}
+
+        report = self.reconcile()
+
+        self.assertEqual((report.missing_in_dynamodb, report.stale_in_dynamodb, report.rewritten), (1, 1, 2))
+        self.assertEqual(self.dynamodb.tables['labels'][stale.filename]['product_name'], {'S': self.product.name})
+        self.assertIn(missing.filename, self.dynamodb.tables['labels'])
+        missing.refresh_from_db()
+        self.assertEqual(missing.status, InventoryItem.STATUS_UPLOADED)
+
+    def test_status_is_fixed_when_label_matches(self):
+        item = self.create_item('images/user_1_a.jpg', status=InventoryItem.STATUS_FAILED)
+        self.put_label(item)
+
+        report = self.reconcile()
+
+        self.assertEqual(report.status_fixed, 1)
+        item.refresh_from_db()
+        self.assertEqual(item.status, InventoryItem.STATUS_UPLOADED)
+
+    def test_recent_and_incomplete_rows_are_not_repaired(self):
+        self.create_item('images/user_1_new.jpg', status=InventoryItem.STATUS_PENDING)
+        incomplete = InventoryItem.objects.create(user=self.user, filename='images/user_1_incomplete.jpg')
+        self.put_label(self.create_item('images/user_1_copy.jpg'))
+        self.dynamodb.tables['labels'][incomplete.filename] = dict(
+            self.dynamodb.tables['labels']['images/user_1_copy.jpg'], filename={'S': incomplete.filename})
+
+        report = self.reconcile(min_age=datetime.timedelta(minutes=15))
+
+        self.assertEqual((report.missing_in_dynamodb, report.backfilled, report.orphans), (0, 0, 0))
+        self.assertNotIn('images/user_1_new.jpg', self.dynamodb.tables['labels'])
+        self.assertEqual(InventoryItem.objects.count(), 3)
+
+    def test_dynamodb_only_items_are_backfilled(self):
+        item = self.create_item('images/user_1_a.jpg')
+        self.put_label(item)
+        label_data = self.dynamodb.tables['labels'][item.filename]
+        label_data['timestamp'] = {'S': '2024-01-02 03:04:05'}
+        item.delete()
+
+        report = self.reconcile()
+
+        self.assertEqual(report.backfilled, 1)
+        restored = InventoryItem.objects.get(filename='images/user_1_a.jpg')
+        self.assertEqual((restored.user, restored.product, restored.status),
+                         (self.user, self.product, InventoryItem.STATUS_UPLOADED))
+        self.assertEqual(restored.timestamp, datetime.datetime(2024, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc))
+
+    def test_items_uploaded_during_the_scan_are_not_backfilled(self):
+        item = self.create_item('images/user_1_a.jpg')
+        self.put_label(item)
+        item.delete()
+
+        def scan_while_upload_finishes(*args, **kwargs):
+            # The row is streamed before the scan, so it only shows up when its chunk is backfilled.
+            self.create_item('images/user_1_a.jpg')
+            yield from scan_table(*args, **kwargs)
+
+        with patch('inventory.reconcile.scan_table', side_effect=scan_while_upload_finishes):
+            report = self.reconcile(delete_orphans=True)
+
+        self.assertEqual((report.backfilled, report.backfill_skipped, report.orphans), (0, 1, 0))
+        self.assertEqual(InventoryItem.objects.filter(filename='images/user_1_a.jpg').count(), 1)
+        self.assertIn('images/user_1_a.jpg', self.dynamodb.tables['labels'])
+
+    def test_recent_dynamodb_only_items_are_not_backfilled(self):
+        item = self.create_item('images/user_1_a.jpg')
+        self.put_label(item)
+        self.dynamodb.tables['labels'][item.filename]['timestamp'] = {
+            'S': timezone.now().astimezone(datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S')}
+        item.delete()
+
+        report = self.reconcile(min_age=datetime.timedelta(minutes=15))
+
+        self.assertEqual((report.backfilled, report.backfill_skipped, report.orphans), (0, 1, 0))
+        self.assertFalse(InventoryItem.objects.exists())
+
+    def test_orphans_are_deleted_only_when_asked(self):
+        item = self.create_item('images/user_1_a.jpg')
+        self.put_label(item)
+        self.dynamodb.tables['labels'][item.filename]['product_id'] = {'S': '999999'}
+        item.delete()
+
+        report = self.reconcile()
+        self.assertEqual((report.orphans, report.orphans_deleted), (1, 0))
+        self.assertIn('images/user_1_a.jpg', self.dynamodb.tables['labels'])
+
+        report = self.reconcile(delete_orphans=True)
+        self.assertEqual((report.orphans, report.orphans_deleted), (1, 1))
+        self.assertNotIn('images/user_1_a.jpg', self.dynamodb.tables['labels'])
+        self.assertFalse(InventoryItem.objects.exists())
+
+    def test_dry_run_changes_nothing(self):
+        self.create_item('images/user_1_missing.jpg', status=InventoryItem.STATUS_FAILED)
+
+        report = self.reconcile(dry_run=True)
+
+        self.assertEqual(report.missing_in_dynamodb, 1)
+        self.assertNotIn('labels', self.dynamodb.tables)
+        self.assertFalse(InventoryItem.objects.filter(status=InventoryItem.STATUS_UPLOADED).exists())
+
+    def test_scan_reads_every_segment_in_pages(self):
+        for index in range(50):
+            self.dynamodb.put_item(TableName='labels', Item=label(f'images/{index}.jpg'))
+
+        pages = list(scan_table(self.dynamodb, 'labels', segments=4, page_size=5))
+
+        self.assertEqual(sorted(item['filename']['S'] for page in pages for item in page),
+                         sorted(f'images/{index}.jpg' for index in range(50)))
+        self.assertEqual({segment for name, segment in self.dynamodb.calls if name == 'scan'}, {0, 1, 2, 3})
+        self.assertTrue(all(len(page) <= 5 for page in pages))
+
+    def test_rows_are_read_in_chunks_not_per_row(self):
+        for index in range(30):
+            self.put_label(self.create_item(f'images/user_1_{index}.jpg'))
+
+        with CaptureQueriesContext(connection) as queries:
+            report = self.reconcile(chunk_size=10)
+
+        self.assertEqual(report.in_sync, 30)
+        self.assertLessEqual(len(queries), 5)
 
-        response = self.client.post(reverse('inventory_app'), post_data, follow=True)
+    @patch('inventory.storage_backends.AWSStorageBackend.__init__', return_value=None)
+    def test_command_prints_report(self, _mock_storage_init):
+        self.create_item('images/user_1_missing.jpg')
+        dynamodb = self.dynamodb
+
+        def metadata_writer(_backend, **options):
+            return BatchMetadataWriter(dynamodb, 'labels', **options)
+
+        out = io.StringIO()
+        with patch('inventory.storage_backends.AWSStorageBackend.metadata_writer', metadata_writer), \
+                patch('inventory.storage_backends.AWSStorageBackend.dynamodb_client', dynamodb, create=True), \
+                patch('inventory.storage_backends.AWSStorageBackend.table_name', 'labels', create=True):
+            call_command('reconcile_inventory_metadata', '--min-age-minutes', '0', stdout=out)
+
+        self.assertIn('missing_in_dynamodb: 1', out.getvalue())
+        self.assertIn('images/user_1_missing.jpg', dynamodb.tables['labels'])
+
+
+class GLTreeViewTest(TestCase):
+    """Tests for the cached, ETag-tagged GL hierarchy endpoint."""
+    def setUp(self):
+        invalidate_gl_tree()
+        self.user = get_user_model().objects.create_user(username='testuser', password='testpass')
+        self.client.login(username='testuser', password='testpass')
+        self.gl_level_1 = GLLevel1.objects.create(name="GL1")
+        self.gl_level_2 = GLLevel2.objects.create(name="GL2", parent=self.gl_level_1)
+        self.gl_level_3 = GLLevel3.objects.create(name="GL3", parent=self.gl_level_2)
+        self.product = Product.objects.create(name="Product", parent=self.gl_level_3)
+
+    def test_returns_whole_tree(self):
+        response = self.client.get(reverse('get_gl_tree'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header('ETag'))
+        expected = [[self.gl_level_1.id, 'GL1', [[self.gl_level_2.id, 'GL2', [
+            [self.gl_level_3.id, 'GL3', [[self.product.id, 'Product']]]]]]]]
+        self.assertEqual(response.json()['tree'], expected)
+
+    def test_conditional_request_returns_304(self):
+        etag_value = self.client.get(reverse('get_gl_tree'))['ETag']
+
+        response = self.client.get(reverse('get_gl_tree'), HTTP_IF_NONE_MATCH=etag_value)
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_cache_invalidated_on_save(self):
+        etag_value = self.client.get(reverse('get_gl_tree'))['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(name="Second Product", parent=self.gl_level_3)
+
+        # Session and user lookups, then one query per hierarchy level to rebuild.
+        with self.assertNumQueries(6):
+            response = self.client.get(reverse('get_gl_tree'), HTTP_IF_NONE_MATCH=etag_value)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag_value)
+        self.assertContains(response, 'Second Product')
+
+    def test_cache_kept_until_the_change_commits(self):
+        etag_value = self.client.get(reverse('get_gl_tree'))['ETag']
+        with self.captureOnCommitCallbacks() as callbacks:
+            Product.objects.create(name="Second Product", parent=self.gl_level_3)
+            # Not committed yet, so the cached tree is still served.
+            self.assertEqual(self.client.get(reverse('get_gl_tree'))['ETag'], etag_value)
+
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(self.client.get(reverse('get_gl_tree'))['ETag'], etag_value)
+
+    def test_etag_and_body_come_from_one_snapshot(self):
+        # A catalog change between the ETag computation and the body must not mix two trees.
+        snapshots = [(b'{"tree":[]}', 'first'), (b'{"tree":[[1,"New",[]]]}', 'second')]
+        with patch('inventory.views.get_cached_gl_tree', side_effect=snapshots) as mock_tree:
+            response = self.client.get(reverse('get_gl_tree'))
 
-        # Check that the user was redirected correctly
+        self.assertEqual(response['ETag'], '"first"')
+        self.assertEqual(response.content, b'{"tree":[]}')
+        self.assertEqual(mock_tree.call_count, 1)
+
+    def test_cached_tree_needs_no_catalog_queries(self):
+        self.client.get(reverse('get_gl_tree'))
+
+        # Only the session and user lookups for login_required remain.
+        with self.assertNumQueries(2):
+            self.client.get(reverse('get_gl_tree'))
+
+
+class QueryBudgetTest(QueryBudgetMixin, TestCase):
+    """Query-count budgets of the upload page and the AJAX dropdown endpoints."""
+    def setUp(self):
+        invalidate_gl_tree()
+        self.user = get_user_model().objects.create_user(username='testuser', password='testpass')
+        self.client.login(username='testuser', password='testpass')
+        self.gl_level_1 = GLLevel1.objects.create(name="GL1")
+        self.gl_level_2 = GLLevel2.objects.create(name="GL2", parent=self.gl_level_1)
+        self.gl_level_3 = GLLevel3.objects.create(name="GL3", parent=self.gl_level_2)
+        self.product = Product.objects.create(name="Product", parent=self.gl_level_3)
+        for index in range(5):
+            InventoryItem.objects.create(user=self.user, gl_level_1=self.gl_level_1, gl_level_2=self.gl_level_2,
+                                         gl_level_3=self.gl_level_3, product=self.product,
+                                         filename=f'images/user_1_{index}.jpg')
+
+    def test_inventory_view_get(self):
+        with self.assertQueryBudget('inventory_app'):
+            response = self.client.get(reverse('inventory_app'))
         self.assertEqual(response.status_code, 200)
-        print(response.request['PATH_INFO'])
-        self.assertTrue('/inventory/' in response.request['PATH_INFO'])
 
-        # Check for error message in the response context
-        messages = list(response.context['messages'])
-        self.assertEqual(len(messages), 1)
-        self.assertIn('There was a problem with the file upload', str(messages[0]))
\ No newline at end of file
+    @override_settings(MEDIA_ROOT=tempfile.gettempdir())
+    @patch('inventory.views.enqueue_upload')
+    def test_inventory_view_post(self, _mock_enqueue_upload):
+        image = SimpleUploadedFile('test_image.jpg', InventoryViewTest.IMAGE_DATA, content_type='image/jpeg')
+        post_data = {'gl_level_1': self.gl_level_1.id, 'gl_level_2': self.gl_level_2.id,
+                     'gl_level_3': self.gl_level_3.id, 'product': self.product.id, 'image': image}
+
+        with self.assertQueryBudget('inventory_app', 'POST'):
+            response = self.client.post(reverse('inventory_app'), post_data)
+        self.assertEqual(response.status_code, 302)
+
+    def test_dropdown_endpoints(self):
+        for url_name, params in (('get_gl_level_2', {'gl1_id': self.gl_level_1.id}),
+                                 ('get_gl_level_3', {'gl2_id': self.gl_level_2.id}),
+                                 ('get_products', {'gl3_id': self.gl_level_3.id})):
+            with self.subTest(url_name), self.assertQueryBudget(url_name):
+                response = self.client.get(reverse(url_name), params)
+            self.assertEqual(len(response.json()), 1)
+
+    def test_gl_tree(self):
+        with self.assertQueryBudget('get_gl_tree'):
+            self.client.get(reverse('get_gl_tree'))
+
+    def test_budget_overrun_fails(self):
+        with self.assertRaises(AssertionError):
+            with self.assertQueryBudget('get_products', budget=1):
+                self.client.get(reverse('get_products'), {'gl3_id': self.gl_level_3.id})
+
+    def test_sqlite_connections_use_wal_settings(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite only')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+
+
+class LoadCatalogCommandTest(TestCase):
+    """Tests for the bulk `load_catalog` management command."""
+    def setUp(self):
+        self.csv_dir = tempfile.mkdtemp()
+        self.write_csv('GLLevel1.csv', 'name\nFood\nBeverage\n')
+        self.write_csv('GLLevel2.csv', 'name,parent\nMeat,Food\nWine,Beverage\nOrphan,Missing\n')
+        self.write_csv('GLLevel3.csv', '﻿name,parent\nBeef,Meat\nRed,Wine\n')
+        self.write_csv('Products.csv', 'name,parent\nShort Rib, Beef \nCabernet,Red\nCabernet,Red\n')
+
+    def write_csv(self, filename, content):
+        with open(os.path.join(self.csv_dir, filename), 'w', encoding='utf-8') as csvfile:
+            csvfile.write(content)
+
+    def test_loads_all_levels(self):
+        out = io.StringIO()
+        call_command('load_catalog', self.csv_dir, stdout=out, stderr=io.StringIO())
+
+        self.assertEqual(Product.objects.get(name='Short Rib').parent.parent.parent.name, 'Food')
+        self.assertEqual(GLLevel2.objects.count(), 2)
+        self.assertIn('GL Level 2: 2 inserted, 0 updated, 1 skipped', out.getvalue())
+        self.assertIn('Products: 2 inserted, 0 updated, 1 skipped', out.getvalue())
+
+    def test_rerun_is_idempotent_and_updates_parents(self):
+        call_command('load_catalog', self.csv_dir, stdout=io.StringIO(), stderr=io.StringIO())
+        self.write_csv('Products.csv', 'name,parent\nShort Rib,Beef\nCabernet,Beef\n')
+
+        out = io.StringIO()
+        call_command('load_catalog', self.csv_dir, stdout=out, stderr=io.StringIO())
+
+        self.assertEqual(Product.objects.get(name='Cabernet').parent.name, 'Beef')
+        self.assertIn('GL Level 1: 0 inserted, 0 updated, 2 skipped', out.getvalue())
+        self.assertIn('Products: 0 inserted, 1 updated, 1 skipped', out.getvalue())
+
+    def test_missing_file_raises(self):
+        os.remove(os.path.join(self.csv_dir, 'Products.csv'))
+
+        with self.assertRaises(CommandError):
+            call_command('load_catalog', self.csv_dir, stdout=io.StringIO())
+        self.assertFalse(GLLevel1.objects.exists())
+
+
+@override_settings(INVENTORY_UPLOADS_PAGE_SIZE=2)
+class UploadHistoryPaginationTest(TestCase):
+    """Tests for the keyset-paginated upload history in inventory_view."""
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='testuser', password='testpass')
+        self.client.login(username='testuser', password='testpass')
+        gl_level_1 = GLLevel1.objects.create(name="GL1")
+        gl_level_2 = GLLevel2.objects.create(name="GL2", parent=gl_level_1)
+        gl_level_3 = GLLevel3.objects.create(name="GL3", parent=gl_level_2)
+        product = Product.objects.create(name="Product", parent=gl_level_3)
+        now = timezone.now()
+        self.items = []
+        for minutes in range(5):
+            item = InventoryItem.objects.create(
+                user=self.user, gl_level_1=gl_level_1, gl_level_2=gl_level_2,
+                gl_level_3=gl_level_3, product=product, filename=f'image_{minutes}.jpg')
+            InventoryItem.objects.filter(pk=item.pk).update(timestamp=now - datetime.timedelta(minutes=minutes))
+            self.items.append(item)
+
+    def collect_pages(self, sort):
+        """Follow next-page cursors and return the ids shown on every page."""
+        ids = []
+        params = {'sort': sort}
+        while True:
+            response = self.client.get(reverse('inventory_app'), params)
+            ids.extend(upload.id for upload in response.context['user_uploads'])
+            if not response.context['next_cursor']:
+                return ids
+            params = {'sort': sort, 'after': response.context['next_cursor']}
+
+    def test_pages_newest_first_by_default(self):
+        self.assertEqual(self.collect_pages('timestamp_desc'), [item.id for item in self.items])
+
+    def test_sort_ascending_is_honored(self):
+        self.assertEqual(self.collect_pages('timestamp_asc'), [item.id for item in reversed(self.items)])
+
+    def test_related_names_do_not_add_queries(self):
+        # Session, user, upload page (with select_related) and GL Level 1 options.
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('inventory_app'))
+        self.assertContains(response, 'Product')
+
+    def test_malformed_cursor_starts_from_first_page(self):
+        response = self.client.get(reverse('inventory_app'), {'after': 'not-a-cursor'})
+
+        self.assertEqual([upload.id for upload in response.context['user_uploads']],
+                         [item.id for item in self.items[:2]])
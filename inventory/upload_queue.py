@@ -0,0 +1,196 @@
+"""
+Background upload pipeline for inventory images.
+
+`inventory_view` saves each submission as a 'pending' InventoryItem and hands its id to
+this module. A small process-local thread pool then uploads the stored image to S3, writes
+the label metadata to DynamoDB and flips the row to 'uploaded' (or 'failed'), so request
+latency no longer depends on AWS round trips. The metadata goes through a process-wide
+`BatchMetadataWriter`, so concurrent uploads share batch_write_item requests; the row's
+status is set when its batch is flushed.
+
+Images are staged on local disk by the request under their final `images/user_{id}_...` key;
+the worker puts them to S3 under that key and then deletes the staged copy and clears the
+FileField, so `filename` is the only reference left. Images already stored through an S3
+'inventory_images' storage (WebApp/storage.py) are not uploaded again. Items confirmed through
+the direct-upload endpoints have no image at all; their `filename` is the key. For both, only
+the DynamoDB write is done.
+
+Usage:
+    - Call `enqueue_upload(item.id)` inside the request; the job is only submitted once
+      the surrounding transaction commits, so the worker always sees the saved row.
+    - Call `process_upload(item_id)` directly to run a job synchronously (tests, retries
+      from the shell).
+    - Jobs live only in this process's pool, so a restart loses the ones not yet done. Run
+      `manage.py requeue_pending_uploads` (cron, or after a deploy) to retry rows that stayed
+      'pending'.
+
+Settings:
+    - INVENTORY_UPLOAD_WORKERS: Number of worker threads per process.
+"""
+import atexit
+import logging
+import threading
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from WebApp.storage import is_s3
+from .models import InventoryItem
+from .storage_backends import AWSStorageBackend
+
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+_metadata_writer = None
+_metadata_writer_lock = threading.Lock()
+
+
+def _get_executor():
+    """Return the process-wide upload executor, creating it on first use."""
+    global _executor  # pylint: disable=global-statement
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.INVENTORY_UPLOAD_WORKERS,
+                thread_name_prefix='inventory-upload',
+            )
+        return _executor
+
+
+def get_metadata_writer():
+    """Return the process-wide batched DynamoDB writer, creating it on first use."""
+    global _metadata_writer  # pylint: disable=global-statement
+    with _metadata_writer_lock:
+        if _metadata_writer is None:
+            # Interval flushes run in a timer thread, which must not keep its DB connection open.
+            _metadata_writer = AWSStorageBackend().metadata_writer(on_timer_flush_done=connections.close_all)
+        return _metadata_writer
+
+
+@atexit.register
+def _flush_metadata_writer():
+    """Write out buffered metadata when the process exits."""
+    if _metadata_writer is not None:
+        _metadata_writer.close()
+
+
+def enqueue_upload(item_id):
+    """Schedule the S3/DynamoDB upload of an InventoryItem after the current transaction commits."""
+    transaction.on_commit(lambda: _get_executor().submit(_run_upload, item_id))
+
+
+def _run_upload(item_id):
+    """Executor entry point; keeps the worker thread's DB connection healthy between jobs."""
+    close_old_connections()
+    try:
+        try:
+            writer = get_metadata_writer()
+        except Exception:  # pylint: disable=broad-except
+            # Not configured; the unbatched path below reports the error and marks the item failed.
+            writer = None
+        process_upload(item_id, writer=writer)
+    except Exception:  # pylint: disable=broad-except
+        logger.exception("Unhandled error in upload worker for inventory item %s", item_id)
+    finally:
+        close_old_connections()
+
+
+# Attributes `build_item_data` writes; reconcile.py compares labels on exactly these.
+ITEM_ATTRIBUTES = (
+    'filename', 'gl_level_1_id', 'gl_level_1_name', 'gl_level_2_id', 'gl_level_2_name',
+    'gl_level_3_id', 'gl_level_3_name', 'product_id', 'product_name', 'timestamp', 'user_id',
+)
+
+
+def build_item_data(inventory_item, filename):
+    """Build the DynamoDB attribute map describing an uploaded inventory item."""
+    return {
+        'filename': {'S': filename},
+        'gl_level_1_id': {'S': str(inventory_item.gl_level_1.id)},
+        'gl_level_1_name': {'S': inventory_item.gl_level_1.name},
+        'gl_level_2_id': {'S': str(inventory_item.gl_level_2.id)},
+        'gl_level_2_name': {'S': inventory_item.gl_level_2.name},
+        'gl_level_3_id': {'S': str(inventory_item.gl_level_3.id)},
+        'gl_level_3_name': {'S': inventory_item.gl_level_3.name},
+        'product_id': {'S': str(inventory_item.product.id)},
+        'product_name': {'S': inventory_item.product.name},
+        'timestamp': {'S': inventory_item.timestamp.strftime('%Y-%m-%d %H:%M:%S')},
+        'user_id': {'N': str(inventory_item.user_id)}  # Assuming user ID is a number
+    }
+
+
+def _record_metadata_result(item_id, filename, written):
+    """BatchMetadataWriter callback: flips the row once its DynamoDB write succeeded or was given up."""
+    status = InventoryItem.STATUS_UPLOADED if written else InventoryItem.STATUS_FAILED
+    InventoryItem.objects.filter(pk=item_id).update(status=status)
+    if written:
+        logger.info("Inventory item %s uploaded as %s", item_id, filename)
+    else:
+        logger.error("Metadata write failed for inventory item %s", item_id)
+
+
+def _discard_staged_image(inventory_item, filename):
+    """
+    Points the row at the image's S3 key, clears the FileField and deletes the local copy.
+
+    `filename` is saved in the same UPDATE that clears `image`, before the metadata write, so a
+    row whose label write then fails still holds its S3 key for requeue/reconcile to repair.
+    """
+    staged_name = inventory_item.image.name
+    InventoryItem.objects.filter(pk=inventory_item.pk).update(image='', filename=filename)
+    try:
+        inventory_item.image.storage.delete(staged_name)
+    except OSError as e:
+        logger.warning("Could not delete staged image %s: %s", staged_name, e)
+
+
+def process_upload(item_id, writer=None):
+    """
+    Upload a pending inventory item's image to S3 and its metadata to DynamoDB.
+
+    Args:
+        item_id: Primary key of the InventoryItem to process.
+        writer (BatchMetadataWriter | None): Buffer the DynamoDB write in this writer, which sets
+            the final status when it flushes. Without one, the item is written with a single
+            put_item before returning.
+
+    Returns:
+        bool: True if the item was uploaded (or its metadata queued), False if it was marked as failed.
+    """
+    inventory_item = InventoryItem.objects.select_related(
+        'gl_level_1', 'gl_level_2', 'gl_level_3', 'product'
+        ).get(pk=item_id)
+
+    try:
+        storage_backend = AWSStorageBackend()
+        if not inventory_item.image:
+            # Uploaded by the browser with a presigned POST; only the metadata is left to write.
+            filename = inventory_item.filename
+        elif is_s3(inventory_item.image.storage):
+            # The ImageField already wrote the photo to the upload bucket under its final key.
+            filename = inventory_item.image.name
+        else:
+            with inventory_item.image.open('rb') as image:
+                filename = storage_backend.upload_file(image, user_id=inventory_item.user_id,
+                                                       key=inventory_item.image.name)
+            _discard_staged_image(inventory_item, filename)
+        item_data = build_item_data(inventory_item, filename)
+        if writer is None:
+            storage_backend.create_inventory_item(item_data)
+    except Exception as e:  # pylint: disable=broad-except
+        logger.error("Upload failed for inventory item %s: %s", item_id, e)
+        InventoryItem.objects.filter(pk=item_id).update(status=InventoryItem.STATUS_FAILED)
+        return False
+
+    if writer is not None:
+        # The image is in S3; the status follows when the writer flushes the metadata.
+        InventoryItem.objects.filter(pk=item_id).update(filename=filename)
+        writer.add(item_data, callback=partial(_record_metadata_result, item_id, filename))
+        return True
+
+    # Single UPDATE instead of a second full save() of the row.
+    InventoryItem.objects.filter(pk=item_id).update(filename=filename, status=InventoryItem.STATUS_UPLOADED)
+    logger.info("Inventory item %s uploaded as %s", item_id, filename)
+    return True
@@ -17,6 +17,10 @@ URL Patterns:
 - 'get_gl_level_2/': AJAX endpoint for GL Level 2 options.
 - 'get_gl_level_3/': AJAX endpoint for GL Level 3 options.
 - 'get_products/': AJAX endpoint for product options.
+- 'inventory/batch/': Batch submission of many images, each with its own GL/product selection.
+- 'inventory/uploads/presign/': Presigned POST for uploading a photo straight to S3.
+- 'inventory/uploads/confirm/': Records a photo uploaded with the presigned POST.
+- 'get_gl_tree/': Cached, ETag-tagged GL Level 1 -> Product hierarchy in one payload.
 """
 
 from django.urls import path
@@ -24,7 +28,11 @@ from . import views
 
 urlpatterns = [
     path('inventory/', views.inventory_view, name='inventory_app'),
+    path('inventory/batch/', views.inventory_batch_view, name='inventory_batch'),
+    path('inventory/uploads/presign/', views.presign_inventory_upload, name='inventory_upload_presign'),
+    path('inventory/uploads/confirm/', views.confirm_inventory_upload, name='inventory_upload_confirm'),
     path('get_gl_level_2/', views.get_gl_level_2, name='get_gl_level_2'),
     path('get_gl_level_3/', views.get_gl_level_3, name='get_gl_level_3'),
     path('get_products/', views.get_products, name='get_products'),
+    path('get_gl_tree/', views.get_gl_tree, name='get_gl_tree'),
 ]
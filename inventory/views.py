@@ -7,14 +7,27 @@ processing and storage.
 
 Key Components:
 - `inventory_view`: Renders the inventory data collection form. It handles GET and POST requests,
-  processing form data for submissions and saving it to the database. User success notifications
-  are managed through this view, secured with `@login_required` to ensure only authenticated users
-  can submit data.
+  saving valid submissions as 'pending' items and handing the S3/DynamoDB upload to the
+  background worker in `upload_queue`. User success notifications are managed through this view,
+  secured with `@login_required` to ensure only authenticated users can submit data.
+
+- `inventory_batch_view`: Accepts many images, each with its own GL/product selection, in one
+  POST. The batch is validated together, the images are stored concurrently and the rows are
+  inserted with one `bulk_create` before being handed to the upload worker.
 
 - AJAX Views (`get_gl_level_2`, `get_gl_level_3`, `get_products`): Enhance user experience by
   dynamically updating dropdown fields based on previous selections. They provide JSON data for
   cascading dropdown options, facilitating a hierarchical selection process.
 
+- The upload history under the form is keyset-paginated (see `pagination.py`) and honors the
+  requested sort direction.
+
+- `presign_inventory_upload` / `confirm_inventory_upload`: JSON API for browser-to-S3 uploads
+  (see `WebApp/direct_uploads.py`), so photos never pass through the app servers.
+
+- `get_gl_tree`: Serves the whole GL hierarchy in one cached JSON payload with an ETag, so the
+  form can resolve its cascading dropdowns on the client.
+
 Modules and Frameworks Utilized:
 - `django.shortcuts`: Facilitates rendering templates and redirecting URLs.
 - `django.contrib.auth.decorators`: Contains `@login_required` for access control.
@@ -36,16 +49,23 @@ experience, and maintaining secure access to functionalities.
           login page if the user is not authenticated.
  """
 import logging
+from django.conf import settings
 from django.db import IntegrityError, DatabaseError
 from django.utils import timezone
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from .forms import InventoryDataCollectionForm
-from .storage_backends import AWSStorageBackend
 from botocore.exceptions import BotoCoreError, ClientError
-
-from django.http import JsonResponse
+from WebApp.direct_uploads import request_data
+from .forms import InventoryDataCollectionForm, InventoryUploadConfirmForm, InventoryBatchFormSet
+from .upload_queue import enqueue_upload
+from .pagination import keyset_page
+from .storage_backends import AWSStorageBackend, derivative_url
+
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import etag, require_POST
+from .gl_tree import get_gl_tree as get_cached_gl_tree
 from .models import GLLevel1
 from .models import GLLevel2
 from .models import GLLevel3
@@ -64,96 +84,57 @@ logger = logging.getLogger(__name__)
 @login_required(login_url='loginPage')
 def inventory_view(request):
     """ Handles inventory data collection and submission. """
-    print("Entered inventory_view function")  # Debug print
     if request.method == 'POST':
-        print("POST request received")
         form = InventoryDataCollectionForm(request.POST, request.FILES) #Include request.FILES for image handling
         if form.is_valid():
-            print("Form is valid. Processing the form")
-            storage_backend = AWSStorageBackend() # instantiate storage backend.
             inventory_item = form.save(commit=False) # Create model instance without saving.
             inventory_item.user = request.user # set the user here
-            inventory_item.save()
+            inventory_item.status = InventoryItem.STATUS_PENDING
 
             try:
-                # Upload image to S3 and get filename
-                filename = storage_backend.upload_file(form.cleaned_data['image'], user_id=request.user.id)
-                inventory_item.filename = filename
-
-                # Prepare and store metadata in DynamoDB
-                item_data = {
-                    'filename': {'S': filename},
-                    'gl_level_1_id': {'S': str(inventory_item.gl_level_1.id)},
-                    'gl_level_1_name': {'S': inventory_item.gl_level_1.name},
-                    'gl_level_2_id': {'S': str(inventory_item.gl_level_2.id)},
-                    'gl_level_2_name': {'S': inventory_item.gl_level_2.name},
-                    'gl_level_3_id': {'S': str(inventory_item.gl_level_3.id)},
-                    'gl_level_3_name': {'S': inventory_item.gl_level_3.name},
-                    'product_id': {'S': str(inventory_item.product.id)},
-                    'product_name': {'S': inventory_item.product.name},
-                    'timestamp': {'S': inventory_item.timestamp.strftime('%Y-%m-%d %H:%M:%S')},
-                    'user_id': {'N': str(inventory_item.user.id)}  # Assuming user ID is a number
-                }
-                print("Attempting to create inventory item in DynamoDB")  # Debug print
-                storage_backend.create_inventory_item(item_data)
-
-                try:
-                    inventory_item.save()  # Save model instance with S3 filename
-                    print("Inventory item created and saved")  # Debug print
-                except IntegrityError:
-                    # This might happen if there's a duplicate entry, for instance
-                    messages.error(request, "This item already exists.")
-                    return redirect('inventory_app')  # Redirect to a safe page
-                except DatabaseError:
-                    # For other database-related issues
-                    messages.error(request, "There was a problem saving the item. Please try again.")
-                    return redirect('inventory_app')  # Redirect to a safe page    
-
-                messages.success(request, f'Inventory item uploaded successfully on {timezone.localtime().strftime("%Y-%m-%d %H:%M:%S")}.')
-                return redirect('inventory_app')  # Redirect back to the form
-                #logger.info("file upload successful: %s", filename)
-            
-            except BotoCoreError as e:
-                # Handle low-level exceptions from botocore
-                logger.error(f"Botocore error during file upload to S3: {e}")
-                messages.error(request, "There was a problem with the file upload. Please try again.")
-                return redirect('inventory_app')  # Redirect back to the inventory form
-
-            except ClientError as e:
-                # Handle client errors from boto3's client methods
-                logger.error(f"Client error during file upload to S3: {e}")
-                messages.error(request, "There was a problem with the file upload service. Please try again.")
-                return redirect('inventory_app')  # Redirect back to the inventory form
-
-            except Exception as e:
-                print(f"Error occurred: {e}")  # Debug print to log the exception
-                messages.error(request, f'Error uploading inventory item: {e}')
-                return redirect('inventory_app')  # Redirect back to the inventory form
+                inventory_item.save()
+            except IntegrityError:
+                # This might happen if there's a duplicate entry, for instance
+                messages.error(request, "This item already exists.")
+                return redirect('inventory_app')  # Redirect to a safe page
+            except DatabaseError:
+                # For other database-related issues
+                messages.error(request, "There was a problem saving the item. Please try again.")
+                return redirect('inventory_app')  # Redirect to a safe page
+
+            # S3 upload and DynamoDB write happen in the background upload worker.
+            enqueue_upload(inventory_item.id)
+
+            messages.success(request, f'Inventory item received on {timezone.localtime().strftime("%Y-%m-%d %H:%M:%S")} and is being uploaded.')
+            return redirect('inventory_app')  # Redirect back to the form
         else:
-            print("Form is invalid")
-            print(form.errors)  # Print errors to debug
+            logger.info("Invalid inventory form submission",
+                        extra={'user_id': request.user.id, 'form_errors': form.errors.get_json_data()})
             messages.error(request, 'Invalid form submission. Please correct the errors.')  # Handle invalid form
     else:
         form = InventoryDataCollectionForm()
 
     two_days_ago = timezone.now() - timezone.timedelta(days=2)
     sort = request.GET.get('sort', '')  # Default to an empty string if not present
+    if sort != 'timestamp_asc':
+        sort = 'timestamp_desc'  # Default sorting
 
-    # Determine the sorting
-    if sort == 'timestamp_desc':
-        order_by = '-timestamp'
-    elif sort == 'timestamp_asc':
-        order_by = 'timestamp'
-    else:
-        order_by = '-timestamp'  # Default sorting
-
+    # Pending and failed uploads are listed too so users can see the worker's progress.
+    # select_related avoids four extra queries per row for the GL/product names in the table.
     user_uploads = InventoryItem.objects.filter(
         user=request.user,
         timestamp__gte=two_days_ago,
-        filename__isnull=False  # Assuming 'filename' being non-null means successfully uploaded to S3
-        ).order_by('-timestamp')
-        
- 
+        ).select_related('gl_level_1', 'gl_level_2', 'gl_level_3', 'product')
+    user_uploads, next_cursor = keyset_page(
+        user_uploads,
+        cursor=request.GET.get('after'),
+        descending=(sort == 'timestamp_desc'),
+        page_size=settings.INVENTORY_UPLOADS_PAGE_SIZE,
+        )
+    for upload in user_uploads:
+        # Small derivative from the image_preprocessor Lambda instead of the original photo.
+        if upload.status == InventoryItem.STATUS_UPLOADED:
+            upload.thumbnail_url = derivative_url(upload.filename)
 
     # Query all GL Level 1 instances to pass to the template
     gl_level1_objects = GLLevel1.objects.all()
@@ -161,11 +142,45 @@ def inventory_view(request):
     # Update the context to include GL Level 1 objects along with the form
     context = {'form': form,
                'user_uploads': user_uploads,
+               'sort': sort,
+               'next_cursor': next_cursor,
+               'is_first_page': 'after' not in request.GET,
                 'gl_level1_objects': gl_level1_objects,
                 }
     return render(request, 'inventory/training_data.html', context)
 
 
+@login_required(login_url='loginPage')
+def inventory_batch_view(request):
+    """ Handles batch submission of many inventory images in one request. """
+    if request.method == 'POST':
+        formset = InventoryBatchFormSet(request.POST, request.FILES)
+        if formset.is_valid():
+            try:
+                inventory_items = formset.save(request.user)
+            except (BotoCoreError, ClientError, DatabaseError, OSError) as e:
+                logger.error("Batch inventory submission failed: %s", e)
+                messages.error(request, "There was a problem saving the items. Please try again.")
+                return redirect('inventory_batch')
+
+            for inventory_item in inventory_items:
+                enqueue_upload(inventory_item.id)
+            messages.success(request, f'{len(inventory_items)} inventory items received on '
+                                      f'{timezone.localtime().strftime("%Y-%m-%d %H:%M:%S")} and are being uploaded.')
+            return redirect('inventory_app')
+        messages.error(request, 'Invalid batch submission. Please correct the errors.')
+    else:
+        try:
+            rows = int(request.GET.get('rows', '5'))
+        except ValueError:
+            rows = 5
+        rows = max(1, min(rows, settings.INVENTORY_BATCH_MAX_ITEMS))
+        formset = InventoryBatchFormSet()
+        formset.extra = rows - 1  # plus the one required row (min_num)
+
+    return render(request, 'inventory/batch_upload.html', {'formset': formset})
+
+
 @login_required(login_url='loginPage')
 def get_gl_level_2(request):
     """
@@ -217,3 +232,102 @@ def get_products(request):
     product_data = [{'id': product.id, 'name': product.name} for product in products]
     return JsonResponse(product_data, safe=False)
 
+
+
+
+def _gl_tree_etag(request):
+    """ETag of the cached tree; keeps the (payload, etag) snapshot so the body matches the tag."""
+    request.gl_tree = get_cached_gl_tree()
+    return request.gl_tree[1]
+
+
+@login_required(login_url='loginPage')
+@etag(_gl_tree_etag)
+def get_gl_tree(request):
+    """
+    Returns the full GL Level 1 -> GL Level 2 -> GL Level 3 -> Product hierarchy as compact JSON.
+
+    The payload is served from the in-process cache in `gl_tree.py`. The `etag` decorator answers
+    requests carrying a matching If-None-Match header with a 304, and `no-cache` makes browsers
+    revalidate instead of re-downloading the tree. The body is the same snapshot the ETag was
+    computed from, even if a catalog change invalidates the cache in between.
+
+    Args:
+        request: HttpRequest object.
+
+    Returns:
+        HttpResponse with the JSON tree (see `gl_tree` for the format).
+    """
+    payload, _ = getattr(request, 'gl_tree', None) or get_cached_gl_tree()
+    response = HttpResponse(payload, content_type='application/json')
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@login_required(login_url='loginPage')
+@require_POST
+def presign_inventory_upload(request):
+    """
+    Issues a presigned POST for uploading one inventory photo straight to S3.
+
+    Args:
+        request: HttpRequest with `file_name` and `content_type` (JSON or form data).
+
+    Returns:
+        JsonResponse with `url`, `fields` and `key`; 400 for unsupported files, 502 if signing fails.
+    """
+    data = request_data(request)
+    file_name = data.get('file_name') or ''
+    content_type = data.get('content_type')
+    if not file_name or content_type not in settings.INVENTORY_IMAGE_CONTENT_TYPES:
+        return JsonResponse({'error': 'A JPEG, PNG, HEIC or WebP image is required.'}, status=400)
+
+    try:
+        upload = AWSStorageBackend().presigned_upload(request.user.id, file_name, content_type)
+    except (BotoCoreError, ClientError, KeyError) as e:
+        logger.error("Could not presign inventory upload: %s", e)
+        return JsonResponse({'error': 'Uploads are unavailable. Please try again later.'}, status=502)
+    return JsonResponse(upload)
+
+
+@login_required(login_url='loginPage')
+@require_POST
+def confirm_inventory_upload(request):
+    """
+    Records an inventory photo the browser has uploaded with `presign_inventory_upload`.
+
+    The item is saved as 'pending' with the S3 key as its filename, and the upload worker writes
+    its DynamoDB metadata.
+
+    Args:
+        request: HttpRequest with `key`, `gl_level_1`..`gl_level_3` and `product` (JSON or form data).
+
+    Returns:
+        JsonResponse with the new item's `id`, `filename` and `status` (201); 400 with `errors` if
+        the fields are invalid or the object is not in S3.
+    """
+    form = InventoryUploadConfirmForm(request_data(request), user=request.user)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+
+    key = form.cleaned_data['key']
+    existing = InventoryItem.objects.filter(user=request.user, filename=key).first()
+    if existing is not None:
+        # A retried confirm; the key is unique per upload, so this is the same photo.
+        return JsonResponse({'id': existing.id, 'filename': key, 'status': existing.status})
+
+    try:
+        uploaded = AWSStorageBackend().uploaded_image(key)
+    except (BotoCoreError, ClientError, KeyError) as e:
+        logger.error("Could not check inventory upload %s: %s", key, e)
+        return JsonResponse({'error': 'Uploads are unavailable. Please try again later.'}, status=502)
+    if uploaded is None:
+        return JsonResponse({'errors': {'key': ['The file has not been uploaded.']}}, status=400)
+
+    inventory_item = form.save(commit=False)
+    inventory_item.user = request.user
+    inventory_item.filename = key
+    inventory_item.status = InventoryItem.STATUS_PENDING
+    inventory_item.save()
+    enqueue_upload(inventory_item.id)
+    return JsonResponse({'id': inventory_item.id, 'filename': key, 'status': inventory_item.status}, status=201)
@@ -0,0 +1,82 @@
+# Generated by Django 4.2.9 on 2026-10-18 04:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoice', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LineItem',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('line_item_index', models.IntegerField()),
+                ('product_code', models.TextField(null=True)),
+                ('item_description', models.TextField(null=True)),
+                ('quantity', models.TextField(null=True)),
+                ('unit_price', models.TextField(null=True)),
+                ('total_price', models.TextField(null=True)),
+                ('quantity_value', models.DecimalField(decimal_places=4, max_digits=14, null=True)),
+                ('quantity_unit', models.TextField(null=True)),
+                ('unit_price_value', models.DecimalField(decimal_places=4, max_digits=14, null=True)),
+                ('total_price_value', models.DecimalField(decimal_places=2, max_digits=14, null=True)),
+                ('currency', models.CharField(max_length=3, null=True)),
+            ],
+            options={
+                'db_table': 'invoice_line_item',
+                'ordering': ['line_item_index'],
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ParsedInvoice',
+            fields=[
+                ('id', models.AutoField(db_column='invoice_id', primary_key=True, serialize=False)),
+                ('processing_id', models.IntegerField(db_column='in_invoice_processing_id', unique=True)),
+                ('s3_object_key', models.CharField(max_length=255)),
+                ('invoice_number', models.TextField(null=True)),
+                ('invoice_date', models.TextField(null=True)),
+                ('due_date', models.TextField(null=True)),
+                ('payment_terms', models.TextField(null=True)),
+                ('total', models.TextField(null=True)),
+                ('received_timestamp', models.DateTimeField(null=True)),
+            ],
+            options={
+                'db_table': 'invoices',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Vendor',
+            fields=[
+                ('id', models.AutoField(db_column='vendorid', primary_key=True, serialize=False)),
+                ('name', models.CharField(db_column='vendor_name', max_length=255)),
+                ('address', models.TextField(db_column='vendor_address', null=True)),
+                ('phone', models.CharField(db_column='vendor_phone', max_length=50, null=True)),
+                ('url', models.CharField(db_column='vendor_url', max_length=255, null=True)),
+                ('street', models.CharField(max_length=255, null=True)),
+                ('city', models.CharField(max_length=255, null=True)),
+                ('state', models.CharField(max_length=255, null=True)),
+                ('country', models.CharField(max_length=255, null=True)),
+                ('zip_code', models.CharField(max_length=20, null=True)),
+                ('normalized_name', models.TextField(null=True, unique=True)),
+            ],
+            options={
+                'db_table': 'vendors',
+                'managed': False,
+            },
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='s3_key',
+            field=models.CharField(blank=True, db_index=True, max_length=512),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['user', 'uploaded_at', 'id'], name='invoice_user_uploaded_id_idx'),
+        ),
+    ]
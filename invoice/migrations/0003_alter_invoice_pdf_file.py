@@ -0,0 +1,20 @@
+# Generated by Django 4.2.9 on 2026-10-18 04:39
+
+import WebApp.storage
+from django.db import migrations, models
+import invoice.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoice', '0002_invoice_s3_key_parsed_invoice_models'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='invoice',
+            name='pdf_file',
+            field=models.FileField(max_length=512, storage=WebApp.storage.invoice_storage, upload_to=invoice.models.invoice_pdf_path),
+        ),
+    ]
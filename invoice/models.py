@@ -1,29 +1,122 @@
 """
-Module for defining the Invoice model.
+Module for defining the Invoice model and the parsed-invoice models.
 
 This module contains the Invoice model class, which represents uploaded invoices
 in the application. Each invoice is associated with a user and includes details
 such as the uploaded PDF file, upload timestamp, and filename.
 
+Vendor, ParsedInvoice and LineItem map the tables the ELT pipeline fills from
+Textract results (elt/sql/tables). They are unmanaged: the SQL scripts own the
+schema, and Django only reads them, so views can show parsed invoices with
+ordinary joins instead of querying raw Textract JSON.
 """
+import os
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils.text import get_valid_filename
+from WebApp.storage import invoice_storage
+from .s3_storage_backend import S3StorageBackend
 # Create your models here.
 
+def invoice_pdf_path(instance, filename):
+    """ upload_to for Invoice.pdf_file: the `invoices/user_{id}/` key the Textract ELT is triggered by. """
+    return S3StorageBackend.invoice_s3_key(get_valid_filename(os.path.basename(filename)), instance.user_id)
+
+
 class Invoice(models.Model):
     """ Model to store uploaded invoices.
         This model represents an invoice uploaded by a user """
     
-     # FileField to store the PDF invoice file
-    pdf_file = models.FileField(upload_to='invoices/')
+     # FileField to store the PDF invoice file; written once, to S3 when configured (WebApp/storage.py)
+    pdf_file = models.FileField(upload_to=invoice_pdf_path, storage=invoice_storage, max_length=512)
     # DateTimeField to store the upload timestamp
     uploaded_at = models.DateTimeField(auto_now_add=True)
     # ForeignKey to associate each invoice with a user who uploaded it
     user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, db_index=True)
     # CharField to store the filename of the uploaded invoice
     filename = models.CharField(max_length=255) # to store the image filename in S3.
+    # S3 key of the uploaded PDF; the ELT links its parsed invoice back by this key.
+    s3_key = models.CharField(max_length=512, blank=True, db_index=True)
     # Add other fields as needed
 
+    class Meta:
+        indexes = [
+            # Serves the per-user upload history ordered by upload time.
+            models.Index(fields=['user', 'uploaded_at', 'id'], name='invoice_user_uploaded_id_idx'),
+        ]
+
     def __str__(self):
         return f"Invoice {self.filename} uploaded by {self.user.username} at {self.uploaded_at}"
-    
\ No newline at end of file
+
+
+class Vendor(models.Model):
+    """ Canonical vendor, from the ELT `Vendors` table. """
+    id = models.AutoField(primary_key=True, db_column='vendorid')
+    name = models.CharField(max_length=255, db_column='vendor_name')
+    address = models.TextField(null=True, db_column='vendor_address')
+    phone = models.CharField(max_length=50, null=True, db_column='vendor_phone')
+    url = models.CharField(max_length=255, null=True, db_column='vendor_url')
+    street = models.CharField(max_length=255, null=True)
+    city = models.CharField(max_length=255, null=True)
+    state = models.CharField(max_length=255, null=True)
+    country = models.CharField(max_length=255, null=True)
+    zip_code = models.CharField(max_length=20, null=True)
+    normalized_name = models.TextField(null=True, unique=True)
+
+    class Meta:
+        managed = False
+        db_table = 'vendors'
+
+    def __str__(self):
+        return self.name
+
+
+class ParsedInvoice(models.Model):
+    """ Invoice header fields extracted by the ELT, from the `invoices` table. """
+    id = models.AutoField(primary_key=True, db_column='invoice_id')
+    processing_id = models.IntegerField(unique=True, db_column='in_invoice_processing_id')
+    s3_object_key = models.CharField(max_length=255)
+    # The upload this invoice was parsed from; set by process_invoice_data from Invoice.s3_key.
+    web_invoice = models.OneToOneField(Invoice, null=True, on_delete=models.DO_NOTHING,
+                                       db_column='web_invoice_id', related_name='parsed')
+    vendor = models.ForeignKey(Vendor, null=True, on_delete=models.DO_NOTHING,
+                               db_column='vendor_id', related_name='invoices')
+    invoice_number = models.TextField(null=True)
+    invoice_date = models.TextField(null=True)
+    due_date = models.TextField(null=True)
+    payment_terms = models.TextField(null=True)
+    total = models.TextField(null=True)
+    received_timestamp = models.DateTimeField(null=True)
+
+    class Meta:
+        managed = False
+        db_table = 'invoices'
+
+    def __str__(self):
+        return f"Invoice {self.invoice_number or self.s3_object_key}"
+
+
+class LineItem(models.Model):
+    """ One parsed line item, from the `invoice_line_item` table. """
+    id = models.BigAutoField(primary_key=True)
+    invoice = models.ForeignKey(ParsedInvoice, to_field='processing_id', on_delete=models.DO_NOTHING,
+                                db_column='in_invoice_processing_id', related_name='line_items')
+    line_item_index = models.IntegerField()
+    product_code = models.TextField(null=True)
+    item_description = models.TextField(null=True)
+    quantity = models.TextField(null=True)
+    unit_price = models.TextField(null=True)
+    total_price = models.TextField(null=True)
+    quantity_value = models.DecimalField(max_digits=14, decimal_places=4, null=True)
+    quantity_unit = models.TextField(null=True)
+    unit_price_value = models.DecimalField(max_digits=14, decimal_places=4, null=True)
+    total_price_value = models.DecimalField(max_digits=14, decimal_places=2, null=True)
+    currency = models.CharField(max_length=3, null=True)
+
+    class Meta:
+        managed = False
+        db_table = 'invoice_line_item'
+        ordering = ['line_item_index']
+
+    def __str__(self):
+        return self.item_description or self.product_code or f"Line {self.line_item_index}"
@@ -1,52 +1,74 @@
 import os
-import boto3
-from botocore.client import Config
+import uuid
 import logging
+from datetime import datetime
 from django.conf import settings
+from django.utils.text import get_valid_filename
+from WebApp.aws_clients import get_client
+from WebApp.direct_uploads import presigned_post, uploaded_object
 
 logger = logging.getLogger(__name__)
 
 class S3StorageBackend:
     """Handles interactions with AWS S3 for invoice file storage."""
     def __init__(self):
-        """Initialize the S3 client using environment variables for credentials."""
+        """Attach the process-wide S3 client and read the bucket name from the environment."""
         try:
-            self.s3_client = boto3.client(
-                's3',
-                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-                region_name=settings.AWS_REGION,
-                config=Config(signature_version='s3v4')
-            )
-            logger.debug(f"Initialized S3 client with region: {settings.AWS_REGION}")
-
+            # Shared, pooled client; see WebApp/aws_clients.py.
+            self.s3_client = get_client('s3')
 
             #set bucket and table names from environment variables
             self.bucket_name = os.environ['S3_BUCKET_NAME_INVOICE'] # user PDF upload bucket
 
-            logger.info("AWS clients for S3 and DynamoDB initialized successfully") 
+            logger.debug("AWS client for S3 initialized successfully")
 
         except Exception as e:
             logger.error("Error initializing S3 client: %s", e)
             raise
 
+    @staticmethod
+    def invoice_s3_key(file_name, user_id):
+        """
+        Returns a new, unique S3 key for an invoice PDF; the ELT keys its parsed JSON off it.
+
+        The timestamp and uuid segment keeps re-uploads of a file name from overwriting each other;
+        the file name stays the last path component.
+        """
+        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+        return f'invoices/user_{user_id}/{timestamp}_{uuid.uuid4()}/{file_name}'
+
+    @staticmethod
+    def is_user_invoice_key(key, user_id):
+        """True if `key` is in `user_id`'s invoice prefix (and so may be confirmed by them)."""
+        prefix = f'invoices/user_{user_id}/'
+        return key.startswith(prefix) and len(key) > len(prefix) and '..' not in key
+
+    def presigned_upload(self, user_id, file_name):
+        """Returns a presigned POST ({'url', 'fields', 'key'}) for the browser to upload a PDF itself."""
+        s3_key = self.invoice_s3_key(get_valid_filename(os.path.basename(file_name)), user_id)
+        return presigned_post(self.bucket_name, s3_key, 'application/pdf', settings.INVOICE_PDF_MAX_BYTES)
+
+    def uploaded_invoice(self, s3_key):
+        """Returns (size, content type) of a directly uploaded invoice, or None if it is not in S3."""
+        return uploaded_object(self.bucket_name, s3_key)
+
     def invoice_file_upload(self, file, user_id):
         """Uploads the invoice file to S3."""
         #file_extension = os.path.splitext(file.name)[1]
         # Generate the S3 key for the file
-        s3_key = f'invoices/user_{user_id}/{file.name}'
+        s3_key = self.invoice_s3_key(os.path.basename(file.name), user_id)
 
         # Generate a unique filename or use the original filename
-        filename = f'{user_id}_{file.name}'
-        logger.debug(f"Attempting to upload file {filename} to S3")
+        filename = f'{user_id}_{os.path.basename(file.name)}'
+        logger.debug("Uploading %s to S3 as %s", filename, s3_key)
 
         try:
             # Upload the file to S3
             self.s3_client.upload_fileobj(file, self.bucket_name, s3_key)
-            logger.info(f"Invoice file '{filename}' uploaded to S3 successfully.")
+            logger.info("Invoice file %s uploaded to S3", filename)
 
             return filename
         except Exception as e:
-            logger.error(f"Error uploading invoice file to S3: {e}")
+            logger.error("Error uploading invoice file to S3: %s", e)
             raise e
         
\ No newline at end of file
@@ -1,15 +1,30 @@
+from decimal import Decimal
+from django.db import connection
 from django.test import TestCase, RequestFactory
 from django.urls import reverse
 import unittest
 from django.contrib.auth.models import User
 from django.contrib.auth import get_user_model
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import ANY, Mock, patch, MagicMock
 from invoice.s3_storage_backend import S3StorageBackend
-from invoice.models import Invoice
+from invoice.models import Invoice, Vendor, ParsedInvoice, LineItem
 from invoice.views import upload_invoice
 from django.contrib.messages import get_messages
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+import tempfile
+from botocore.exceptions import ClientError
+from WebApp.testing import QueryBudgetMixin
 # Create your tests here.
 
+# Invoices on local disk, whatever S3_BUCKET_NAME_INVOICE is set to, so the view uploads them itself.
+LOCAL_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    'inventory_images': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'invoices': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+}
+
 class TestS3StorageBackend(unittest.TestCase):
     """Test case for the S3StorageBackend class.
 
@@ -50,8 +65,9 @@ and verifying the correct arguments are passed when uploading a file to S3.
         filename = self.storage_backend.invoice_file_upload(mock_file, user_id)
 
         # Assert that the S3 client's upload_fileobj method was called with the correct arguments
-        expected_s3_key = f'invoices/user_{user_id}/test_invoice.pdf'
-        mock_upload_fileobj.assert_called_once_with(mock_file, self.storage_backend.bucket_name, expected_s3_key)
+        mock_upload_fileobj.assert_called_once_with(mock_file, self.storage_backend.bucket_name, ANY)
+        s3_key = mock_upload_fileobj.call_args.args[2]
+        self.assertRegex(s3_key, rf'^invoices/user_{user_id}/\d{{14}}_[0-9a-f-]{{36}}/test_invoice\.pdf$')
 
         # Assert that the method returned the correct filename
         expected_filename = f'{user_id}_test_invoice.pdf'
@@ -99,5 +115,169 @@ class TestUploadInvoiceView(TestCase):
         self.assertEqual(len(messages), 1)
         self.assertEqual(str(messages[0]), 'Invoice uploaded successfully to S3.')
 
+class TestInvoiceViews(TestCase):
+    """List and detail views over the unmanaged ELT tables (created here for the test database)."""
+    UNMANAGED = (Vendor, ParsedInvoice, LineItem)
+
+    @classmethod
+    def setUpClass(cls):
+        with connection.schema_editor() as schema_editor:
+            for model in cls.UNMANAGED:
+                schema_editor.create_model(model)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        with connection.schema_editor() as schema_editor:
+            for model in reversed(cls.UNMANAGED):
+                schema_editor.delete_model(model)
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='testuser', password='testpass')
+        self.client.login(username='testuser', password='testpass')
+        vendor = Vendor.objects.create(name='KX Wholesale Seafood', city='Tampa')
+        self.invoice = Invoice.objects.create(user=self.user, pdf_file='invoices/a.pdf', filename='1_a.pdf',
+                                              s3_key='invoices/user_1/invoices/a.pdf')
+        parsed = ParsedInvoice.objects.create(processing_id=7, s3_object_key='invoices/user_1/invoices/a.pdf.json',
+                                              web_invoice=self.invoice, vendor=vendor,
+                                              invoice_number='INV-100', total='$42.00')
+        for index in range(3):
+            LineItem.objects.create(invoice=parsed, line_item_index=index, item_description=f'Item {index}',
+                                    quantity_value=Decimal('2'), total_price_value=Decimal('14.00'))
+        self.pending = Invoice.objects.create(user=self.user, pdf_file='invoices/b.pdf', filename='1_b.pdf')
+
+    def test_detail_loads_invoice_vendor_and_line_items_in_two_queries(self):
+        url = reverse('invoice_detail', args=[self.invoice.pk])
+        response = self.client.get(url)  # warm up session/auth caches
+
+        with self.assertNumQueries(4):  # session, user, invoice+parsed+vendor, line items
+            response = self.client.get(url)
+
+        self.assertContains(response, 'KX Wholesale Seafood')
+        self.assertContains(response, 'INV-100')
+        self.assertEqual([item.item_description for item in response.context['line_items']],
+                         ['Item 0', 'Item 1', 'Item 2'])
+
+    def test_list_shows_parsed_and_pending_invoices(self):
+        response = self.client.get(reverse('invoice_list'))
+
+        self.assertEqual([invoice.pk for invoice in response.context['invoices']], [self.pending.pk, self.invoice.pk])
+        self.assertContains(response, 'INV-100')
+        self.assertContains(response, 'Processing')
+
+    def test_other_users_invoices_are_not_found(self):
+        other = get_user_model().objects.create_user(username='other', password='otherpass')
+        self.client.login(username='other', password='otherpass')
+
+        response = self.client.get(reverse('invoice_detail', args=[self.invoice.pk]))
+
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Invoice.objects.filter(user=other).exists())
+
+
+@patch.dict('os.environ', {'S3_BUCKET_NAME_INVOICE': 'test-invoices'})
+class TestDirectInvoiceUpload(TestCase):
+    """Presign/confirm endpoints for uploading invoice PDFs straight to S3."""
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='testuser', password='testpass')
+        self.client.login(username='testuser', password='testpass')
+        self.s3_client = MagicMock()
+        self.s3_client.generate_presigned_post.side_effect = lambda **kwargs: {
+            'url': 'https://test-invoices.s3.amazonaws.com/', 'fields': {'key': kwargs['Key']}}
+        self.s3_client.head_object.return_value = {'ContentLength': 2048, 'ContentType': 'application/pdf'}
+        for target in ('WebApp.direct_uploads.get_client', 'invoice.s3_storage_backend.get_client'):
+            patcher = patch(target, return_value=self.s3_client)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_presign_uses_user_invoice_prefix(self):
+        response = self.client.post(reverse('invoice_upload_presign'), {'file_name': '../May invoice.pdf'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response.json()['key'], rf'^invoices/user_{self.user.id}/\d{{14}}_[0-9a-f-]{{36}}/May_invoice\.pdf$')
+        conditions = self.s3_client.generate_presigned_post.call_args.kwargs['Conditions']
+        self.assertIn({'Content-Type': 'application/pdf'}, conditions)
+
+    def test_presign_keys_are_unique_per_upload(self):
+        first = self.client.post(reverse('invoice_upload_presign'), {'file_name': 'May invoice.pdf'})
+        second = self.client.post(reverse('invoice_upload_presign'), {'file_name': 'May invoice.pdf'})
+
+        self.assertNotEqual(first.json()['key'], second.json()['key'])
+
+    def test_presign_rejects_non_pdf(self):
+        response = self.client.post(reverse('invoice_upload_presign'), {'file_name': 'photo.jpg'})
+
+        self.assertEqual(response.status_code, 400)
+        self.s3_client.generate_presigned_post.assert_not_called()
+
+    def test_confirm_records_invoice_once(self):
+        key = f'invoices/user_{self.user.id}/May_invoice.pdf'
+
+        response = self.client.post(reverse('invoice_upload_confirm'), {'key': key})
+        retried = self.client.post(reverse('invoice_upload_confirm'), {'key': key})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(retried.json()['id'], response.json()['id'])
+        invoice = Invoice.objects.get(user=self.user)
+        self.assertEqual(invoice.s3_key, key)
+        self.assertEqual(invoice.filename, f'{self.user.id}_May_invoice.pdf')
+        self.assertFalse(invoice.pdf_file)
+
+    def test_confirm_rejects_other_users_keys(self):
+        response = self.client.post(reverse('invoice_upload_confirm'),
+                                    {'key': f'invoices/user_{self.user.id + 1}/May_invoice.pdf'})
+
+        self.assertEqual(response.status_code, 400)
+        self.s3_client.head_object.assert_not_called()
+        self.assertFalse(Invoice.objects.exists())
+
+
+class TestUploadInvoiceQueryBudget(QueryBudgetMixin, TestCase):
+    """Query-count budgets of the invoice upload view."""
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='testuser', password='testpass')
+        self.client.login(username='testuser', password='testpass')
+
+    def test_get(self):
+        with self.assertQueryBudget('upload_invoice'):
+            response = self.client.get(reverse('upload_invoice'))
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(MEDIA_ROOT=tempfile.gettempdir())
+    @patch('invoice.views.S3StorageBackend')
+    def test_post(self, mock_storage_backend):
+        mock_storage_backend.return_value.invoice_file_upload.return_value = '1_invoice.pdf'
+        pdf = SimpleUploadedFile('invoice.pdf', b'%PDF-1.4', content_type='application/pdf')
+
+        with self.assertQueryBudget('upload_invoice', 'POST'):
+            response = self.client.post(reverse('upload_invoice'), {'pdf_file': pdf})
+        self.assertEqual(response.status_code, 302)
+
+    @override_settings(MEDIA_ROOT=tempfile.gettempdir(), STORAGES=LOCAL_STORAGES)
+    @patch('invoice.views.S3StorageBackend', side_effect=KeyError('S3_BUCKET_NAME_INVOICE'))
+    def test_missing_bucket_is_a_form_error_and_saves_nothing(self, _mock_storage_backend):
+        pdf = SimpleUploadedFile('invoice.pdf', b'%PDF-1.4', content_type='application/pdf')
+
+        response = self.client.post(reverse('upload_invoice'), {'pdf_file': pdf})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].non_field_errors())
+        self.assertFalse(Invoice.objects.exists())
+
+    @override_settings(MEDIA_ROOT=tempfile.gettempdir(), STORAGES=LOCAL_STORAGES)
+    @patch('invoice.views.S3StorageBackend')
+    def test_failed_upload_rolls_back_row_and_file(self, mock_storage_backend):
+        mock_storage_backend.return_value.invoice_file_upload.side_effect = ClientError({}, 'PutObject')
+        pdf = SimpleUploadedFile('invoice.pdf', b'%PDF-1.4', content_type='application/pdf')
+
+        with patch('django.core.files.storage.FileSystemStorage.delete') as mock_delete:
+            response = self.client.post(reverse('upload_invoice'), {'pdf_file': pdf})
+
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Invoice.objects.exists())
+        mock_delete.assert_called_once()
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -28,5 +28,9 @@ from . import views
 APP_NAME = 'invoice' # Invoice App namespace
 urlpatterns = [
     path('upload/', views.upload_invoice, name='upload_invoice'),
+    path('upload/presign/', views.presign_invoice_upload, name='invoice_upload_presign'),
+    path('upload/confirm/', views.confirm_invoice_upload, name='invoice_upload_confirm'),
+    path('invoices/', views.invoice_list, name='invoice_list'),
+    path('invoices/<int:pk>/', views.invoice_detail, name='invoice_detail'),
     # Add other URL patterns as needed
 ]
\ No newline at end of file
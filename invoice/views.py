@@ -1,14 +1,22 @@
 """ Views for invoice app """
+import os
 import logging
-from django.db import IntegrityError, DatabaseError
+from django.conf import settings
+from django.db import IntegrityError, DatabaseError, transaction
 from django.utils import timezone
-from django.shortcuts import render, redirect
+from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import JsonResponse
+from django.views.decorators.http import require_POST
+from WebApp.direct_uploads import request_data
+from WebApp.storage import is_s3
 from .forms import InvoiceForm
 from .s3_storage_backend import S3StorageBackend
 from botocore.exceptions import BotoCoreError, ClientError
 
+from inventory.pagination import keyset_page
 from .models import Invoice
 
 
@@ -22,19 +30,24 @@ def upload_invoice(request):
     if request.method == 'POST':
         form = InvoiceForm(request.POST, request.FILES)
         if form.is_valid():
-            print(" Form is valid. Processing the form")
-            storage_backend = S3StorageBackend() # Instantiate the S3 storage backend
             invoice = form.save(commit=False) #Create model instance without saving.
             invoice.user = request.user # set the user here
-            invoice.save()
 
             # invoice_file = form.cleaned_data['pdf_file']
 
+            storage_backend = None
+            if not is_s3(Invoice._meta.get_field('pdf_file').storage):
+                try:
+                    # Built before anything is saved, so a missing bucket leaves no row or file behind.
+                    storage_backend = S3StorageBackend()
+                except KeyError:
+                    form.add_error(None, 'Invoice uploads are not available right now. Please try again later.')
+                    return render(request, 'invoice/upload_invoice.html', {'form': form})
+
             try:
-                # Upload invoice file to S3 using the storage backend
-                filename = storage_backend.invoice_file_upload(invoice.pdf_file, user_id=request.user.id)
-                invoice.filename = filename
-                invoice.save() # Save the model instance with the filename
+                # The row only commits once the PDF is in S3; a failed upload rolls it back.
+                with transaction.atomic():
+                    _save_invoice(invoice, storage_backend, request.user.id)
 
                 messages.success(request, 'Invoice uploaded successfully to S3.')
                 return redirect('upload_invoice')
@@ -60,4 +73,108 @@ def upload_invoice(request):
 
     else:
         form = InvoiceForm()
-    return render(request, 'invoice/upload_invoice.html', {'form': form})
\ No newline at end of file
+    return render(request, 'invoice/upload_invoice.html', {'form': form})
+
+
+def _save_invoice(invoice, storage_backend, user_id):
+    """
+    Saves the invoice and its PDF, uploading it with `storage_backend` unless the FileField is in S3.
+
+    The stored PDF is deleted again if anything after it fails.
+    """
+    # With S3 storage this writes the PDF to the invoice bucket; locally it goes to MEDIA_ROOT.
+    invoice.save()
+    try:
+        if storage_backend is None:
+            filename = f'{user_id}_{os.path.basename(invoice.pdf_file.name)}'
+        else:
+            # Upload invoice file to S3 using the storage backend
+            filename = storage_backend.invoice_file_upload(invoice.pdf_file, user_id=user_id)
+        invoice.filename = filename
+        # Lets process_invoice_data link the parsed invoice back to this upload.
+        invoice.s3_key = invoice.pdf_file.name
+        invoice.save(update_fields=['filename', 's3_key']) # Save the model instance with the filename
+    except Exception:
+        invoice.pdf_file.delete(save=False)
+        raise
+
+
+@login_required(login_url='loginPage')
+def invoice_list(request):
+    """ Lists the user's uploaded invoices with their parsed vendor and totals, newest first. """
+    # One query for the page: the parsed invoice and vendor are joined in, not fetched per row.
+    invoices = Invoice.objects.filter(user=request.user).select_related('parsed__vendor')
+    invoices, next_cursor = keyset_page(
+        invoices,
+        cursor=request.GET.get('after'),
+        page_size=settings.INVOICE_LIST_PAGE_SIZE,
+        field='uploaded_at',
+        )
+    context = {'invoices': invoices,
+               'next_cursor': next_cursor,
+               'is_first_page': 'after' not in request.GET,
+               }
+    return render(request, 'invoice/invoice_list.html', context)
+
+
+@login_required(login_url='loginPage')
+def invoice_detail(request, pk):
+    """ Shows one uploaded invoice with its parsed header fields and line items. """
+    invoice = get_object_or_404(
+        Invoice.objects.select_related('parsed__vendor').prefetch_related('parsed__line_items'),
+        pk=pk, user=request.user)
+    parsed = getattr(invoice, 'parsed', None)
+    context = {'invoice': invoice,
+               'parsed': parsed,
+               'line_items': parsed.line_items.all() if parsed else [],
+               }
+    return render(request, 'invoice/invoice_detail.html', context)
+
+
+@login_required(login_url='loginPage')
+@require_POST
+def presign_invoice_upload(request):
+    """ Issues a presigned POST for uploading one invoice PDF straight to S3.
+
+    Expects `file_name` (JSON or form data) and returns `url`, `fields` and `key`. """
+    file_name = request_data(request).get('file_name') or ''
+    if not file_name.lower().endswith('.pdf'):
+        return JsonResponse({'error': 'A PDF file is required.'}, status=400)
+
+    try:
+        upload = S3StorageBackend().presigned_upload(request.user.id, file_name)
+    except SuspiciousFileOperation:
+        return JsonResponse({'error': 'Invalid file name.'}, status=400)
+    except (BotoCoreError, ClientError, KeyError) as e:
+        logger.error(f"Could not presign invoice upload: {e}")
+        return JsonResponse({'error': 'Uploads are unavailable. Please try again later.'}, status=502)
+    return JsonResponse(upload)
+
+
+@login_required(login_url='loginPage')
+@require_POST
+def confirm_invoice_upload(request):
+    """ Records an invoice PDF the browser has uploaded with `presign_invoice_upload`.
+
+    Expects the `key` from the presign response. Returns the invoice's `id` and `filename`
+    (201, or 200 if the key was already confirmed). """
+    key = request_data(request).get('key') or ''
+    if not S3StorageBackend.is_user_invoice_key(key, request.user.id):
+        return JsonResponse({'errors': {'key': ['This upload key does not belong to you.']}}, status=400)
+
+    invoice = Invoice.objects.filter(user=request.user, s3_key=key).first()
+    if invoice is not None:
+        return JsonResponse({'id': invoice.id, 'filename': invoice.filename})
+
+    try:
+        uploaded = S3StorageBackend().uploaded_invoice(key)
+    except (BotoCoreError, ClientError, KeyError) as e:
+        logger.error(f"Could not check invoice upload {key}: {e}")
+        return JsonResponse({'error': 'Uploads are unavailable. Please try again later.'}, status=502)
+    if uploaded is None:
+        return JsonResponse({'errors': {'key': ['The file has not been uploaded.']}}, status=400)
+
+    # No local copy: pdf_file stays empty and s3_key is the only reference to the file.
+    invoice = Invoice.objects.create(user=request.user, s3_key=key,
+                                     filename=f'{request.user.id}_{key.rsplit("/", 1)[-1]}')
+    return JsonResponse({'id': invoice.id, 'filename': invoice.filename}, status=201)